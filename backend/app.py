@@ -2,83 +2,1196 @@
 Parkinson's Disease Prediction - Flask API Server
 
 Endpoints:
-    GET  /api/health        - Health check
+    GET  /api/health        - Health check (model state and load timings)
+    GET  /api/health/live   - Liveness probe
+    GET  /api/health/ready  - Readiness probe (503 until the model is warmed up)
     POST /api/predict       - Predict from uploaded image
     POST /api/predict-canvas - Predict from canvas drawing (base64)
+    POST /api/predict-batch - Predict several images in one request
+    GET  /api/grad-cam/<id> - Poll a background Grad-CAM render
     GET  /api/model-info    - Model performance statistics
+    GET  /metrics           - Prometheus metrics (stage latencies, batching, caches)
+    POST /api/admin/reload  - Load a new model version in the background, then
+                              swap it in (or shadow it with "shadow": percent)
+    GET  /api/admin/reload  - Reload progress and shadow comparison stats
+    POST /api/admin/shadow/<name>/promote - Serve the shadowed candidate
+    DELETE /api/admin/shadow/<name>       - Stop shadowing and drop the candidate
+
+The predict endpoints accept ?explain=sync|async|none (default sync).
+/api/predict and /api/predict-canvas also accept ?tta=K to average the
+score over K deterministic flip/rotation views run as one batch.
+
+Several models are served side by side (see MODEL_REGISTRY in config.py).
+A request is routed by an explicit "model" name, else by its "drawing_type"
+(spiral|wave, or detected from the image when omitted), else to the default
+combined model; the response's "model" field says which one answered.
+
+Models are replaced without a restart: a reload loads and warms the new
+version off the request path and publishes it in one step, while requests
+that already picked the old version finish on it. Admin calls record the
+target version in SERVING_STATE_DIR, and every worker process applies it
+(utils/serving_state.py), whichever worker received the call. MODEL_WATCH_INTERVAL
+turns on reloads triggered by the model files changing. The admin endpoints
+require the X-Admin-Token header and are disabled unless ADMIN_TOKEN is set.
+
+Each request stage (decode, preprocess, predict, Grad-CAM gradient /
+colormap / encode, saving the original) is timed into Prometheus histograms;
+SERVER_TIMING=1 also returns the breakdown in a Server-Timing header.
+
+Development:  python app.py
+Production:   gunicorn -c gunicorn.conf.py   (see gunicorn.conf.py)
 """
 
 import os
+import hmac
 import json
-import uuid
-import base64
-from io import BytesIO
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Blueprint, Response, g, request, jsonify, send_from_directory
 from flask_cors import CORS
-from PIL import Image
 import numpy as np
 
 from config import (
     MODEL_PATH, TRAINING_HISTORY_PATH, CLASS_INDICES_PATH,
-    UPLOAD_FOLDER, STATIC_FOLDER, ALLOWED_EXTENSIONS, MAX_CONTENT_LENGTH, IMG_SIZE
+    STATIC_FOLDER, ALLOWED_EXTENSIONS, MAX_CONTENT_LENGTH, IMG_SIZE,
+    BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS, SERVING_BUCKETS,
+    EXPLAIN_WORKERS, EXPLAIN_MAX_PENDING, EXPLAIN_JOB_TTL, EXPLAIN_JOB_DIR,
+    PREDICTION_CACHE_SIZE, PREDICTION_CACHE_DIR,
+    PREDICT_BATCH_MAX_ITEMS, PREPROCESS_WORKERS,
+    TF_INTRA_OP_THREADS, TF_INTER_OP_THREADS,
+    MODEL_BACKEND, TFLITE_MODEL_PATH, ONNX_MODEL_PATH,
+    ONNX_INTRA_OP_THREADS, ONNX_INTER_OP_THREADS, ONNX_GRAPH_OPTIMIZATION, ONNX_EXECUTION_MODE,
+    MODEL_METADATA_PATH, DEFAULT_THRESHOLD, TTA_MAX_VIEWS,
+    MODEL_REGISTRY, DEFAULT_MODEL_NAME, DRAWING_TYPE_ROUTES, DRAWING_TYPE_AUTODETECT,
+    MODEL_REGISTRY_MAX_LOADED, MODEL_REGISTRY_PRELOAD,
+    ADMIN_TOKEN, ADMIN_TRUST_LOCALHOST, MODEL_DIR, MODEL_WATCH_INTERVAL,
+    SHADOW_MAX_PENDING, SERVING_STATE_DIR, SERVING_STATE_INTERVAL,
+    SERVER_TIMING
+)
+from utils.batching import SharedBatchScheduler
+from utils.explain_jobs import ExplainJobs
+from utils.prediction_cache import PredictionCache, model_fingerprint
+from utils.artifact_store import get_artifact_store
+from utils.model_registry import ModelRegistry, LoadedModel, process_rss, parameter_bytes
+from utils.model_watcher import ModelFileWatcher
+from utils.serving_state import SharedServingState
+from utils.shadow import ShadowTraffic
+from utils.metrics import (
+    REGISTRY as metrics, REQUEST_SECONDS, stage, start_trace, end_trace, server_timing
+)
+from utils.serving import (
+    ServingModel, TFLiteServingModel, OnnxServingModel, configure_tf_threads
+)
+
+api = Blueprint("api", __name__)
+
+# One batching worker shared by every loaded model
+scheduler = SharedBatchScheduler(
+    max_batch_size=BATCH_MAX_SIZE,
+    max_wait_ms=BATCH_MAX_WAIT_MS,
+)
+
+# Responses for previously seen inputs, keyed by image hash + model version
+prediction_cache = PredictionCache(
+    max_entries=PREDICTION_CACHE_SIZE,
+    disk_dir=PREDICTION_CACHE_DIR,
 )
 
-app = Flask(__name__)
-app.config["MAX_CONTENT_LENGTH"] = MAX_CONTENT_LENGTH
-CORS(app, resources={r"/api/*": {"origins": "*"}})
+# Background Grad-CAM renders for ?explain=async
+explain_jobs = ExplainJobs(
+    max_workers=EXPLAIN_WORKERS,
+    max_pending=EXPLAIN_MAX_PENDING,
+    ttl_seconds=EXPLAIN_JOB_TTL,
+    status_dir=EXPLAIN_JOB_DIR,
+)
+EXPLAIN_MODES = ("sync", "async", "none")
 
-# Ensure directories exist
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-os.makedirs(STATIC_FOLDER, exist_ok=True)
+# Parallel decode for /api/predict-batch
+preprocess_pool = ThreadPoolExecutor(max_workers=PREPROCESS_WORKERS,
+                                     thread_name_prefix="preprocess")
 
-# Global model reference
-model = None
 
+# Startup state reported by the health endpoints:
+# idle -> loading -> warming -> ready (or missing / failed)
+model_state = {"status": "idle", "error": None, "timings": {}, "backend": None}
+tf_threads_configured = False
 
-def load_model():
-    """Load the trained model."""
-    global model
-    if os.path.exists(MODEL_PATH):
-        import tensorflow as tf
-        model = tf.keras.models.load_model(MODEL_PATH)
-        print(f"Model loaded from {MODEL_PATH}")
+
+def _load_keras(model_path, timings, state):
+    """Load the Keras model and warm its serving graph and Grad-CAM step."""
+    global tf_threads_configured
+    step = time.perf_counter()
+    import tensorflow as tf
+    if not tf_threads_configured:
+        # Only possible before the first model initializes the TF runtime
+        configure_tf_threads(TF_INTRA_OP_THREADS, TF_INTER_OP_THREADS)
+        tf_threads_configured = True
+    timings["import_ms"] = (time.perf_counter() - step) * 1000.0
+
+    step = time.perf_counter()
+    loaded = tf.keras.models.load_model(model_path)
+    timings["load_ms"] = (time.perf_counter() - step) * 1000.0
+    print(f"Model loaded from {model_path}")
+
+    state["status"] = "warming"
+    step = time.perf_counter()
+    from utils.grad_cam import build_grad_fn, compute_grad_cam
+
+    print("Warming up serving graph...")
+    warm_serving = ServingModel(loaded, buckets=SERVING_BUCKETS)
+    warm_serving.warm_up()
+
+    # Resolve the Grad-CAM layer and trace its gradient step once
+    grad_fn = build_grad_fn(loaded)
+    compute_grad_cam(grad_fn, np.zeros((1, IMG_SIZE, IMG_SIZE, 3), dtype=np.float32))
+    timings["warmup_ms"] = (time.perf_counter() - step) * 1000.0
+    return loaded, warm_serving, grad_fn
+
+
+def _load_tflite(model_path, timings, state):
+    """Load a TFLite export and warm its interpreters (no Grad-CAM model)."""
+    step = time.perf_counter()
+    warm_serving = TFLiteServingModel(
+        model_path, buckets=SERVING_BUCKETS, num_threads=TF_INTRA_OP_THREADS or None
+    )
+    timings["load_ms"] = (time.perf_counter() - step) * 1000.0
+    print(f"TFLite model loaded from {model_path}")
+
+    state["status"] = "warming"
+    step = time.perf_counter()
+    warm_serving.warm_up()
+    timings["warmup_ms"] = (time.perf_counter() - step) * 1000.0
+    return None, warm_serving, None
+
+
+def _load_onnx(model_path, timings, state):
+    """Create an ONNX Runtime session and warm it (no Grad-CAM model)."""
+    step = time.perf_counter()
+    warm_serving = OnnxServingModel(
+        model_path,
+        buckets=SERVING_BUCKETS,
+        intra_op_threads=ONNX_INTRA_OP_THREADS or TF_INTRA_OP_THREADS,
+        inter_op_threads=ONNX_INTER_OP_THREADS or TF_INTER_OP_THREADS,
+        graph_optimization=ONNX_GRAPH_OPTIMIZATION,
+        execution_mode=ONNX_EXECUTION_MODE,
+    )
+    timings["load_ms"] = (time.perf_counter() - step) * 1000.0
+    print(f"ONNX model loaded from {model_path}")
+
+    state["status"] = "warming"
+    step = time.perf_counter()
+    warm_serving.warm_up()
+    timings["warmup_ms"] = (time.perf_counter() - step) * 1000.0
+    return None, warm_serving, None
+
+
+def load_operating_thresholds(version):
+    """
+    Thresholds chosen by model/evaluate.py for this model version, by number
+    of TTA views (1..TTA_MAX_VIEWS). Settings that were not evaluated use
+    DEFAULT_THRESHOLD: a threshold is only valid for the view count it was
+    selected for.
+    """
+    thresholds = {views: DEFAULT_THRESHOLD for views in range(1, TTA_MAX_VIEWS + 1)}
+    if not os.path.exists(MODEL_METADATA_PATH):
+        return thresholds
+    try:
+        with open(MODEL_METADATA_PATH, "r") as f:
+            entry = json.load(f).get("models", {}).get(version)
+    except (OSError, ValueError) as e:
+        print(f"WARNING: Could not read {MODEL_METADATA_PATH}: {e}")
+        return thresholds
+    if not entry:
+        return thresholds
+    # Older metadata records a single threshold for one TTA setting
+    evaluated = entry.get("thresholds_by_tta") or {entry.get("tta", 1): entry["threshold"]}
+    for views, threshold in evaluated.items():
+        if int(views) in thresholds:
+            thresholds[int(views)] = float(threshold)
+    print(f"Using evaluated threshold {thresholds[1]:.3f} ({entry.get('criterion')})")
+    return thresholds
+
+
+MODEL_LOADERS = {
+    "keras": (MODEL_PATH, _load_keras),
+    "tflite": (TFLITE_MODEL_PATH, _load_tflite),
+    "onnx": (ONNX_MODEL_PATH, _load_onnx),
+}
+
+
+def build_model_entry(name, spec, state=None, queue_key=None):
+    """
+    Load and warm one registry model and give it a queue on the shared
+    scheduler (listed under queue_key, default the model name). Raises if
+    the model file is missing or loading fails.
+
+    state receives the "warming" status and the load timings.
+    """
+    backend, model_path = spec["backend"], spec["path"]
+    if backend not in MODEL_LOADERS:
+        raise ValueError(f"Unknown model backend '{backend}'. Use one of {list(MODEL_LOADERS)}.")
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"Model not found at {model_path}")
+
+    state = state if state is not None else {"status": "loading", "timings": {}}
+    timings = state["timings"]
+    started = time.perf_counter()
+    rss_before = process_rss()
+
+    loaded, warm_serving, grad_fn = MODEL_LOADERS[backend][1](model_path, timings, state)
+    version = f"{backend}:{model_fingerprint(model_path)}"
+    thresholds = load_operating_thresholds(version)
+
+    memory = {"parameter_bytes": parameter_bytes(loaded, model_path)}
+    rss_after = process_rss()
+    if rss_before is not None and rss_after is not None:
+        memory["rss_delta_bytes"] = rss_after - rss_before
+    timings["total_ms"] = (time.perf_counter() - started) * 1000.0
+
+    batcher = scheduler.register(queue_key or name, warm_serving.predict)
+    explain_batcher = None
+    if grad_fn is not None:
+        # Explained requests are batched like plain ones, through the taped pass
+        from utils.grad_cam import grad_cam_batch_fn
+        explain_batcher = scheduler.register(f"{queue_key or name}:grad_cam",
+                                             grad_cam_batch_fn(grad_fn))
+    return LoadedModel(name, backend, model_path, version, loaded, warm_serving,
+                       batcher, thresholds[1], timings, memory, tta_thresholds=thresholds,
+                       grad_fn=grad_fn, explain_batcher=explain_batcher)
+
+
+def release_model_entry(entry):
+    """Called when a model leaves the registry; in-flight requests still finish on it."""
+    scheduler.unregister(entry.batcher)
+    if entry.explain_batcher is not None:
+        scheduler.unregister(entry.explain_batcher)
+
+
+def default_model_spec(backend):
+    return {"backend": backend, "path": MODEL_LOADERS.get(backend, (MODEL_PATH, None))[0]}
+
+
+# Models served side by side; the default model is pinned, the others are
+# loaded on first use and evicted least recently used first
+registry = ModelRegistry(
+    dict(MODEL_REGISTRY, **{DEFAULT_MODEL_NAME: default_model_spec(MODEL_BACKEND)}),
+    build_model_entry,
+    max_loaded=MODEL_REGISTRY_MAX_LOADED,
+    pinned=(DEFAULT_MODEL_NAME,),
+    on_evict=release_model_entry,
+)
+
+
+def load_model(backend=None):
+    """
+    Load the default model and warm it up. The new model is only published
+    to the request handlers once warm-up has finished. Models listed in
+    MODEL_REGISTRY_PRELOAD are loaded afterwards; the rest on first use.
+
+    Args:
+        backend: "keras", "tflite" or "onnx" (default MODEL_BACKEND). Grad-CAM
+            needs the Keras model, so it is unavailable with the other backends.
+    """
+    backend = backend or MODEL_BACKEND
+    timings = {}
+    model_state.update(status="loading", error=None, timings=timings, backend=backend)
+
+    if backend not in MODEL_LOADERS:
+        model_state.update(status="failed", error=f"Unknown model backend '{backend}'")
+        print(f"ERROR: Unknown model backend '{backend}'. Use one of {list(MODEL_LOADERS)}.")
+        return
+
+    spec = default_model_spec(backend)
+    # Versions switched to by admin calls outlive the worker that received them
+    desired = serving_state.desired()["models"]
+    for name, target in desired.items():
+        if name in registry.specs and target.get("serving"):
+            registry.specs[name] = target_spec(target["serving"])
+    if (desired.get(DEFAULT_MODEL_NAME) or {}).get("serving"):
+        spec = registry.specs[DEFAULT_MODEL_NAME]
+        model_state["backend"] = spec["backend"]
+    serving_state.ensure_started()
+
+    registry.specs[DEFAULT_MODEL_NAME] = spec
+    if not os.path.exists(spec["path"]):
+        model_state["status"] = "missing"
+        print(f"WARNING: Model not found at {spec['path']}")
+        if backend == "keras":
+            print("Run 'python model/train_model.py' first to train the model.")
+        else:
+            print(f"Run 'python model/export_{backend}.py' to export the {backend} model.")
+        return
+
+    try:
+        entry = build_model_entry(DEFAULT_MODEL_NAME, spec, model_state)
+    except Exception as e:
+        model_state.update(status="failed", error=str(e))
+        print(f"ERROR: Model loading failed: {e}")
+        return
+
+    registry.publish(entry)
+    model_state["status"] = "ready"
+    print(f"Model ready in {timings['total_ms'] / 1000.0:.1f}s ({backend} backend)")
+
+    for name in MODEL_REGISTRY_PRELOAD:
+        if registry.available(name):
+            registry.get(name)
+
+
+def start_background_load(backend=None):
+    """Load the model on a background thread so the server can bind right away."""
+    thread = threading.Thread(target=load_model, args=(backend,),
+                              name="model-loader", daemon=True)
+    thread.start()
+    return thread
+
+
+# Hot reloads by model name: status is loading -> warming -> ready / shadowing
+# (or unchanged / failed)
+reload_state = {}
+reload_lock = threading.Lock()
+# Candidate versions receiving mirrored traffic, by served model name
+shadows = {}
+
+
+def reload_model(name, spec=None, shadow_percent=None, generation=None):
+    """
+    Load and warm a new version of a registry model on a background thread.
+    Once warm it is either published in place of the served version or, with
+    shadow_percent, sent that share of the model's traffic as a shadow.
+    generation is the shared serving-state target being applied, if any.
+
+    Returns the reload's state dict, or None if one is already running.
+    """
+    spec = dict(spec or registry.specs[name])
+    state = {
+        "status": "loading", "error": None, "timings": {},
+        "mode": "shadow" if shadow_percent else "swap",
+        "backend": spec["backend"], "path": spec["path"],
+        "generation": generation, "started_at": time.time(),
+    }
+    with reload_lock:
+        current = reload_state.get(name)
+        if current is not None and current["status"] in ("loading", "warming"):
+            return None
+        reload_state[name] = state
+    thread = threading.Thread(target=_run_reload, args=(name, spec, state, shadow_percent),
+                              name=f"model-reload-{name}", daemon=True)
+    thread.start()
+    return state
+
+
+def _run_reload(name, spec, state, shadow_percent):
+    previous = registry.peek(name)
+    state["previous_version"] = previous.version if previous else None
+    try:
+        version = f"{spec['backend']}:{model_fingerprint(spec['path'])}"
+        if not shadow_percent and previous is not None and previous.version == version:
+            state.update(status="unchanged", version=version, finished_at=time.time())
+            return
+        queue_key = f"{name}@shadow" if shadow_percent else None
+        candidate = build_model_entry(name, spec, state, queue_key)
+    except Exception as e:
+        state.update(status="failed", error=str(e), finished_at=time.time())
+        print(f"ERROR: Reloading model '{name}' failed: {e}")
+        return
+
+    state["version"] = candidate.version
+    if shadow_percent:
+        stop_shadow(name)
+        shadows[name] = ShadowTraffic(candidate, shadow_percent, spec,
+                                      max_pending=SHADOW_MAX_PENDING)
+        state["status"] = "shadowing"
+        print(f"Shadowing '{name}' with {candidate.version} on {shadow_percent:g}% of traffic")
     else:
-        print(f"WARNING: Model not found at {MODEL_PATH}")
-        print("Run 'python model/train_model.py' first to train the model.")
+        registry.specs[name] = spec
+        registry.publish(candidate)
+        if name == DEFAULT_MODEL_NAME:
+            model_state["backend"] = spec["backend"]
+        state["status"] = "ready"
+        print(f"Model '{name}' now serving {candidate.version}")
+    state["finished_at"] = time.time()
+
+
+def stop_shadow(name):
+    """Stop mirroring traffic to a candidate and release it; False if none."""
+    shadow = shadows.pop(name, None)
+    if shadow is None:
+        return False
+    shadow.close()
+    release_model_entry(shadow.candidate)
+    return True
+
+
+def promote_shadow(name):
+    """Serve the shadowed candidate in place of the current version."""
+    shadow = shadows.pop(name, None)
+    if shadow is None:
+        return None
+    shadow.close()
+    candidate = shadow.candidate
+    old_queue = candidate.batcher
+    candidate.batcher = scheduler.register(name, candidate.serving.predict)
+    scheduler.unregister(old_queue)
+    if candidate.explain_batcher is not None:
+        old_queue = candidate.explain_batcher
+        candidate.explain_batcher = scheduler.register(f"{name}:grad_cam", old_queue.predict_fn)
+        scheduler.unregister(old_queue)
+    registry.specs[name] = shadow.spec
+    registry.publish(candidate)
+    if name == DEFAULT_MODEL_NAME:
+        model_state["backend"] = shadow.spec["backend"]
+    print(f"Model '{name}' now serving {candidate.version} (promoted from shadow)")
+    return candidate
+
+
+def target_spec(version_target):
+    """Registry spec of a serving or shadow target from the shared serving state."""
+    return {"backend": version_target["backend"], "path": version_target["path"]}
+
+
+# Generation of each model's shared target this worker has fully applied
+applied_generations = {}
+
+
+def apply_serving_state(desired):
+    """Bring this worker's models in line with the shared serving state."""
+    for name, target in desired.get("models", {}).items():
+        if name not in registry.specs or applied_generations.get(name) == target["generation"]:
+            continue
+        if apply_model_target(name, target):
+            applied_generations[name] = target["generation"]
+
+
+def apply_model_target(name, target):
+    """
+    One step towards a model's target: swap the served version, then start,
+    retune or stop its shadow. Returns False while a step is still loading,
+    so the next poll continues; a reload already run for this generation is
+    not retried, even if it failed.
+    """
+    generation = target["generation"]
+    state = reload_state.get(name)
+    if state is not None and state["status"] in ("loading", "warming"):
+        return False
+    if name == DEFAULT_MODEL_NAME and model_state["status"] in ("idle", "loading", "warming"):
+        return False
+    ran = state if state is not None and state.get("generation") == generation else None
+
+    serving = target.get("serving")
+    entry = registry.peek(name)
+    if serving and entry is None:
+        # Not loaded in this worker; loaded with the new spec on first use
+        registry.specs[name] = target_spec(serving)
+    elif serving and entry.version != serving["version"] and ran is None:
+        shadow = shadows.get(name)
+        if shadow is not None and shadow.candidate.version == serving["version"]:
+            promote_shadow(name)
+        else:
+            reload_model(name, target_spec(serving), generation=generation)
+            return False
+
+    wanted = target.get("shadow")
+    shadow = shadows.get(name)
+    if wanted is None:
+        stop_shadow(name)
+    elif shadow is not None and shadow.candidate.version == wanted["version"]:
+        shadow.percent = float(wanted["percent"])
+    elif ran is None or ran["mode"] != "shadow":
+        reload_model(name, target_spec(wanted), float(wanted["percent"]), generation)
+        return False
+    return True
+
+
+def worker_serving_status():
+    """This worker's view of its models, published for the admin status endpoint."""
+    return {
+        "applied_generations": dict(applied_generations),
+        "serving": {name: entry.version for name, entry in registry.loaded().items()},
+        "reloads": {name: dict(state) for name, state in reload_state.items()},
+        "shadows": {name: shadow.stats() for name, shadow in shadows.items()},
+    }
+
+
+# Admin changes for every worker: recorded in SERVING_STATE_DIR by whichever
+# worker received the call, applied by each worker's poller
+serving_state = SharedServingState(
+    SERVING_STATE_DIR,
+    SERVING_STATE_INTERVAL,
+    apply_serving_state,
+    worker_serving_status,
+)
+
+
+def watched_model_paths():
+    return {name: entry.path for name, entry in registry.loaded().items()}
+
+
+# Reloads a served model when its file changes (MODEL_WATCH_INTERVAL > 0)
+model_watcher = ModelFileWatcher(
+    MODEL_WATCH_INTERVAL or 1.0,
+    watched_model_paths,
+    lambda name, path: reload_model(name),
+)
+
+
+def worker_info():
+    """Thread and batching settings of this worker process, for capacity planning."""
+    info = {
+        "pid": os.getpid(),
+        "web_workers": int(os.environ.get("WEB_WORKERS", 1)),
+        "web_threads": int(os.environ.get("WEB_THREADS", 0)) or None,
+        "batch_max_size": BATCH_MAX_SIZE,
+        "batch_max_wait_ms": BATCH_MAX_WAIT_MS,
+        "serving_buckets": list(SERVING_BUCKETS),
+        "tta_max_views": TTA_MAX_VIEWS,
+        "model_registry_max_loaded": MODEL_REGISTRY_MAX_LOADED,
+        "tf_intra_op_threads": TF_INTRA_OP_THREADS or None,
+        "tf_inter_op_threads": TF_INTER_OP_THREADS or None,
+    }
+    entry = default_entry()
+    if entry is not None and entry.model is not None:
+        import tensorflow as tf
+        info["tf_intra_op_threads"] = tf.config.threading.get_intra_op_parallelism_threads()
+        info["tf_inter_op_threads"] = tf.config.threading.get_inter_op_parallelism_threads()
+    return info
+
+
+def default_entry():
+    """The default (combined) model, or None while it is not loaded."""
+    return registry.peek(DEFAULT_MODEL_NAME)
+
+
+def model_entry(name):
+    """Loaded model by name (loading it on demand); None if unavailable."""
+    if name == DEFAULT_MODEL_NAME:
+        # Only load_model() loads the default model
+        entry = default_entry()
+        if entry is not None:
+            entry.touch()
+        return entry
+    return registry.get(name)
+
+
+def model_unavailable():
+    """503 response for predict routes while the default model is not ready, else None."""
+    if default_entry() is not None:
+        return None
+    if model_state["status"] in ("loading", "warming"):
+        return jsonify({"error": "Model is still loading. Try again shortly.",
+                        "state": model_state["status"]}), 503
+    return jsonify({"error": "Model not loaded. Train the model first."}), 503
 
 
 def allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-def predict_image(img_array):
+def label_from_score(score, threshold):
+    """Map the sigmoid output to (label, confidence)."""
+    # sigmoid output above the model's operating threshold (0.5 unless evaluated) = parkinson
+    if score > threshold:
+        return "parkinson", score
+    else:
+        return "healthy", 1 - score
+
+
+def predict_image(entry, img_array):
     """Run prediction on preprocessed image array."""
-    prediction = model.predict(img_array, verbose=0)
-    confidence = float(prediction[0][0])
+    # Concurrent requests are grouped into one forward pass by the batcher
+    with stage("predict"):
+        prediction = entry.batcher.predict(img_array[0])
+    return label_from_score(float(prediction[0]), entry.threshold)
+
+
+def predict_tta(entry, img_array, image_rgb, views, explain="sync"):
+    """
+    Score views deterministic augmentations of the image (utils/tta.py) as
+    one batch and average them. With explain="sync" the identity view comes
+    from the fused Grad-CAM pass instead, so no view is run twice.
+    Returns (label, confidence, grad_cam_url, tta summary).
+    """
+    from utils.tta import tta_views, view_names
+
+    with stage("tta_views"):
+        batch = tta_views(image_rgb, views)
+    explain_view = explain == "sync" and entry.explain_batcher is not None
+    # The remaining views are queued before the identity view is explained,
+    # so they are scored while the overlay is rendered instead of after it
+    rest = batch[1:] if explain_view else batch
+    futures = entry.batcher.submit_many(list(rest))
+
+    grad_cam_url = None
+    first_score = None
+    if explain_view:
+        from utils.grad_cam import predict_with_grad_cam
+        first_score, grad_cam_filename = predict_with_grad_cam(entry.explain_batcher, img_array,
+                                                                image_rgb)
+        if grad_cam_filename:
+            grad_cam_url = f"/api/static/{grad_cam_filename}"
+        if first_score is None:
+            # Explaining failed; score the identity view on the plain queue
+            futures.insert(0, entry.batcher.submit(batch[0]))
+
+    with stage("predict"):
+        scores = [float(f.result()[0]) for f in futures]
+    if first_score is not None:
+        scores.insert(0, float(first_score))
+    scores = np.array(scores)
+
+    mean = float(scores.mean())
+    threshold = entry.threshold_for(views)
+    label, confidence = label_from_score(mean, threshold)
+    summary = {
+        "views": len(scores),
+        "transforms": view_names(len(scores)),
+        "scores": [round(float(s), 6) for s in scores],
+        "mean_score": mean,
+        "std": float(scores.std()),
+        "min": float(scores.min()),
+        "max": float(scores.max()),
+        # Share of views that agree with the averaged label
+        "agreement": float(np.mean((scores > threshold) == (mean > threshold))),
+    }
+    return label, confidence, grad_cam_url, summary
+
+
+def predict_and_explain(entry, img_array, image_rgb):
+    """
+    Predict and build the Grad-CAM overlay from a single taped forward pass.
+    Returns (label, confidence, grad_cam_filename).
+    """
+    if entry.grad_fn is None:
+        # Backend without a Keras model (e.g. TFLite): no Grad-CAM
+        label, confidence = predict_image(entry, img_array)
+        return label, confidence, None
+
+    from utils.grad_cam import predict_with_grad_cam
+    score, grad_cam_filename = predict_with_grad_cam(entry.explain_batcher, img_array, image_rgb)
+    if score is None:
+        # Nothing to explain; fall back to the batched prediction path
+        label, confidence = predict_image(entry, img_array)
+        return label, confidence, None
+    label, confidence = label_from_score(score, entry.threshold)
+    return label, confidence, grad_cam_filename
+
+
+def run_prediction(entry, img_array, image_rgb, explain="sync"):
+    """
+    Predict, fusing in Grad-CAM when explain is "sync". Other modes only
+    predict here; async renders are scheduled with schedule_grad_cam().
+
+    image_rgb is the decoded (IMG_SIZE, IMG_SIZE, 3) image used for the overlay.
+    Returns (label, confidence, grad_cam_url).
+    """
+    if explain == "sync":
+        label, confidence, grad_cam_filename = predict_and_explain(entry, img_array, image_rgb)
+        grad_cam_url = f"/api/static/{grad_cam_filename}" if grad_cam_filename else None
+        return label, confidence, grad_cam_url
+
+    label, confidence = predict_image(entry, img_array)
+    return label, confidence, None
+
+
+def _grad_cam_job(explainer, img_array, image_rgb, cache_key):
+    """Render a Grad-CAM overlay in the background and record it in the cache."""
+    from utils.grad_cam import generate_grad_cam
+    grad_cam_filename = generate_grad_cam(explainer, img_array, image_rgb)
+    if grad_cam_filename and cache_key:
+        prediction_cache.update(cache_key, grad_cam_url=f"/api/static/{grad_cam_filename}")
+    return grad_cam_filename
+
+
+def schedule_grad_cam(entry, img_array, image_rgb, cache_key=None):
+    """Queue a background Grad-CAM render; returns the response fields for it."""
+    if entry.grad_fn is None:
+        return {"grad_cam_status": "unavailable"}
+    job_id = explain_jobs.submit(_grad_cam_job, entry.explain_batcher, img_array, image_rgb,
+                                 cache_key)
+    if job_id is None:
+        # Render queue is full; answer without a heatmap
+        return {"grad_cam_status": "rejected"}
+    return {
+        "grad_cam_job": job_id,
+        "grad_cam_status_url": f"/api/grad-cam/{job_id}",
+    }
+
+
+def save_original(image_rgb, ext="png"):
+    """Save the decoded image for display and return its static filename."""
+    with stage("save_original"):
+        return get_artifact_store().save_image(image_rgb, "original", ext)
 
-    # sigmoid output: >0.5 = parkinson, <0.5 = healthy
-    if confidence > 0.5:
-        return "parkinson", confidence
+
+def artifacts_present(entry):
+    """True if every static file referenced by a cached entry still exists."""
+    store = get_artifact_store()
+    for field in ("original_url", "grad_cam_url"):
+        url = entry.get(field)
+        if url and not store.exists(url[len("/api/static/"):]):
+            return False
+    return True
+
+
+def predict_decoded(entry, image_rgb, explain="sync", ext="png", tta=1):
+    """
+    Shared body of the predict endpoints, starting from the decoded image.
+    Identical inputs are answered from the prediction cache; a cached entry
+    without a heatmap is only reused when no synchronous heatmap is requested
+    or the model cannot produce one.
+    tta > 1 averages that many augmented views (see predict_tta()).
+
+    explain selects Grad-CAM handling:
+        sync  - fused prediction + heatmap, returned in the response
+        async - prediction now, heatmap rendered by a background job
+        none  - prediction only
+    """
+    from utils.preprocessing import preprocess_array
+
+    version = entry.cache_version_for(tta)
+    with stage("cache_lookup"):
+        cache_key = prediction_cache.key_for(image_rgb, version)
+        cached = prediction_cache.get(cache_key)
+        if cached is not None and not artifacts_present(cached):
+            # Images were evicted from the artifact store; recompute
+            prediction_cache.discard(cache_key)
+            cached = None
+    if cached is not None:
+        cached["cached"] = True
+        # Backends without a Keras model never produce a heatmap to wait for
+        if cached.get("grad_cam_url") or explain == "none" or entry.grad_fn is None:
+            return cached
+        if explain == "async":
+            cached.update(schedule_grad_cam(entry, preprocess_array(image_rgb), image_rgb, cache_key))
+            return cached
+
+    with stage("preprocess"):
+        img_array = preprocess_array(image_rgb)
+
+    # Save original for display
+    original_filename = save_original(image_rgb, ext)
+
+    # Predict (+ Grad-CAM)
+    tta_summary = None
+    if tta > 1:
+        label, confidence, grad_cam_url, tta_summary = predict_tta(
+            entry, img_array, image_rgb, tta, explain
+        )
     else:
-        return "healthy", 1 - confidence
+        started = time.perf_counter()
+        label, confidence, grad_cam_url = run_prediction(entry, img_array, image_rgb, explain)
+        shadow = shadows.get(entry.name)
+        if shadow is not None:
+            # Latency is only comparable when the answer came from the batched path
+            predict_ms = (time.perf_counter() - started) * 1000.0 if explain != "sync" else None
+            score = confidence if label == "parkinson" else 1 - confidence
+            shadow.maybe_mirror(img_array, score, entry.threshold, predict_ms)
+
+    response = {
+        "prediction": label,
+        "confidence": confidence,
+        "original_url": f"/api/static/{original_filename}",
+        "grad_cam_url": grad_cam_url,
+    }
+    if tta_summary:
+        response["tta"] = tta_summary
+    prediction_cache.put(cache_key, response)
+
+    if explain == "async":
+        response.update(schedule_grad_cam(entry, img_array, image_rgb, cache_key))
+
+    response["cached"] = False
+    return response
+
+
+def _decode_batch_item(item):
+    """Decode one batch item into its RGB array (runs in the preprocess pool)."""
+    from utils.preprocessing import decode_image, decode_canvas_image
+    with stage("decode"):
+        if item["kind"] == "file":
+            return decode_image(item["payload"])
+        return decode_canvas_image(item["payload"])
+
+
+def parse_batch_items():
+    """
+    Collect batch items from either a multipart request ("images" files, with
+    optional "explain" = comma-separated indices or "all") or a JSON body
+    ({"items": [base64 string | {"image_data": ..., "explain": bool}]}).
+
+    Returns (items, options) or (None, error message).
+    """
+    if request.files:
+        files = request.files.getlist("images")
+        explain_field = request.form.get("explain", "").strip().lower()
+        if explain_field == "all":
+            explain_idx = set(range(len(files)))
+        else:
+            try:
+                explain_idx = {int(i) for i in explain_field.split(",") if i.strip()}
+            except ValueError:
+                return None, "Invalid explain list. Use comma-separated indices or 'all'."
+
+        items = []
+        for i, f in enumerate(files):
+            item = {"kind": "file", "explain": i in explain_idx, "ext": "png"}
+            if not f.filename or not allowed_file(f.filename):
+                item["error"] = "Invalid file type. Use PNG, JPG, or JPEG."
+            else:
+                item["ext"] = f.filename.rsplit(".", 1)[1].lower()
+                item["payload"] = f.read()
+            items.append(item)
+        options = request.form
+    else:
+        data = request.get_json(silent=True) or {}
+        items = []
+        for entry in data.get("items", []):
+            if isinstance(entry, str):
+                entry = {"image_data": entry}
+            if not isinstance(entry, dict) or not entry.get("image_data"):
+                items.append({"kind": "canvas", "explain": False, "ext": "png",
+                              "error": "No image data provided."})
+                continue
+            items.append({"kind": "canvas", "payload": entry["image_data"],
+                          "explain": bool(entry.get("explain", False)), "ext": "png"})
+        options = data
+
+    if not items:
+        return None, "No images provided."
+    return items, options
+
+
+def predict_batch_items(entry, items):
+    """
+    Decode items in parallel, then queue them together on the model's batching
+    queue so they share forward passes. Items asking for Grad-CAM go through the
+    model's Grad-CAM queue instead, so every image still goes through the network
+    exactly once.
+    Returns one result dict per item.
+    """
+    from utils.preprocessing import preprocess_batch
+    from utils.grad_cam import render_grad_cam
+
+    results = [None] * len(items)
+    futures = {}
+    for i, item in enumerate(items):
+        if "error" in item:
+            results[i] = {"index": i, "error": item["error"]}
+        else:
+            futures[i] = preprocess_pool.submit(_decode_batch_item, item)
+
+    decoded = {}
+    for i, future in futures.items():
+        try:
+            decoded[i] = future.result()
+        except Exception as e:
+            results[i] = {"index": i, "error": f"Could not decode image: {e}"}
+
+    # Reuse cached answers where possible
+    pending = []
+    cache_keys = {}
+    for i, image_rgb in decoded.items():
+        cache_keys[i] = prediction_cache.key_for(image_rgb, entry.cache_version)
+        cached = prediction_cache.get(cache_keys[i])
+        if cached is not None and not artifacts_present(cached):
+            prediction_cache.discard(cache_keys[i])
+            cached = None
+        if cached is not None and (not items[i]["explain"] or cached.get("grad_cam_url")
+                                   or entry.grad_fn is None):
+            results[i] = {"index": i, **cached, "cached": True}
+        else:
+            pending.append(i)
+
+    if not pending:
+        return results
+
+    with stage("preprocess"):
+        batch = preprocess_batch([decoded[i] for i in pending])
+    explain_rows = [row for row, i in enumerate(pending) if items[i]["explain"]]
+    plain_rows = [row for row, i in enumerate(pending) if not items[i]["explain"]]
+
+    scores = np.zeros(len(pending), dtype=np.float32)
+    grad_cam_urls = {}
+    if explain_rows and entry.grad_fn is None:
+        plain_rows = list(range(len(pending)))
+    elif explain_rows:
+        # On the model's Grad-CAM queue, shared with single explain requests
+        with stage("grad_cam_gradient"):
+            futures = entry.explain_batcher.submit_many(list(batch[explain_rows]))
+            explained = [f.result() for f in futures]
+        for row, (score, heatmap) in zip(explain_rows, explained):
+            scores[row] = score
+            try:
+                filename = render_grad_cam(heatmap, decoded[pending[row]])
+                grad_cam_urls[row] = f"/api/static/{filename}"
+            except Exception as e:
+                print(f"Grad-CAM generation failed: {e}")
+    if plain_rows:
+        # Through the model's queue, so batch traffic shares the scheduler
+        # (and its batching) with single-image requests
+        with stage("predict"):
+            futures = entry.batcher.submit_many(list(batch[plain_rows]))
+            scores[plain_rows] = [float(f.result()[0]) for f in futures]
+
+    for row, i in enumerate(pending):
+        label, confidence = label_from_score(float(scores[row]), entry.threshold)
+        result = {
+            "prediction": label,
+            "confidence": confidence,
+            "original_url": f"/api/static/{save_original(decoded[i], items[i]['ext'])}",
+            "grad_cam_url": grad_cam_urls.get(row),
+        }
+        prediction_cache.put(cache_keys[i], result)
+        results[i] = {"index": i, **result, "cached": False}
+
+    return results
+
+
+def aggregate_results(results, threshold):
+    """Mean Parkinson probability over the successfully scored items."""
+    probs = [r["confidence"] if r["prediction"] == "parkinson" else 1 - r["confidence"]
+             for r in results if "error" not in r]
+    if not probs:
+        return None
+    score = float(np.mean(probs))
+    label, confidence = label_from_score(score, threshold)
+    return {
+        "prediction": label,
+        "confidence": confidence,
+        "parkinson_probability": score,
+        "num_images": len(probs),
+    }
+
+
+def get_explain_mode():
+    """Read ?explain=sync|async|none (default sync); None if invalid."""
+    explain = request.args.get("explain", "sync").lower()
+    return explain if explain in EXPLAIN_MODES else None
+
+
+def request_field(name, data=None):
+    """A request option from the query string, form fields or JSON body."""
+    return request.args.get(name) or request.form.get(name) or (data or {}).get(name)
+
+
+def get_tta_views(data=None):
+    """
+    Read the number of TTA views from ?tta=K (or a "tta" form/JSON field),
+    default 1, capped at TTA_MAX_VIEWS. None if invalid.
+    """
+    value = request_field("tta", data) or 1
+    try:
+        views = int(value)
+    except (TypeError, ValueError):
+        return None
+    if views < 1:
+        return None
+    return min(views, TTA_MAX_VIEWS)
+
+
+def resolve_model(image_rgb=None, data=None):
+    """
+    Pick the model for a request: an explicit "model" name; else the model
+    routed to by "drawing_type" (spiral|wave), detected from the image when
+    the field is missing or "auto" and DRAWING_TYPE_AUTODETECT is on; else
+    the default model, which also covers types without a specialist file.
+
+    Returns (entry, route info for the response) or (None, (error, status)).
+    """
+    name = request_field("model", data)
+    if name:
+        if name not in registry.specs:
+            return None, (f"Unknown model '{name}'. Use one of {sorted(registry.specs)}.", 400)
+        entry = model_entry(name)
+        if entry is None:
+            return None, (f"Model '{name}' could not be loaded.", 503)
+        return entry, {"name": name, "version": entry.version, "routed_by": "model"}
+
+    drawing_type = str(request_field("drawing_type", data) or "auto").lower()
+    route = {"drawing_type": drawing_type, "routed_by": "drawing_type"}
+    if drawing_type == "auto":
+        route["drawing_type"] = None
+        if DRAWING_TYPE_AUTODETECT and image_rgb is not None:
+            from utils.drawing_type import detect_drawing_type
+            route["drawing_type"], route["detection"] = detect_drawing_type(image_rgb)
+            route["routed_by"] = "detected"
+
+    name = DRAWING_TYPE_ROUTES.get(route["drawing_type"])
+    entry = model_entry(name) if name and registry.available(name) else None
+    if entry is None:
+        name, entry = DEFAULT_MODEL_NAME, model_entry(DEFAULT_MODEL_NAME)
+        route["routed_by"] = "default"
+    if entry is None:
+        return None, ("Model not loaded. Train the model first.", 503)
+    route.update(name=name, version=entry.version)
+    return entry, route
+
+
+def _model_memory():
+    return {(name,): entry.memory.get("parameter_bytes")
+            for name, entry in registry.loaded().items()}
+
+
+def _cache_lookups():
+    stats = prediction_cache.stats()
+    return {("hit",): stats["hits"], ("disk_hit",): stats["disk_hits"], ("miss",): stats["misses"]}
+
+
+def _shadow_agreement():
+    return {(name,): shadow.stats()["label_agreement"] for name, shadow in shadows.items()}
+
+
+# Values kept by other components, read when /metrics is scraped
+metrics.callback("parkinsons_batch_queue_depth", "Samples waiting in each model's batching queue",
+                 lambda: {(k,): v for k, v in scheduler.queue_depths().items()},
+                 labelnames=("model",))
+metrics.callback("parkinsons_prediction_cache_lookups", "Prediction cache lookups by result",
+                 _cache_lookups, kind="counter", labelnames=("result",))
+metrics.callback("parkinsons_prediction_cache_entries", "Entries in the in-memory prediction cache",
+                 lambda: prediction_cache.stats()["entries"])
+metrics.callback("parkinsons_artifact_files", "Generated images in the artifact store",
+                 lambda: get_artifact_store().stats()["files"])
+metrics.callback("parkinsons_artifact_bytes", "Bytes of generated images in the artifact store",
+                 lambda: get_artifact_store().stats()["bytes"])
+metrics.callback("parkinsons_explain_jobs_pending", "Background Grad-CAM renders queued or running",
+                 lambda: explain_jobs.stats()["pending"])
+metrics.callback("parkinsons_models_loaded", "Models resident in the registry",
+                 lambda: len(registry.loaded()))
+metrics.callback("parkinsons_model_parameter_bytes", "Parameter bytes of each loaded model",
+                 _model_memory, labelnames=("model",))
+metrics.callback("parkinsons_process_resident_bytes", "Resident set size of this process",
+                 process_rss)
+metrics.callback("parkinsons_shadow_label_agreement",
+                 "Share of mirrored predictions where the shadow candidate agreed",
+                 _shadow_agreement, labelnames=("model",))
+
+
+def admin_forbidden():
+    """
+    403 response unless the caller may use the admin endpoints, else None.
+    Fails closed: with no ADMIN_TOKEN (and no explicit localhost trust) the
+    admin endpoints are disabled.
+    """
+    if ADMIN_TOKEN and hmac.compare_digest(request.headers.get("X-Admin-Token", ""), ADMIN_TOKEN):
+        return None
+    if ADMIN_TRUST_LOCALHOST and request.remote_addr in ("127.0.0.1", "::1"):
+        return None
+    if not ADMIN_TOKEN and not ADMIN_TRUST_LOCALHOST:
+        return jsonify({"error": "Admin endpoints are disabled. Set ADMIN_TOKEN to enable them."}), 403
+    return jsonify({"error": "Forbidden."}), 403
+
+
+def parse_reload_request(data):
+    """
+    Validate a reload request: "model" (default the default model), optional
+    "path" (inside MODEL_DIR) and "backend" overrides, optional "shadow"
+    percentage. Returns (name, spec, shadow_percent) or (None, error message).
+    """
+    name = data.get("model") or DEFAULT_MODEL_NAME
+    if name not in registry.specs:
+        return None, f"Unknown model '{name}'. Use one of {sorted(registry.specs)}."
+    spec = dict(registry.specs[name])
+
+    if data.get("backend"):
+        if data["backend"] not in MODEL_LOADERS:
+            return None, f"Unknown backend. Use one of {list(MODEL_LOADERS)}."
+        spec["backend"] = data["backend"]
+    if data.get("path"):
+        path = os.path.realpath(os.path.join(MODEL_DIR, data["path"]))
+        if not path.startswith(os.path.realpath(MODEL_DIR) + os.sep):
+            return None, "Model path must be inside the model directory."
+        spec["path"] = path
+    if not os.path.exists(spec["path"]):
+        return None, f"Model file not found: {spec['path']}"
+
+    shadow = data.get("shadow")
+    if shadow is not None:
+        try:
+            shadow = float(shadow)
+        except (TypeError, ValueError):
+            return None, "Invalid shadow percentage."
+        if not 0 < shadow <= 100:
+            return None, "Shadow percentage must be in (0, 100]."
+    return name, spec, shadow
 
 
 # ==================== ROUTES ====================
 
-@app.route("/api/health", methods=["GET"])
+@api.before_app_request
+def start_model_watcher():
+    # Started on the first request so the thread lives in the serving process
+    if MODEL_WATCH_INTERVAL > 0:
+        model_watcher.ensure_started()
+
+
+@api.before_app_request
+def start_request_timing():
+    g.request_started = time.perf_counter()
+    g.trace_token = start_trace()
+
+
+@api.after_app_request
+def finish_request_timing(response):
+    """Record the request latency and, if enabled, the Server-Timing breakdown."""
+    started = g.pop("request_started", None)
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    stages = end_trace(g.pop("trace_token"))
+    endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    REQUEST_SECONDS.labels(endpoint, request.method, response.status_code).observe(elapsed)
+    if SERVER_TIMING:
+        response.headers["Server-Timing"] = server_timing(stages, elapsed)
+    return response
+
+
+@api.route("/api/health", methods=["GET"])
 def health_check():
+    entry = default_entry()
     return jsonify({
         "status": "ok",
-        "model_loaded": model is not None
+        "model_loaded": entry is not None,
+        "backend": model_state["backend"],
+        "model_version": entry.version if entry else None,
+        "decision_threshold": entry.threshold if entry else DEFAULT_THRESHOLD,
+        "state": model_state["status"],
+        "timings_ms": model_state["timings"],
+        "error": model_state["error"],
+        "models": registry.stats(),
+        "shadows": {name: shadow.stats() for name, shadow in shadows.items()},
+        "batching": scheduler.stats(),
+        "explain_jobs": explain_jobs.stats(),
+        "prediction_cache": prediction_cache.stats(),
+        "artifacts": get_artifact_store().stats(),
+        "worker": worker_info(),
     })
 
 
-@app.route("/api/predict", methods=["POST"])
+@api.route("/api/health/live", methods=["GET"])
+def liveness():
+    """Liveness: the process is up and serving HTTP, whatever the model state."""
+    return jsonify({"status": "ok"})
+
+
+@api.route("/api/health/ready", methods=["GET"])
+def readiness():
+    """Readiness: 200 only once the model is loaded and warmed up."""
+    ready = default_entry() is not None
+    return jsonify({
+        "ready": ready,
+        "state": model_state["status"],
+        "timings_ms": model_state["timings"],
+    }), 200 if ready else 503
+
+
+@api.route("/api/predict", methods=["POST"])
 def predict():
     """Predict from an uploaded image file."""
-    if model is None:
-        return jsonify({"error": "Model not loaded. Train the model first."}), 503
+    unavailable = model_unavailable()
+    if unavailable:
+        return unavailable
 
     if "image" not in request.files:
         return jsonify({"error": "No image file provided."}), 400
@@ -90,98 +1203,99 @@ def predict():
     if not allowed_file(file.filename):
         return jsonify({"error": "Invalid file type. Use PNG, JPG, or JPEG."}), 415
 
-    try:
-        # Save uploaded file
-        ext = file.filename.rsplit(".", 1)[1].lower()
-        filename = f"{uuid.uuid4().hex}.{ext}"
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(filepath)
-
-        # Preprocess
-        from utils.preprocessing import preprocess_image
-        img_array = preprocess_image(filepath)
-
-        # Predict
-        label, confidence = predict_image(img_array)
+    explain = get_explain_mode()
+    if explain is None:
+        return jsonify({"error": "Invalid explain mode. Use sync, async, or none."}), 400
 
-        # Generate Grad-CAM
-        from utils.grad_cam import generate_grad_cam
-        grad_cam_filename = generate_grad_cam(model, img_array, filepath)
+    tta = get_tta_views()
+    if tta is None:
+        return jsonify({"error": "Invalid tta. Use a positive number of views."}), 400
 
-        # Save original for display
-        original_filename = f"original_{filename}"
-        original_dest = os.path.join(STATIC_FOLDER, original_filename)
-        Image.open(filepath).convert("RGB").resize((IMG_SIZE, IMG_SIZE)).save(original_dest)
-
-        response = {
-            "prediction": label,
-            "confidence": confidence,
-            "original_url": f"/api/static/{original_filename}",
-            "grad_cam_url": f"/api/static/{grad_cam_filename}" if grad_cam_filename else None,
-        }
-
-        # Clean up upload
-        os.remove(filepath)
+    try:
+        # Decode once; the array is shared by preprocessing, Grad-CAM and the thumbnail
+        from utils.preprocessing import decode_image
+        ext = file.filename.rsplit(".", 1)[1].lower()
+        with stage("upload_read"):
+            payload = file.read()
+        with stage("decode"):
+            image_rgb = decode_image(payload)
 
+        with stage("route"):
+            entry, route = resolve_model(image_rgb)
+        if entry is None:
+            return jsonify({"error": route[0]}), route[1]
+        response = predict_decoded(entry, image_rgb, explain, ext, tta)
+        response["model"] = route
         return jsonify(response)
 
     except Exception as e:
         return jsonify({"error": f"Prediction failed: {str(e)}"}), 500
 
 
-@app.route("/api/predict-canvas", methods=["POST"])
+@api.route("/api/predict-canvas", methods=["POST"])
 def predict_canvas():
     """Predict from a base64-encoded canvas drawing."""
-    if model is None:
-        return jsonify({"error": "Model not loaded. Train the model first."}), 503
+    unavailable = model_unavailable()
+    if unavailable:
+        return unavailable
 
     data = request.get_json()
     if not data or "image_data" not in data:
         return jsonify({"error": "No image data provided."}), 400
 
+    explain = get_explain_mode()
+    if explain is None:
+        return jsonify({"error": "Invalid explain mode. Use sync, async, or none."}), 400
+
+    tta = get_tta_views(data)
+    if tta is None:
+        return jsonify({"error": "Invalid tta. Use a positive number of views."}), 400
+
     try:
-        base64_data = data["image_data"]
+        # Decode (and invert) once; shared by preprocessing, Grad-CAM and the thumbnail
+        from utils.preprocessing import decode_canvas_image
+        with stage("decode"):
+            image_rgb = decode_canvas_image(data["image_data"])
 
-        # Save canvas image for Grad-CAM
-        if "," in base64_data:
-            img_b64 = base64_data.split(",")[1]
-        else:
-            img_b64 = base64_data
+        with stage("route"):
+            entry, route = resolve_model(image_rgb, data)
+        if entry is None:
+            return jsonify({"error": route[0]}), route[1]
+        response = predict_decoded(entry, image_rgb, explain, tta=tta)
+        response["model"] = route
+        return jsonify(response)
 
-        img_bytes = base64.b64decode(img_b64)
-        temp_filename = f"{uuid.uuid4().hex}.png"
-        temp_path = os.path.join(UPLOAD_FOLDER, temp_filename)
+    except Exception as e:
+        return jsonify({"error": f"Prediction failed: {str(e)}"}), 500
 
-        # Save inverted version (for Grad-CAM display)
-        canvas_img = Image.open(BytesIO(img_bytes)).convert("RGB")
-        inverted = Image.fromarray(255 - np.array(canvas_img))
-        inverted.save(temp_path)
 
-        # Preprocess canvas image
-        from utils.preprocessing import preprocess_canvas_image
-        img_array = preprocess_canvas_image(base64_data)
+@api.route("/api/predict-batch", methods=["POST"])
+def predict_batch():
+    """Predict several drawings (files or base64 canvases) in one request."""
+    unavailable = model_unavailable()
+    if unavailable:
+        return unavailable
 
-        # Predict
-        label, confidence = predict_image(img_array)
+    items, options = parse_batch_items()
+    if items is None:
+        return jsonify({"error": options}), 400
 
-        # Generate Grad-CAM on the inverted image
-        from utils.grad_cam import generate_grad_cam
-        grad_cam_filename = generate_grad_cam(model, img_array, temp_path)
+    if len(items) > PREDICT_BATCH_MAX_ITEMS:
+        return jsonify({"error": f"Too many images. Maximum is {PREDICT_BATCH_MAX_ITEMS}."}), 413
 
-        # Save original for display
-        original_filename = f"original_{temp_filename}"
-        original_dest = os.path.join(STATIC_FOLDER, original_filename)
-        inverted.resize((IMG_SIZE, IMG_SIZE)).save(original_dest)
+    # One model per batch request: "model" or "drawing_type" fields, no detection
+    entry, route = resolve_model(data=options)
+    if entry is None:
+        return jsonify({"error": route[0]}), route[1]
 
-        response = {
-            "prediction": label,
-            "confidence": confidence,
-            "original_url": f"/api/static/{original_filename}",
-            "grad_cam_url": f"/api/static/{grad_cam_filename}" if grad_cam_filename else None,
-        }
+    try:
+        results = predict_batch_items(entry, items)
+        response = {"results": results, "model": route}
 
-        # Clean up
-        os.remove(temp_path)
+        subject_id = options.get("subject_id")
+        if subject_id or str(options.get("aggregate", "")).lower() in ("1", "true", "yes"):
+            response["subject_id"] = subject_id
+            response["aggregate"] = aggregate_results(results, entry.threshold)
 
         return jsonify(response)
 
@@ -189,7 +1303,22 @@ def predict_canvas():
         return jsonify({"error": f"Prediction failed: {str(e)}"}), 500
 
 
-@app.route("/api/model-info", methods=["GET"])
+@api.route("/api/grad-cam/<job_id>", methods=["GET"])
+def grad_cam_status(job_id):
+    """Poll a background Grad-CAM render started with ?explain=async."""
+    job = explain_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired Grad-CAM job."}), 404
+
+    response = {"job_id": job_id, "status": job["status"], "grad_cam_url": None}
+    if job["status"] == "done":
+        response["grad_cam_url"] = f"/api/static/{job['filename']}"
+    elif job["status"] == "failed":
+        response["error"] = job.get("error")
+    return jsonify(response)
+
+
+@api.route("/api/model-info", methods=["GET"])
 def model_info():
     """Return model performance statistics."""
     if not os.path.exists(TRAINING_HISTORY_PATH):
@@ -198,17 +1327,150 @@ def model_info():
     with open(TRAINING_HISTORY_PATH, "r") as f:
         data = json.load(f)
 
+    entry = default_entry()
+    data["decision_threshold"] = entry.threshold if entry else DEFAULT_THRESHOLD
     return jsonify(data)
 
 
-@app.route("/api/static/<path:filename>", methods=["GET"])
+def record_target(name, change):
+    """
+    Record a model's new target in the shared serving state and start
+    applying it in this worker; the other workers follow on their next poll.
+    Returns the updated target, or None if change() rejected it.
+    """
+    desired, target = serving_state.update(name, change)
+    if target is not None:
+        apply_serving_state(desired)
+        serving_state.report()
+    return target
+
+
+@api.route("/api/admin/reload", methods=["POST"])
+def admin_reload():
+    """Load a new model version in every worker; swap it in or shadow it."""
+    forbidden = admin_forbidden()
+    if forbidden:
+        return forbidden
+
+    data = request.get_json(silent=True) or request.form
+    parsed = parse_reload_request(data)
+    if parsed[0] is None:
+        return jsonify({"error": parsed[1]}), 400
+    name, spec, shadow = parsed
+    version = dict(spec, version=f"{spec['backend']}:{model_fingerprint(spec['path'])}")
+
+    def change(target):
+        if shadow:
+            target["shadow"] = dict(version, percent=shadow)
+        else:
+            target["serving"] = version
+
+    target = record_target(name, change)
+    return jsonify({"model": name, "target": target,
+                    "status_url": "/api/admin/reload"}), 202
+
+
+@api.route("/api/admin/reload", methods=["GET"])
+def admin_reload_status():
+    """
+    Target versions plus what every live worker has applied: reload
+    progress, served versions and shadow agreement/latency per worker.
+    """
+    forbidden = admin_forbidden()
+    if forbidden:
+        return forbidden
+
+    serving_state.report()
+    desired = serving_state.desired()
+    workers = serving_state.workers()
+    targets = {name: target["generation"] for name, target in desired["models"].items()}
+    converged = all(
+        worker["applied_generations"].get(name) == generation
+        for worker in workers for name, generation in targets.items()
+        if name in registry.specs
+    )
+    return jsonify({"desired": desired, "workers": workers, "converged": converged})
+
+
+@api.route("/api/admin/shadow/<name>/promote", methods=["POST"])
+def admin_promote_shadow(name):
+    """Serve the shadowed candidate of a model in every worker."""
+    forbidden = admin_forbidden()
+    if forbidden:
+        return forbidden
+
+    def change(target):
+        if not target.get("shadow"):
+            return False
+        target["serving"] = {k: v for k, v in target["shadow"].items() if k != "percent"}
+        target["shadow"] = None
+
+    target = record_target(name, change)
+    if target is None:
+        return jsonify({"error": f"No shadow running for '{name}'."}), 404
+    return jsonify({"model": name, "version": target["serving"]["version"], "target": target})
+
+
+@api.route("/api/admin/shadow/<name>", methods=["DELETE"])
+def admin_stop_shadow(name):
+    """Stop shadowing a model in every worker and drop the candidate."""
+    forbidden = admin_forbidden()
+    if forbidden:
+        return forbidden
+
+    def change(target):
+        if not target.get("shadow"):
+            return False
+        target["shadow"] = None
+
+    target = record_target(name, change)
+    if target is None:
+        return jsonify({"error": f"No shadow running for '{name}'."}), 404
+    return jsonify({"model": name, "shadow": None, "target": target})
+
+
+@api.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    """Metrics of this worker process in the Prometheus text format."""
+    return Response(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@api.route("/api/static/<path:filename>", methods=["GET"])
 def serve_static(filename):
     """Serve static files (Grad-CAM images, etc.)."""
     return send_from_directory(STATIC_FOLDER, filename)
 
 
+# ==================== APP FACTORY ====================
+
+def create_app(load="background", backend=None):
+    """
+    Build the Flask app.
+
+    Args:
+        load: "background" to load the model on a thread after binding,
+              "sync" to load it before returning, or "none" to leave
+              loading to the caller (gunicorn loads it in post_fork, since
+              TensorFlow must not be initialized before the fork).
+        backend: Inference backend passed to load_model() (default MODEL_BACKEND)
+    """
+    app = Flask(__name__)
+    app.config["MAX_CONTENT_LENGTH"] = MAX_CONTENT_LENGTH
+    CORS(app, resources={r"/api/*": {"origins": "*"}})
+    app.register_blueprint(api)
+
+    if load == "sync":
+        load_model(backend)
+    elif load == "background":
+        start_background_load(backend)
+    return app
+
+
 # ==================== MAIN ====================
 
 if __name__ == "__main__":
-    load_model()
-    app.run(host="0.0.0.0", port=5001, debug=True)
+    debug = True
+    # With the reloader on, only the serving child process loads the model
+    serving_process = not debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true"
+    app = create_app(load="background" if serving_process else "none")
+    app.run(host="0.0.0.0", port=5001, debug=debug)
@@ -0,0 +1,150 @@
+"""
+Preprocessing Micro-benchmark
+Compares the vectorized uint8 preprocessing path against the original
+PIL -> float32 -> expand_dims -> preprocess_input implementation, and checks
+that both produce the same model inputs.
+
+Usage:
+    python benchmarks/bench_preprocessing.py [--iterations 50] [--size 1024]
+"""
+
+import os
+import sys
+import time
+import base64
+import argparse
+from io import BytesIO
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+# Add parent to path for config import
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import IMG_SIZE
+from utils.preprocessing import (
+    decode_image, decode_canvas_image, preprocess_array, preprocess_batch, RESIZE_BACKENDS
+)
+
+try:
+    from tensorflow.keras.applications.efficientnet import preprocess_input
+except ImportError:
+    # EfficientNet's preprocess_input is a pass-through; allow running without TF
+    def preprocess_input(x):
+        return x
+
+
+# ---------- Original implementation (reference) ----------
+
+def legacy_preprocess_image(image_bytes):
+    img = Image.open(BytesIO(image_bytes)).convert("RGB")
+    img = img.resize((IMG_SIZE, IMG_SIZE))
+    img_array = np.array(img, dtype=np.float32)
+    img_array = np.expand_dims(img_array, axis=0)
+    return preprocess_input(img_array)
+
+
+def legacy_preprocess_canvas(base64_data):
+    img = Image.open(BytesIO(base64.b64decode(base64_data.split(",")[1]))).convert("RGB")
+    img = Image.fromarray(255 - np.array(img))
+    img = img.resize((IMG_SIZE, IMG_SIZE))
+    img_array = np.array(img, dtype=np.float32)
+    img_array = np.expand_dims(img_array, axis=0)
+    return preprocess_input(img_array)
+
+
+# ---------- Synthetic inputs ----------
+
+def make_spiral(size, dark_on_light=True, seed=0):
+    """Draw a shaky spiral similar to the dataset drawings."""
+    rng = np.random.default_rng(seed)
+    bg, fg = ((255, 255, 255), (20, 20, 20)) if dark_on_light else ((0, 0, 0), (255, 255, 255))
+    img = Image.new("RGB", (size, size), bg)
+    draw = ImageDraw.Draw(img)
+    t = np.linspace(0, 8 * np.pi, 2000)
+    r = t / t.max() * size * 0.45
+    jitter = rng.normal(0, size * 0.003, size=(2, t.size))
+    xs = size / 2 + r * np.cos(t) + jitter[0]
+    ys = size / 2 + r * np.sin(t) + jitter[1]
+    draw.line(list(zip(xs, ys)), fill=fg, width=max(size // 150, 2))
+    return img
+
+
+def encode(img, fmt="PNG"):
+    buf = BytesIO()
+    img.save(buf, format=fmt)
+    return buf.getvalue()
+
+
+def bench(fn, arg, iterations):
+    fn(arg)  # warm-up
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(arg)
+    return (time.perf_counter() - start) / iterations * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--size", type=int, default=1024, help="Source image side in pixels")
+    parser.add_argument("--batch", type=int, default=8)
+    args = parser.parse_args()
+
+    upload = encode(make_spiral(args.size), "PNG")
+    jpeg = encode(make_spiral(args.size, seed=1), "JPEG")
+    canvas = "data:image/png;base64," + base64.b64encode(
+        encode(make_spiral(args.size, dark_on_light=False, seed=2))).decode()
+
+    print("=" * 64)
+    print(f"  Preprocessing benchmark ({args.size}px source, {args.iterations} iterations)")
+    print("=" * 64)
+
+    failures = 0
+    cases = [
+        ("upload PNG", upload, legacy_preprocess_image,
+         lambda b, backend: preprocess_array(decode_image(b, backend))),
+        ("upload JPEG", jpeg, legacy_preprocess_image,
+         lambda b, backend: preprocess_array(decode_image(b, backend))),
+        ("canvas", canvas, legacy_preprocess_canvas,
+         lambda b, backend: preprocess_array(decode_canvas_image(b, backend))),
+    ]
+
+    for name, payload, legacy_fn, new_fn in cases:
+        legacy_ms = bench(legacy_fn, payload, args.iterations)
+        reference = legacy_fn(payload)
+        print(f"\n  {name}")
+        print(f"    legacy          {legacy_ms:8.2f} ms")
+        for backend in RESIZE_BACKENDS:
+            new_ms = bench(lambda p: new_fn(p, backend), payload, args.iterations)
+            diff = np.abs(new_fn(payload, backend) - reference)
+            # PIL must match the legacy path (up to rounding ties from
+            # inverting after the resize); cv2 uses a different filter, so
+            # only its average deviation is bounded.
+            if backend == "pil":
+                ok = diff.max() <= 1.0
+            else:
+                ok = diff.mean() <= 2.0
+            failures += not ok
+            print(f"    {backend:<5} {new_ms:8.2f} ms  x{legacy_ms / new_ms:5.2f}  "
+                  f"max|diff|={diff.max():5.1f} mean|diff|={diff.mean():.4f}  "
+                  f"{'OK' if ok else 'MISMATCH'}")
+
+    # Batch fill: legacy concatenation vs in-place fill of a reused buffer
+    decoded = [decode_image(upload) for _ in range(args.batch)]
+    buffer = np.empty((args.batch, IMG_SIZE, IMG_SIZE, 3), dtype=np.float32)
+    legacy_ms = bench(lambda d: np.concatenate(
+        [preprocess_input(np.expand_dims(x.astype(np.float32), 0)) for x in d]), decoded, args.iterations)
+    new_ms = bench(lambda d: preprocess_batch(d, out=buffer), decoded, args.iterations)
+    print(f"\n  batch of {args.batch}")
+    print(f"    concatenate     {legacy_ms:8.2f} ms")
+    print(f"    in-place fill   {new_ms:8.2f} ms  x{legacy_ms / new_ms:5.2f}")
+
+    print("\n" + "=" * 64)
+    if failures:
+        print(f"  {failures} parity check(s) FAILED")
+        sys.exit(1)
+    print("  All parity checks passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,57 @@ PROJECT_ROOT = os.path.dirname(BASE_DIR)
 MODEL_PATH = os.path.join(BASE_DIR, "model", "parkinsons_model.h5")
 CLASS_INDICES_PATH = os.path.join(BASE_DIR, "model", "class_indices.json")
 TRAINING_HISTORY_PATH = os.path.join(BASE_DIR, "model", "training_history.json")
+TFLITE_FP16_PATH = os.path.join(BASE_DIR, "model", "parkinsons_model_fp16.tflite")
+TFLITE_INT8_PATH = os.path.join(BASE_DIR, "model", "parkinsons_model_int8.tflite")
+ONNX_MODEL_PATH = os.path.join(BASE_DIR, "model", "parkinsons_model.onnx")
+
+# Operating thresholds chosen by model/evaluate.py, keyed by model version
+MODEL_METADATA_PATH = os.path.join(BASE_DIR, "model", "model_metadata.json")
+EVALUATION_PATH = os.path.join(BASE_DIR, "model", "evaluation.json")
+EVAL_CACHE_DIR = os.path.join(BASE_DIR, "model", "eval_cache")
+DRAWING_TYPE_EVALUATION_PATH = os.path.join(BASE_DIR, "model", "drawing_type_evaluation.json")
+DEFAULT_THRESHOLD = 0.5  # used when the loaded model has no evaluated threshold
+
+# Models served side by side with the default (combined) model, by name:
+# per drawing type specialists (model/train_model.py --drawing-type spiral|wave)
+# and any other versions worth keeping warm, e.g.
+#   "combined-v2": {"backend": "onnx", "path": "/models/v2.onnx"}
+MODEL_REGISTRY = {
+    "spiral": {"backend": "keras", "path": os.path.join(BASE_DIR, "model", "parkinsons_model_spiral.h5")},
+    "wave": {"backend": "keras", "path": os.path.join(BASE_DIR, "model", "parkinsons_model_wave.h5")},
+}
+DEFAULT_MODEL_NAME = "combined"
+# drawing_type -> model name; types whose model file is missing use the default model
+DRAWING_TYPE_ROUTES = {"spiral": "spiral", "wave": "wave"}
+DRAWING_TYPE_AUTODETECT = True  # guess the type (utils/drawing_type.py) when a request omits it
+MODEL_REGISTRY_MAX_LOADED = 3   # resident models; least recently used are evicted
+MODEL_REGISTRY_PRELOAD = ()     # e.g. ("spiral", "wave") to load at startup, not on first use
+
+# Hot reload (POST /api/admin/reload) and shadow serving of candidate versions.
+# Admin requests need the X-Admin-Token header; without ADMIN_TOKEN the admin
+# routes are disabled. ADMIN_TRUST_LOCALHOST=1 instead admits loopback callers
+# without a token (development only: behind a local reverse proxy every
+# request comes from localhost). Reloaded files must live in MODEL_DIR.
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+ADMIN_TRUST_LOCALHOST = bool(int(os.environ.get("ADMIN_TRUST_LOCALHOST", 0)))
+MODEL_DIR = os.path.join(BASE_DIR, "model")
+MODEL_WATCH_INTERVAL = float(os.environ.get("MODEL_WATCH_INTERVAL", 0))  # seconds; 0 = no file watch
+# Admin changes are recorded here and applied by every worker (utils/serving_state.py)
+SERVING_STATE_DIR = os.path.join(MODEL_DIR, "serving_state")
+SERVING_STATE_INTERVAL = float(os.environ.get("SERVING_STATE_INTERVAL", 2.0))  # seconds between polls
+SHADOW_MAX_PENDING = 16  # mirrored samples in flight before more are skipped
+
+# Inference backend: "keras" (full model, Grad-CAM available), "tflite" or "onnx"
+MODEL_BACKEND = os.environ.get("MODEL_BACKEND", "keras")
+TFLITE_MODEL_PATH = os.environ.get("TFLITE_MODEL_PATH", TFLITE_FP16_PATH)
+
+# ONNX Runtime session options (threads: 0 = ORT default)
+ONNX_INTRA_OP_THREADS = int(os.environ.get("ONNX_INTRA_OP_THREADS", 0))
+ONNX_INTER_OP_THREADS = int(os.environ.get("ONNX_INTER_OP_THREADS", 0))
+ONNX_GRAPH_OPTIMIZATION = "all"      # disable | basic | extended | all
+ONNX_EXECUTION_MODE = "sequential"   # sequential | parallel
 IMG_SIZE = 224
+PREPROCESS_RESIZE_BACKEND = "pil"  # "pil" (matches training) or "cv2" (faster downscaling)
 
 # Dataset paths (in order of preference)
 DATASET_PATHS = [
@@ -15,8 +65,64 @@ DATASET_PATHS = [
     os.path.join(PROJECT_ROOT, "drawings"),              # Original extracted drawings
 ]
 
+# tf.data cache of decoded training images
+TFDATA_CACHE_DIR = os.path.join(BASE_DIR, "model", "tfdata_cache")
+
+# Compiled (memory-mapped) dataset, see model/dataset_cache.py
+DATASET_CACHE_DIR = os.path.join(BASE_DIR, "model", "dataset_cache")
+
+# Cached backbone embeddings for fast Phase 1, see model/feature_cache.py
+FEATURE_CACHE_DIR = os.path.join(BASE_DIR, "model", "feature_cache")
+
+# Hyperparameter sweeps (model/sweep.py): one subfolder per sweep
+SWEEP_DIR = os.path.join(BASE_DIR, "model", "sweeps")
+
 # Upload
-UPLOAD_FOLDER = os.path.join(BASE_DIR, "uploads")
 STATIC_FOLDER = os.path.join(BASE_DIR, "static")
 ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "bmp", "webp"}
 MAX_CONTENT_LENGTH = 10 * 1024 * 1024  # 10 MB
+
+# Generated images (Grad-CAM overlays, originals) in STATIC_FOLDER
+ARTIFACT_MAX_BYTES = 2 * 1024 * 1024 * 1024  # 2 GB
+ARTIFACT_MAX_FILES = 200_000
+ARTIFACT_MAX_AGE = 24 * 60 * 60              # seconds
+ARTIFACT_SWEEP_INTERVAL = 300                # seconds between eviction passes
+ARTIFACT_SHARD_DEPTH = 2                     # ab/cd/<file> subdirectory levels
+
+# Inference micro-batching
+BATCH_MAX_SIZE = 8       # largest batch run in one forward pass
+BATCH_MAX_WAIT_MS = 5.0  # how long a request may wait for others to join its batch
+
+# Serving graph: batch sizes traced and warmed at startup
+SERVING_BUCKETS = (1, 2, 4, 8)
+
+# Test-time augmentation (?tta=K on the predict endpoints): views per request
+# are capped here; keep it <= BATCH_MAX_SIZE so all views share one batch
+TTA_MAX_VIEWS = 8
+
+# Grad-CAM target layer name (None = last Conv2D, e.g. "top_conv" for EfficientNetB0)
+GRAD_CAM_LAYER = None
+
+# Background Grad-CAM rendering (?explain=async)
+EXPLAIN_WORKERS = 2
+EXPLAIN_MAX_PENDING = 32   # jobs queued or running before new ones are rejected
+EXPLAIN_JOB_TTL = 600      # seconds a finished job stays pollable
+# Job states shared by all gunicorn workers, so any worker can answer a poll
+EXPLAIN_JOB_DIR = os.path.join(BASE_DIR, "cache", "explain_jobs")
+
+# Prediction cache (keyed by image hash + model version)
+PREDICTION_CACHE_SIZE = 1024
+PREDICTION_CACHE_DIR = None  # e.g. os.path.join(BASE_DIR, "cache", "predictions") for a disk tier
+
+# Batch endpoint
+PREDICT_BATCH_MAX_ITEMS = 16  # images accepted per /api/predict-batch request
+PREPROCESS_WORKERS = 4        # threads decoding batch items in parallel
+
+# Metrics (/metrics, Prometheus text format). SERVER_TIMING=1 also adds a
+# Server-Timing header with per-stage durations to every API response.
+SERVER_TIMING = bool(int(os.environ.get("SERVER_TIMING", 0)))
+
+# TensorFlow thread pools per server process (0 = TensorFlow default).
+# gunicorn.conf.py derives these from the core count and worker count.
+TF_INTRA_OP_THREADS = int(os.environ.get("TF_INTRA_OP_THREADS", 0))
+TF_INTER_OP_THREADS = int(os.environ.get("TF_INTER_OP_THREADS", 0))
@@ -0,0 +1,46 @@
+"""
+Gunicorn configuration for production serving.
+
+Usage (from backend/):
+    gunicorn -c gunicorn.conf.py
+
+The master only imports the app (preload_app); TensorFlow and the model are
+loaded in each worker after the fork (post_fork), because the TF runtime and
+its thread pools are not fork-safe. Workers answer /api/health/ready with
+503 until their model is warm.
+Environment overrides:
+    BIND                 Address to bind (default 0.0.0.0:5001)
+    WEB_WORKERS          Worker processes (default: half the cores, at least 1)
+    WEB_THREADS          Request threads per worker (default 4)
+    TF_INTRA_OP_THREADS  TensorFlow intra-op threads per worker
+    TF_INTER_OP_THREADS  TensorFlow inter-op threads per worker
+"""
+
+import os
+import multiprocessing
+
+cores = multiprocessing.cpu_count()
+
+bind = os.environ.get("BIND", "0.0.0.0:5001")
+workers = int(os.environ.get("WEB_WORKERS", max(cores // 2, 1)))
+threads = int(os.environ.get("WEB_THREADS", 4))
+worker_class = "gthread"
+timeout = 120
+graceful_timeout = 30
+
+# Import the app once in the master; the model itself is loaded per worker
+preload_app = True
+wsgi_app = "app:create_app(load='none')"
+
+# Split the cores between workers so TensorFlow pools don't oversubscribe
+# the CPU. These must be in the environment before the app (and TF) loads.
+os.environ.setdefault("TF_INTRA_OP_THREADS", str(max(cores // workers, 1)))
+os.environ.setdefault("TF_INTER_OP_THREADS", "1")
+os.environ["WEB_WORKERS"] = str(workers)
+os.environ["WEB_THREADS"] = str(threads)
+
+
+def post_fork(server, worker):
+    """Load the model in the forked worker, never in the master."""
+    import app
+    app.start_background_load()
@@ -0,0 +1,271 @@
+"""
+Parkinson's Disease Detection - Compiled Dataset Cache
+Decodes and resizes the dataset once into memory-mapped .npy files so
+training, export and evaluation scripts open it zero-copy instead of
+re-decoding every image with PIL on each run.
+
+Layout (DATASET_CACHE_DIR):
+    images.npy          uint8 (N, IMG_SIZE, IMG_SIZE, 3)
+    labels.npy          int8  (N,)   0 = healthy, 1 = parkinson
+    drawing_types.npy   int8  (N,)   index into manifest["drawing_types"]
+    manifest.json       source path, size, mtime and MD5 of every image,
+                        plus a fingerprint over all hashes
+
+The cache is rebuilt whenever the set of source files or any file's MD5
+changes. Size/mtime are only used to skip re-hashing untouched files.
+
+Usage:
+    python model/dataset_cache.py [--force] [--workers 8]
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+from PIL import Image
+
+# Add parent to path for config import
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import IMG_SIZE, DATASET_CACHE_DIR
+from dataset_paths import find_dataset, prepare_data
+
+CACHE_FORMAT_VERSION = 1
+DRAWING_TYPES = ("spiral", "wave")
+
+MANIFEST_FILE = "manifest.json"
+IMAGES_FILE = "images.npy"
+LABELS_FILE = "labels.npy"
+TYPES_FILE = "drawing_types.npy"
+
+
+@dataclass
+class CompiledDataset:
+    """Read-only view of a compiled dataset (images is a np.memmap)."""
+    images: np.ndarray
+    labels: np.ndarray
+    drawing_types: np.ndarray
+    paths: list
+    manifest: dict
+
+    def __len__(self):
+        return len(self.labels)
+
+    def select(self, drawing_type):
+        """Indices of the images of one drawing type."""
+        code = self.manifest["drawing_types"].index(drawing_type)
+        return np.flatnonzero(self.drawing_types == code)
+
+
+def file_md5(path, chunk_size=1 << 20):
+    h = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def list_sources(dataset_dir):
+    """(path, label, drawing_type) for every image, in training order."""
+    sources = []
+    for drawing_type in DRAWING_TYPES:
+        images, labels = prepare_data(dataset_dir, drawing_type)
+        sources.extend((p, l, drawing_type) for p, l in zip(images, labels))
+    return sources
+
+
+def fingerprint(entries):
+    """Stable hash over (path, label, drawing type, md5) of all images."""
+    h = hashlib.sha256(f"v{CACHE_FORMAT_VERSION}:{IMG_SIZE}".encode())
+    for e in entries:
+        h.update(f"{e['path']}|{e['label']}|{e['drawing_type']}|{e['md5']}\n".encode())
+    return h.hexdigest()
+
+
+def read_manifest(cache_dir=DATASET_CACHE_DIR):
+    path = os.path.join(cache_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def hash_sources(sources, previous=None, workers=8):
+    """
+    Build manifest entries for sources. Files whose size and mtime match the
+    previous manifest reuse its MD5; all others are hashed in parallel.
+    """
+    known = {}
+    if previous:
+        known = {e["path"]: e for e in previous.get("files", [])}
+
+    def entry(source):
+        path, label, drawing_type = source
+        stat = os.stat(path)
+        old = known.get(path)
+        if old and old["size"] == stat.st_size and old["mtime"] == stat.st_mtime:
+            md5 = old["md5"]
+        else:
+            md5 = file_md5(path)
+        return {
+            "path": path,
+            "label": int(label),
+            "drawing_type": drawing_type,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "md5": md5,
+        }
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(entry, sources))
+
+
+def _decode(path):
+    # PIL bicubic resize, matching utils.preprocessing at serving time
+    img = Image.open(path).convert("RGB").resize((IMG_SIZE, IMG_SIZE))
+    return np.asarray(img, dtype=np.uint8)
+
+
+def compile_dataset(dataset_dir, entries, cache_dir=DATASET_CACHE_DIR, workers=8):
+    """Decode entries in parallel into memory-mapped arrays and write the manifest."""
+    os.makedirs(cache_dir, exist_ok=True)
+    start = time.perf_counter()
+    manifest_path = os.path.join(cache_dir, MANIFEST_FILE)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+
+    # Decode straight into the memmap rows so the dataset never sits in RAM
+    tmp_images = os.path.join(cache_dir, IMAGES_FILE + ".tmp")
+    images = np.lib.format.open_memmap(
+        tmp_images, mode="w+", dtype=np.uint8, shape=(len(entries), IMG_SIZE, IMG_SIZE, 3)
+    )
+
+    def decode(i):
+        try:
+            images[i] = _decode(entries[i]["path"])
+            return True
+        except Exception as exc:
+            print(f"  Skipping {entries[i]['path']}: {exc}")
+            return False
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        ok = list(pool.map(decode, range(len(entries))))
+
+    kept = [i for i, good in enumerate(ok) if good]
+    if len(kept) < len(entries):
+        # Compact into a file without the unreadable rows
+        compact_path = tmp_images + ".compact"
+        compact = np.lib.format.open_memmap(
+            compact_path, mode="w+", dtype=np.uint8, shape=(len(kept), IMG_SIZE, IMG_SIZE, 3)
+        )
+        for row, i in enumerate(kept):
+            compact[row] = images[i]
+        compact.flush()
+        del compact, images
+        os.replace(compact_path, tmp_images)
+    else:
+        images.flush()
+        del images
+
+    files = [entries[i] for i in kept]
+    labels = np.array([e["label"] for e in files], dtype=np.int8)
+    types = np.array([DRAWING_TYPES.index(e["drawing_type"]) for e in files], dtype=np.int8)
+    np.save(os.path.join(cache_dir, LABELS_FILE), labels)
+    np.save(os.path.join(cache_dir, TYPES_FILE), types)
+    os.replace(tmp_images, os.path.join(cache_dir, IMAGES_FILE))
+
+    manifest = {
+        "version": CACHE_FORMAT_VERSION,
+        "img_size": IMG_SIZE,
+        "dataset_dir": dataset_dir,
+        "drawing_types": list(DRAWING_TYPES),
+        "count": len(files),
+        # Fingerprint covers every source, including skipped ones, so a
+        # previously unreadable file being fixed also invalidates the cache
+        "fingerprint": fingerprint(entries),
+        "created": time.time(),
+        "compile_seconds": round(time.perf_counter() - start, 2),
+        "files": files,
+        "skipped": [e["path"] for e, good in zip(entries, ok) if not good],
+    }
+    # Manifest last: its presence marks the arrays as complete
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f)
+    print(f"  Compiled {len(files)} images into {cache_dir} "
+          f"in {manifest['compile_seconds']:.1f}s")
+    return manifest
+
+
+def _open(cache_dir, manifest):
+    images = np.load(os.path.join(cache_dir, IMAGES_FILE), mmap_mode="r")
+    labels = np.load(os.path.join(cache_dir, LABELS_FILE))
+    types = np.load(os.path.join(cache_dir, TYPES_FILE))
+    return CompiledDataset(
+        images=images,
+        labels=labels,
+        drawing_types=types,
+        paths=[e["path"] for e in manifest["files"]],
+        manifest=manifest,
+    )
+
+
+def open_dataset(dataset_dir=None, cache_dir=DATASET_CACHE_DIR, force=False, workers=8):
+    """
+    Open the compiled dataset, (re)building it first if it is missing or
+    any source file was added, removed or changed.
+    Returns a CompiledDataset, or None if no dataset is available.
+    """
+    dataset_dir = dataset_dir or find_dataset()
+    if not dataset_dir:
+        return None
+
+    previous = read_manifest(cache_dir)
+    entries = hash_sources(list_sources(dataset_dir), previous, workers)
+    if not entries:
+        return None
+
+    if (not force and previous
+            and previous.get("version") == CACHE_FORMAT_VERSION
+            and previous.get("img_size") == IMG_SIZE
+            and previous.get("fingerprint") == fingerprint(entries)
+            and os.path.exists(os.path.join(cache_dir, IMAGES_FILE))):
+        print(f"  Using compiled dataset: {previous['count']} images ({cache_dir})")
+        return _open(cache_dir, previous)
+
+    print("  Compiling dataset cache" + (" (sources changed)" if previous else "") + "...")
+    manifest = compile_dataset(dataset_dir, entries, cache_dir, workers)
+    return _open(cache_dir, manifest)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile the dataset into a memory-mapped cache.")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the cache is valid")
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("  Parkinson's Disease Detection - Compile Dataset")
+    print("=" * 60)
+
+    data = open_dataset(force=args.force, workers=args.workers)
+    if data is None:
+        print("\nERROR: No dataset found!")
+        sys.exit(1)
+
+    for drawing_type in data.manifest["drawing_types"]:
+        idx = data.select(drawing_type)
+        print(f"  {drawing_type}: {len(idx)} images "
+              f"({int(data.labels[idx].sum())} parkinson)")
+    print(f"  {data.images.nbytes / 1e6:.1f} MB at {DATASET_CACHE_DIR}")
+
+
+if __name__ == "__main__":
+    main()
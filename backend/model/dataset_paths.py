@@ -0,0 +1,105 @@
+"""
+Parkinson's Disease Detection - Dataset Locations
+Finds the dataset directory, lists its image files with labels and splits
+them the way training does. Kept free of TensorFlow so dataset_cache.py,
+evaluate.py and the export scripts can use it without paying the TF import.
+"""
+
+import os
+import sys
+
+# Add parent to path for config import
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import DATASET_PATHS
+
+
+def find_dataset():
+    """Find the first available dataset directory."""
+    for path in DATASET_PATHS:
+        if os.path.exists(path):
+            # Check if it has spiral or wave subdirectories
+            for subdir in sorted(os.listdir(path)):
+                subpath = os.path.join(path, subdir)
+                if os.path.isdir(subpath) and subdir.lower() in ("spiral", "wave"):
+                    print(f"Found dataset at: {path}")
+                    return path
+    return None
+
+
+def prepare_data(dataset_dir, drawing_type="spiral"):
+    """
+    Prepare image paths and labels for training.
+    Returns paths for train/val/test splits.
+    """
+    healthy_dir = os.path.join(dataset_dir, drawing_type, "healthy")
+    parkinson_dir = os.path.join(dataset_dir, drawing_type, "parkinson")
+
+    # Also check for 'training' and 'testing' subdirectory structure
+    if not os.path.exists(healthy_dir):
+        # Try the training/testing structure
+        healthy_train = os.path.join(dataset_dir, drawing_type, "training", "healthy")
+        healthy_test = os.path.join(dataset_dir, drawing_type, "testing", "healthy")
+        parkinson_train = os.path.join(dataset_dir, drawing_type, "training", "parkinson")
+        parkinson_test = os.path.join(dataset_dir, drawing_type, "testing", "parkinson")
+
+        if os.path.exists(healthy_train):
+            healthy_dir = None
+            parkinson_dir = None
+            # Gather from both splits
+            all_images = []
+            all_labels = []
+            for d in [healthy_train, healthy_test]:
+                if os.path.exists(d):
+                    for f in sorted(os.listdir(d)):
+                        if f.lower().endswith((".png", ".jpg", ".jpeg")):
+                            all_images.append(os.path.join(d, f))
+                            all_labels.append(0)
+            for d in [parkinson_train, parkinson_test]:
+                if os.path.exists(d):
+                    for f in sorted(os.listdir(d)):
+                        if f.lower().endswith((".png", ".jpg", ".jpeg")):
+                            all_images.append(os.path.join(d, f))
+                            all_labels.append(1)
+            return all_images, all_labels
+
+    if healthy_dir and os.path.exists(healthy_dir):
+        all_images = []
+        all_labels = []
+        for f in sorted(os.listdir(healthy_dir)):
+            if f.lower().endswith((".png", ".jpg", ".jpeg", ".bmp")):
+                all_images.append(os.path.join(healthy_dir, f))
+                all_labels.append(0)
+        for f in sorted(os.listdir(parkinson_dir)):
+            if f.lower().endswith((".png", ".jpg", ".jpeg", ".bmp")):
+                all_images.append(os.path.join(parkinson_dir, f))
+                all_labels.append(1)
+        return all_images, all_labels
+
+    return [], []
+
+
+def gather_images(dataset_dir):
+    """Collect image paths and labels for both spiral and wave drawings."""
+    all_images = []
+    all_labels = []
+
+    for drawing_type in ["spiral", "wave"]:
+        images, labels = prepare_data(dataset_dir, drawing_type)
+        print(f"  {drawing_type}: {len(images)} images")
+        all_images.extend(images)
+        all_labels.extend(labels)
+
+    return all_images, all_labels
+
+
+def split_data(X, y):
+    """Stratified 70/15/15 train/val/test split (fixed seed)."""
+    from sklearn.model_selection import train_test_split
+
+    X_train, X_temp, y_train, y_temp = train_test_split(
+        X, y, test_size=0.3, stratify=y, random_state=42
+    )
+    X_val, X_test, y_val, y_test = train_test_split(
+        X_temp, y_temp, test_size=0.5, stratify=y_temp, random_state=42
+    )
+    return X_train, X_val, X_test, y_train, y_val, y_test
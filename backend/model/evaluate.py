@@ -0,0 +1,389 @@
+"""
+Parkinson's Disease Detection - Evaluation Harness
+Scores a saved model on the compiled dataset (dataset_cache.py) and picks
+an operating threshold for the server.
+
+1. Inference: every image is scored once per test-time augmentation view
+   (utils/tta.py) in large batches. Scores are cached on disk per view,
+   keyed by the model file hash, backend and dataset fingerprint, so
+   re-scoring with other folds, thresholds or metrics never re-runs the
+   model while the cache is valid.
+2. Sweep: for every TTA setting (mean of the first k views) and every
+   threshold, confusion counts are computed per stratified fold in one
+   vectorized pass. For each fold, the threshold maximizing --criterion is
+   selected on the other k-1 folds and scored on the held-out fold, giving
+   out-of-sample mean/std of accuracy, precision, recall, specificity, F1,
+   balanced accuracy and Youden's J.
+3. Curves: ROC and precision-recall curves (with AUCs) per TTA setting.
+4. The median of the per-fold thresholds of every TTA setting is written
+   to MODEL_METADATA_PATH under the model's version; the server applies
+   each one to requests averaging that many views.
+
+--drawing-type spiral|wave scores a specialist (train_model.py
+--drawing-type) on the held-out split of its own drawing type, which is
+the split it was trained without.
+
+Usage:
+    python model/evaluate.py [--backend keras|tflite|onnx] [--folds 5]
+                             [--subset test|all] [--tta-max 8] [--tta 1]
+                             [--criterion youden|f1|balanced_accuracy|accuracy]
+                             [--drawing-type spiral|wave]
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+
+import numpy as np
+
+# Add parent to path for config import
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import (
+    MODEL_PATH, TFLITE_MODEL_PATH, ONNX_MODEL_PATH, MODEL_METADATA_PATH,
+    EVAL_CACHE_DIR, EVALUATION_PATH, DEFAULT_THRESHOLD, MODEL_REGISTRY
+)
+
+from dataset_cache import open_dataset
+from dataset_paths import split_data
+from utils.prediction_cache import model_fingerprint
+from utils.tta import MAX_VIEWS, apply_transform, view_names
+
+MODEL_PATHS = {"keras": MODEL_PATH, "tflite": TFLITE_MODEL_PATH, "onnx": ONNX_MODEL_PATH}
+CRITERIA = ("youden", "f1", "balanced_accuracy", "accuracy")
+CURVE_POINTS = 200
+
+
+def load_serving(backend, model_path, batch_size):
+    """A BucketedServing model for batch inference (same classes as the server)."""
+    from utils import serving
+
+    if backend == "keras":
+        import tensorflow as tf
+        return serving.ServingModel(tf.keras.models.load_model(model_path), buckets=(batch_size,))
+    if backend == "tflite":
+        return serving.TFLiteServingModel(model_path, buckets=(batch_size,))
+    return serving.OnnxServingModel(model_path, buckets=(batch_size,))
+
+
+class ScoreCache:
+    """
+    Per-view score vectors for every image of the compiled dataset, stored as
+    float32 .npy files with NaN for images not scored yet.
+    """
+
+    def __init__(self, version, dataset_fingerprint, size, cache_dir=EVAL_CACHE_DIR):
+        self.size = size
+        self.cache_dir = cache_dir
+        self.prefix = hashlib.sha256(f"{version}|{dataset_fingerprint}".encode()).hexdigest()[:16]
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, view):
+        return os.path.join(self.cache_dir, f"{self.prefix}_{view_names(view + 1)[-1]}.npy")
+
+    def load(self, view):
+        path = self._path(view)
+        if os.path.exists(path):
+            scores = np.load(path)
+            if scores.shape == (self.size,):
+                return scores
+        return np.full(self.size, np.nan, dtype=np.float32)
+
+    def save(self, view, scores):
+        tmp = self._path(view) + ".tmp.npy"
+        np.save(tmp, scores)
+        os.replace(tmp, self._path(view))
+
+
+def score_views(data, indices, views, cache, get_model, batch_size):
+    """(views, len(indices)) scores, running the model only for uncached ones."""
+    out = np.empty((views, len(indices)), dtype=np.float32)
+    for view in range(views):
+        scores = cache.load(view)
+        missing = indices[np.isnan(scores[indices])]
+        if len(missing):
+            model = get_model()
+            start = time.perf_counter()
+            for i in range(0, len(missing), batch_size):
+                rows = np.sort(missing[i:i + batch_size])
+                batch = apply_transform(data.images[rows], view).astype(np.float32)
+                scores[rows] = model.predict(batch).reshape(-1)
+            cache.save(view, scores)
+            print(f"  View {view_names(view + 1)[-1]:<14} scored {len(missing)} images "
+                  f"in {time.perf_counter() - start:.1f}s")
+        else:
+            print(f"  View {view_names(view + 1)[-1]:<14} cached")
+        out[view] = scores[indices]
+    return out
+
+
+def fold_assignment(labels, folds, seed=42):
+    """Stratified fold index for every sample."""
+    from sklearn.model_selection import StratifiedKFold
+
+    assignment = np.empty(len(labels), dtype=np.int64)
+    splitter = StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed)
+    for fold, (_, test_idx) in enumerate(splitter.split(np.zeros(len(labels)), labels)):
+        assignment[test_idx] = fold
+    return assignment
+
+
+def fold_counts(view_scores, labels, folds, thresholds):
+    """
+    Confusion counts for every (TTA setting, threshold, fold) in one
+    vectorized pass. view_scores: (V, N); returns (tp, fp, fn, tn) as
+    (V, T, F) arrays plus the (V, N) TTA-averaged scores.
+    """
+    views = view_scores.shape[0]
+    # Mean of the first k views for k = 1..V
+    tta_scores = np.cumsum(view_scores, axis=0) / np.arange(1, views + 1)[:, None]
+
+    predicted = tta_scores[:, None, :] > thresholds[None, :, None]            # (V, T, N)
+    fold_onehot = (folds[None, :] == np.arange(folds.max() + 1)[:, None])     # (F, N)
+    positive = labels.astype(bool)
+
+    pos_by_fold = (fold_onehot & positive).astype(np.float64)
+    neg_by_fold = (fold_onehot & ~positive).astype(np.float64)
+    pred = predicted.astype(np.float64)
+    tp = np.einsum("vtn,fn->vtf", pred, pos_by_fold)
+    fp = np.einsum("vtn,fn->vtf", pred, neg_by_fold)
+    fn = pos_by_fold.sum(axis=1)[None, None, :] - tp
+    tn = neg_by_fold.sum(axis=1)[None, None, :] - fp
+    return (tp, fp, fn, tn), tta_scores
+
+
+def metrics_from_counts(tp, fp, fn, tn):
+    """Accuracy, precision, recall, specificity, F1, balanced accuracy, Youden's J."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+        recall = np.where(tp + fn > 0, tp / (tp + fn), 0.0)
+        specificity = np.where(tn + fp > 0, tn / (tn + fp), 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+    return {
+        "accuracy": (tp + tn) / (tp + tn + fp + fn),
+        "precision": precision,
+        "recall": recall,
+        "specificity": specificity,
+        "f1": f1,
+        "balanced_accuracy": (recall + specificity) / 2,
+        "youden": recall + specificity - 1,
+    }
+
+
+def sweep(view_scores, labels, folds, thresholds):
+    """
+    Metrics for every (TTA setting, threshold, fold), each as a (V, T, F)
+    array, computed twice: on fold f itself (held out) and on the other
+    k-1 folds pooled (used to select fold f's threshold).
+
+    Returns (held_out, selection, tta_scores).
+    """
+    counts, tta_scores = fold_counts(view_scores, labels, folds, thresholds)
+    held_out = metrics_from_counts(*counts)
+    selection = metrics_from_counts(*(c.sum(axis=2, keepdims=True) - c for c in counts))
+    return held_out, selection, tta_scores
+
+
+def select_thresholds(objective, thresholds):
+    """
+    Index of the best threshold per (TTA setting, fold) for a (V, T, F)
+    objective; ties go to the threshold nearest DEFAULT_THRESHOLD.
+    """
+    is_best = objective == objective.max(axis=1, keepdims=True)
+    closeness = -np.abs(thresholds - DEFAULT_THRESHOLD)[None, :, None]
+    return np.argmax(np.where(is_best, closeness, -np.inf), axis=1)           # (V, F)
+
+
+def downsample(*arrays, points=CURVE_POINTS):
+    n = len(arrays[0])
+    idx = np.unique(np.linspace(0, n - 1, min(points, n)).astype(int))
+    return [np.asarray(a)[idx].round(5).tolist() for a in arrays]
+
+
+def curves(tta_scores, labels):
+    """ROC and PR curves (downsampled) with AUCs for each TTA setting."""
+    from sklearn.metrics import roc_curve, precision_recall_curve, roc_auc_score, average_precision_score
+
+    result = []
+    for k, scores in enumerate(tta_scores, start=1):
+        fpr, tpr, _ = roc_curve(labels, scores)
+        precision, recall, _ = precision_recall_curve(labels, scores)
+        fpr, tpr = downsample(fpr, tpr)
+        precision, recall = downsample(precision, recall)
+        result.append({
+            "tta": k,
+            "roc_auc": float(roc_auc_score(labels, scores)),
+            "average_precision": float(average_precision_score(labels, scores)),
+            "roc": {"fpr": fpr, "tpr": tpr},
+            "pr": {"precision": precision, "recall": recall},
+        })
+    return result
+
+
+def write_metadata(version, entry):
+    """Record the operating point for one model version (other versions kept)."""
+    metadata = {}
+    if os.path.exists(MODEL_METADATA_PATH):
+        with open(MODEL_METADATA_PATH, "r") as f:
+            metadata = json.load(f)
+    metadata.setdefault("models", {})[version] = entry
+    tmp = MODEL_METADATA_PATH + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(metadata, f, indent=2)
+    os.replace(tmp, MODEL_METADATA_PATH)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate a saved model and pick its threshold.")
+    parser.add_argument("--backend", choices=list(MODEL_PATHS), default="keras")
+    parser.add_argument("--model", help="Model file (default: the backend's configured path, "
+                                        "or the specialist's registry path with --drawing-type)")
+    parser.add_argument("--subset", choices=["test", "all"], default="test",
+                        help="Held-out test split of train_model.py, or every image")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--tta-max", type=int, default=MAX_VIEWS,
+                        help=f"Views to score (1..{MAX_VIEWS}); every k up to this is swept")
+    parser.add_argument("--tta", type=int, default=1,
+                        help="TTA setting reported as the headline operating point "
+                             "(a threshold is stored for every setting)")
+    parser.add_argument("--criterion", choices=CRITERIA, default="youden")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--no-write", action="store_true", help="Don't update model metadata")
+    parser.add_argument("--drawing-type", choices=["spiral", "wave"],
+                        help="Evaluate a specialist on its own drawing type only")
+    args = parser.parse_args()
+
+    views = max(1, min(args.tta_max, MAX_VIEWS))
+    if not 1 <= args.tta <= views:
+        parser.error(f"--tta must be between 1 and {views}")
+    if args.folds < 2:
+        parser.error("--folds must be at least 2")
+    model_path = args.model or MODEL_PATHS[args.backend]
+    evaluation_path = EVALUATION_PATH
+    if args.drawing_type:
+        specialist = MODEL_REGISTRY[args.drawing_type]
+        if not args.model:
+            if specialist["backend"] != args.backend:
+                parser.error(f"The {args.drawing_type} model is a {specialist['backend']} model; "
+                             f"pass --model for other backends")
+            model_path = specialist["path"]
+        root, ext = os.path.splitext(EVALUATION_PATH)
+        evaluation_path = f"{root}_{args.drawing_type}{ext}"
+
+    print("=" * 60)
+    print("  Parkinson's Disease Detection - Evaluation")
+    print("=" * 60)
+
+    if not os.path.exists(model_path):
+        print(f"\nERROR: Model not found at {model_path}.")
+        sys.exit(1)
+    data = open_dataset()
+    if data is None:
+        print("\nERROR: No dataset found!")
+        sys.exit(1)
+
+    version = f"{args.backend}:{model_fingerprint(model_path)}"
+    # Same image set and split as train_model.py used for this model
+    pool = np.arange(len(data)) if args.drawing_type is None else data.select(args.drawing_type)
+    if args.subset == "test":
+        _, _, indices, _, _, _ = split_data(pool, data.labels[pool])
+    else:
+        print("  WARNING: --subset all includes images the model was trained on.")
+        indices = pool
+    indices = np.sort(indices)
+    labels = data.labels[indices].astype(np.int64)
+    print(f"\n  Model {version} | {len(indices)} {args.drawing_type or 'combined'} images "
+          f"({args.subset}) | {args.folds} folds | TTA up to {views}")
+
+    # 1. Scores per view (cached)
+    served = {}
+
+    def get_model():
+        if "model" not in served:
+            served["model"] = load_serving(args.backend, model_path, args.batch_size)
+        return served["model"]
+
+    cache = ScoreCache(version, data.manifest["fingerprint"], len(data))
+    view_scores = score_views(data, indices, views, cache, get_model, args.batch_size)
+
+    # 2. Threshold x TTA x fold sweep. Each fold's threshold is selected on
+    # the other k-1 folds and scored on the held-out fold, so the reported
+    # metrics at the selected thresholds are out of sample.
+    thresholds = np.round(np.linspace(0.0, 1.0, 201), 3)
+    folds = fold_assignment(labels, args.folds)
+    held_out, selection, tta_scores = sweep(view_scores, labels, folds, thresholds)
+    fold_best = select_thresholds(selection[args.criterion], thresholds)       # (V, F)
+    at_fold_best = {
+        name: np.take_along_axis(m, fold_best[:, None, :], axis=1)[:, 0, :]   # (V, F)
+        for name, m in held_out.items()
+    }
+    default = int(np.argmin(np.abs(thresholds - DEFAULT_THRESHOLD)))
+
+    def summarize(values):
+        return {name: {"mean": float(v.mean()), "std": float(v.std())} for name, v in values.items()}
+
+    per_tta = []
+    for k in range(views):
+        fold_thresholds = thresholds[fold_best[k]]
+        per_tta.append({
+            "tta": k + 1,
+            "views": view_names(k + 1),
+            "at_default_threshold": summarize({n: m[k, default] for n, m in held_out.items()}),
+            "fold_thresholds": fold_thresholds.tolist(),
+            # Served threshold: median of the thresholds selected per fold
+            "best_threshold": round(float(np.median(fold_thresholds)), 3),
+            # Each fold scored at the threshold selected without it
+            "at_best_threshold": summarize({n: m[k] for n, m in at_fold_best.items()}),
+        })
+    curve_data = curves(tta_scores, labels)
+
+    print(f"\n  {'TTA':>3}  {'AUC':>6}  {'acc@0.5':>8}  {'best thr':>8}  {args.criterion:>8}")
+    for row, curve in zip(per_tta, curve_data):
+        print(f"  {row['tta']:>3}  {curve['roc_auc']:6.4f}  "
+              f"{row['at_default_threshold']['accuracy']['mean']:8.4f}  "
+              f"{row['best_threshold']:8.3f}  "
+              f"{row['at_best_threshold'][args.criterion]['mean']:8.4f}")
+
+    headline = per_tta[args.tta - 1]
+    chosen = {
+        "threshold": headline["best_threshold"],
+        "tta": args.tta,
+        # The server applies each threshold only to requests with that many views
+        "thresholds_by_tta": {str(row["tta"]): row["best_threshold"] for row in per_tta},
+        "fold_thresholds": headline["fold_thresholds"],
+        "criterion": args.criterion,
+        "metrics": headline["at_best_threshold"],
+        "subset": args.subset,
+        "drawing_type": args.drawing_type or "combined",
+        "folds": args.folds,
+        "num_images": int(len(indices)),
+        "dataset_fingerprint": data.manifest["fingerprint"],
+        "evaluated_at": time.time(),
+    }
+    report = {
+        "model_version": version,
+        "model_path": model_path,
+        "operating_point": chosen,
+        "per_tta": per_tta,
+        "curves": curve_data,
+        "thresholds": {
+            "values": thresholds.tolist(),
+            # Mean over folds at each fixed threshold (no selection involved)
+            args.criterion: held_out[args.criterion].mean(axis=2).round(5).tolist(),
+        },
+    }
+    with open(evaluation_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n  Report saved to: {evaluation_path}")
+
+    print(f"  Operating threshold: {chosen['threshold']:.3f} (TTA {args.tta}, "
+          f"{args.criterion} {chosen['metrics'][args.criterion]['mean']:.4f})")
+    if not args.no_write:
+        write_metadata(version, chosen)
+        print(f"  Written to: {MODEL_METADATA_PATH}")
+
+
+if __name__ == "__main__":
+    main()
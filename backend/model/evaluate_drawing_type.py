@@ -0,0 +1,110 @@
+"""
+Parkinson's Disease Detection - Drawing Type Detector Evaluation
+Runs the spiral / wave detector the server uses for requests without a
+drawing_type (utils/drawing_type.py) on every image of the compiled dataset
+(dataset_cache.py), which records the drawing type of each image.
+
+Each image is either routed to the right specialist, routed to the wrong
+one, or left undecided and answered by the combined model. Misroutes are
+the costly outcome: an undecided image still gets the combined model.
+
+Usage:
+    python model/evaluate_drawing_type.py [--no-write]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+# Add parent to path for config import
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import DRAWING_TYPE_EVALUATION_PATH
+
+UNDECIDED = "combined"
+
+
+def detector_report(actual, predicted):
+    """
+    Accuracy of detected drawing types against the recorded ones.
+
+    Args:
+        actual: Recorded drawing type per image
+        predicted: Detected drawing type per image (None = undecided)
+
+    Returns:
+        Dict with overall and per-type counts, the accuracy over all images
+        and over the images the detector decided, and the confusion matrix
+        (actual -> detected, undecided counted as "combined").
+    """
+    types = sorted(set(actual))
+    confusion = {t: {p: 0 for p in types + [UNDECIDED]} for t in types}
+    for a, p in zip(actual, predicted):
+        confusion[a][p if p is not None else UNDECIDED] += 1
+
+    def summary(rows):
+        total = sum(sum(confusion[t].values()) for t in rows)
+        correct = sum(confusion[t][t] for t in rows)
+        undecided = sum(confusion[t][UNDECIDED] for t in rows)
+        decided = total - undecided
+        return {
+            "images": total,
+            "correct": correct,
+            "misrouted": decided - correct,
+            "undecided": undecided,
+            "accuracy": correct / total if total else 0.0,
+            "decided_accuracy": correct / decided if decided else 0.0,
+            "undecided_rate": undecided / total if total else 0.0,
+        }
+
+    return {
+        "overall": summary(types),
+        "per_type": {t: summary([t]) for t in types},
+        "confusion": confusion,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the drawing type detector.")
+    parser.add_argument("--no-write", action="store_true",
+                        help=f"Don't save the report to {DRAWING_TYPE_EVALUATION_PATH}")
+    args = parser.parse_args()
+
+    from dataset_cache import open_dataset
+    from utils.drawing_type import detect_drawing_type
+
+    print("=" * 60)
+    print("  Parkinson's Disease Detection - Drawing Type Detector")
+    print("=" * 60)
+
+    data = open_dataset()
+    if data is None:
+        print("\nERROR: No dataset found!")
+        sys.exit(1)
+
+    names = data.manifest["drawing_types"]
+    actual = [names[code] for code in data.drawing_types]
+    started = time.perf_counter()
+    predicted = [detect_drawing_type(data.images[i])[0] for i in range(len(data))]
+    elapsed = time.perf_counter() - started
+
+    report = detector_report(actual, predicted)
+    report["ms_per_image"] = elapsed * 1000.0 / max(len(data), 1)
+    report["dataset_fingerprint"] = data.manifest["fingerprint"]
+    report["evaluated_at"] = time.time()
+
+    print(f"\n  {'type':>8}  {'images':>6}  {'acc':>6}  {'decided':>7}  {'undecided':>9}  {'misrouted':>9}")
+    for name, row in list(report["per_type"].items()) + [("all", report["overall"])]:
+        print(f"  {name:>8}  {row['images']:>6}  {row['accuracy']:6.4f}  "
+              f"{row['decided_accuracy']:7.4f}  {row['undecided_rate']:9.4f}  {row['misrouted']:>9}")
+    print(f"\n  {report['ms_per_image']:.2f} ms per image")
+
+    if not args.no_write:
+        with open(DRAWING_TYPE_EVALUATION_PATH, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"  Report saved to: {DRAWING_TYPE_EVALUATION_PATH}")
+
+
+if __name__ == "__main__":
+    main()
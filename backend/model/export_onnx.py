@@ -0,0 +1,94 @@
+"""
+Parkinson's Disease Detection - ONNX Export Script
+Converts the trained Keras model to ONNX (dynamic batch dimension) with
+tf2onnx and checks that ONNX Runtime reproduces the Keras scores on the
+test split used by train_model.py.
+
+Requires: pip install tf2onnx onnxruntime
+
+Usage:
+    python model/export_onnx.py [--opset 13]
+
+Serve the export with:
+    MODEL_BACKEND=onnx python app.py
+"""
+
+import os
+import sys
+import json
+import argparse
+import numpy as np
+
+# Add parent to path for config import
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import MODEL_PATH, ONNX_MODEL_PATH, TRAINING_HISTORY_PATH, IMG_SIZE
+
+import tensorflow as tf
+from dataset_paths import split_data
+from dataset_cache import open_dataset
+from utils.serving import OnnxServingModel, time_single_image
+
+
+def export():
+    parser = argparse.ArgumentParser(description="Export the trained model to ONNX.")
+    parser.add_argument("--opset", type=int, default=13)
+    args = parser.parse_args()
+
+    import tf2onnx
+
+    print("=" * 60)
+    print("  Parkinson's Disease Detection - ONNX Export")
+    print("=" * 60)
+
+    if not os.path.exists(MODEL_PATH):
+        print(f"\nERROR: Model not found at {MODEL_PATH}. Train it first.")
+        sys.exit(1)
+
+    model = tf.keras.models.load_model(MODEL_PATH)
+    spec = (tf.TensorSpec((None, IMG_SIZE, IMG_SIZE, 3), tf.float32, name="image"),)
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=args.opset,
+                               output_path=ONNX_MODEL_PATH)
+    print(f"\n  ONNX model saved to: {ONNX_MODEL_PATH}")
+
+    data = open_dataset()
+    if data is None:
+        print("\n  No dataset found; skipping parity check.")
+        return
+
+    _, _, idx_test, _, _, y_test = split_data(np.arange(len(data)), data.labels)
+    X_test = data.images[np.sort(idx_test)].astype(np.float32)
+    y_test = data.labels[np.sort(idx_test)]
+
+    served = OnnxServingModel(ONNX_MODEL_PATH)
+    keras_scores = model.predict(X_test, verbose=0).flatten()
+    onnx_scores = served.predict(X_test).flatten()
+
+    keras_accuracy = float(np.mean((keras_scores > 0.5).astype(int) == y_test))
+    onnx_accuracy = float(np.mean((onnx_scores > 0.5).astype(int) == y_test))
+    result = {
+        "path": os.path.relpath(ONNX_MODEL_PATH, os.path.dirname(MODEL_PATH)),
+        "opset": args.opset,
+        "size_bytes": os.path.getsize(ONNX_MODEL_PATH),
+        "accuracy": onnx_accuracy,
+        "accuracy_delta": onnx_accuracy - keras_accuracy,
+        "max_score_delta": float(np.max(np.abs(onnx_scores - keras_scores))),
+        "latency_ms": time_single_image(served.predict, X_test[0]),
+        "keras_latency_ms": time_single_image(lambda b: model(b, training=False), X_test[0]),
+    }
+    print(f"  Keras accuracy {keras_accuracy:.4f} | ONNX accuracy {onnx_accuracy:.4f} "
+          f"| max score delta {result['max_score_delta']:.2e}")
+    print(f"  Latency: Keras {result['keras_latency_ms']:.1f} ms | "
+          f"ONNX Runtime {result['latency_ms']:.1f} ms")
+
+    history = {}
+    if os.path.exists(TRAINING_HISTORY_PATH):
+        with open(TRAINING_HISTORY_PATH, "r") as f:
+            history = json.load(f)
+    history["onnx"] = result
+    with open(TRAINING_HISTORY_PATH, "w") as f:
+        json.dump(history, f, indent=2)
+    print(f"\n  Results saved to: {TRAINING_HISTORY_PATH}")
+
+
+if __name__ == "__main__":
+    export()
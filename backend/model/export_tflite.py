@@ -0,0 +1,144 @@
+"""
+Parkinson's Disease Detection - TFLite Export Script
+Converts the trained Keras model to TFLite with post-training quantization
+(float16 weights, and full int8 calibrated on the combined dataset), then
+scores each export on the same test split used by train_model.py.
+
+Accuracy deltas against the Keras model are recorded under "tflite" in
+training_history.json.
+
+Usage:
+    python model/export_tflite.py [--variants float16 int8] [--calibration-samples 200]
+
+Serve an export with:
+    MODEL_BACKEND=tflite TFLITE_MODEL_PATH=model/parkinsons_model_int8.tflite python app.py
+"""
+
+import os
+import sys
+import json
+import argparse
+import numpy as np
+
+# Add parent to path for config import
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import MODEL_PATH, TRAINING_HISTORY_PATH, TFLITE_FP16_PATH, TFLITE_INT8_PATH
+
+import tensorflow as tf
+from dataset_paths import split_data
+from dataset_cache import open_dataset
+from utils.serving import TFLiteServingModel, time_single_image
+
+VARIANT_PATHS = {
+    "float16": TFLITE_FP16_PATH,
+    "int8": TFLITE_INT8_PATH,
+}
+
+
+def convert(model, variant, calibration_images=None):
+    """Convert a Keras model to TFLite bytes for the given quantization variant."""
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+
+    if variant == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+    elif variant == "int8":
+        def representative_dataset():
+            for img in calibration_images:
+                yield [img[np.newaxis].astype(np.float32)]
+
+        converter.representative_dataset = representative_dataset
+        # Integer kernels throughout; keep float32 input/output so the
+        # serving contract is unchanged.
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    else:
+        raise ValueError(f"Unknown variant '{variant}'")
+
+    return converter.convert()
+
+
+def accuracy(scores, labels):
+    return float(np.mean((scores.flatten() > 0.5).astype(int) == labels))
+
+
+def export():
+    parser = argparse.ArgumentParser(description="Export the trained model to TFLite.")
+    parser.add_argument("--variants", nargs="+", default=list(VARIANT_PATHS),
+                        choices=list(VARIANT_PATHS))
+    parser.add_argument("--calibration-samples", type=int, default=200,
+                        help="Training images used to calibrate int8 ranges")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("  Parkinson's Disease Detection - TFLite Export")
+    print("=" * 60)
+
+    if not os.path.exists(MODEL_PATH):
+        print(f"\nERROR: Model not found at {MODEL_PATH}. Train it first.")
+        sys.exit(1)
+
+    data = open_dataset()
+    if data is None:
+        print("\nERROR: No dataset found! Needed for calibration and evaluation.")
+        sys.exit(1)
+
+    idx_train, _, idx_test, _, _, _ = split_data(np.arange(len(data)), data.labels)
+    rng = np.random.default_rng(42)
+    calibration_idx = np.sort(rng.permutation(idx_train)[:args.calibration_samples])
+    calibration = data.images[calibration_idx]
+    X_test = data.images[np.sort(idx_test)].astype(np.float32)
+    y_test = data.labels[np.sort(idx_test)]
+    print(f"  Calibration: {len(calibration)} | Test: {len(X_test)}")
+
+    model = tf.keras.models.load_model(MODEL_PATH)
+    keras_scores = model.predict(X_test, verbose=0)
+    keras_accuracy = accuracy(keras_scores, y_test)
+    keras_latency = time_single_image(lambda b: model(b, training=False), X_test[0])
+    print(f"\n  Keras: accuracy {keras_accuracy:.4f} | {keras_latency:.1f} ms/image")
+
+    results = {}
+    for variant in args.variants:
+        print(f"\nConverting {variant}...")
+        path = VARIANT_PATHS[variant]
+        with open(path, "wb") as f:
+            f.write(convert(model, variant, calibration))
+
+        served = TFLiteServingModel(path, buckets=(1, 8))
+        scores = served.predict(X_test.astype(np.float32))
+        variant_accuracy = accuracy(scores, y_test)
+        latency = time_single_image(served.predict, X_test[0])
+
+        results[variant] = {
+            "path": os.path.relpath(path, os.path.dirname(MODEL_PATH)),
+            "size_bytes": os.path.getsize(path),
+            "accuracy": variant_accuracy,
+            "accuracy_delta": variant_accuracy - keras_accuracy,
+            "max_score_delta": float(np.max(np.abs(scores.flatten() - keras_scores.flatten()))),
+            "latency_ms": latency,
+        }
+        print(f"  {variant}: accuracy {variant_accuracy:.4f} "
+              f"(delta {variant_accuracy - keras_accuracy:+.4f}) | "
+              f"{latency:.1f} ms/image | {results[variant]['size_bytes'] / 1e6:.1f} MB")
+
+    # Record alongside the training metrics
+    history = {}
+    if os.path.exists(TRAINING_HISTORY_PATH):
+        with open(TRAINING_HISTORY_PATH, "r") as f:
+            history = json.load(f)
+    tflite = history.get("tflite", {})
+    tflite.update({
+        "keras_accuracy": keras_accuracy,
+        "keras_latency_ms": keras_latency,
+        "keras_size_bytes": os.path.getsize(MODEL_PATH),
+        "test_size": len(X_test),
+    })
+    tflite.setdefault("variants", {}).update(results)
+    history["tflite"] = tflite
+
+    with open(TRAINING_HISTORY_PATH, "w") as f:
+        json.dump(history, f, indent=2)
+    print(f"\n  Results saved to: {TRAINING_HISTORY_PATH}")
+
+
+if __name__ == "__main__":
+    export()
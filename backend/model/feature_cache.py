@@ -0,0 +1,133 @@
+"""
+Parkinson's Disease Detection - Backbone Feature Cache
+Fast Phase 1 for train_model.py: while the EfficientNetB0 backbone is
+frozen, its pooled output for a given input never changes, so it is
+computed once for a fixed number of views per image (view 0 unaugmented,
+the rest through the training augmentation) and stored on disk. The
+classification head is then trained on those embeddings in seconds and
+its weights copied into the full model before Phase 2 fine-tuning.
+
+Layout (FEATURE_CACHE_DIR/<key>/):
+    features.npy    float16 (views, N, 1280) pooled backbone outputs
+    meta.json       dataset fingerprint, views, seed and extraction time
+
+The key covers the compiled dataset fingerprint (dataset_cache.py), image
+size, number of views and seed, so any change re-extracts.
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+
+import numpy as np
+
+# Add parent to path for config import
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import IMG_SIZE, FEATURE_CACHE_DIR
+
+import tensorflow as tf
+from train_model import SEED, build_head, make_array_dataset, make_augment_fn
+
+FEATURES_FILE = "features.npy"
+META_FILE = "meta.json"
+BACKBONE = "efficientnetb0-imagenet"
+
+
+def cache_key(data, views, seed=SEED):
+    raw = f"{BACKBONE}|{IMG_SIZE}|{views}|{seed}|{data.manifest['fingerprint']}"
+    return hashlib.sha256(raw.encode()).hexdigest()[:16]
+
+
+def feature_extractor(model):
+    """Backbone + pooling of a model built by train_model.build_model()."""
+    return tf.keras.Model(model.input, model.get_layer("head_pool").output)
+
+
+def extract_features(model, data, views=4, batch_size=64, cache_dir=FEATURE_CACHE_DIR):
+    """
+    Pooled backbone embeddings for every image of the compiled dataset, as a
+    read-only (views, N, D) float16 memmap. Loaded from disk when a matching
+    cache exists, otherwise computed and stored.
+    """
+    key_dir = os.path.join(cache_dir, cache_key(data, views))
+    features_path = os.path.join(key_dir, FEATURES_FILE)
+    meta_path = os.path.join(key_dir, META_FILE)
+    if os.path.exists(meta_path) and os.path.exists(features_path):
+        print(f"  Using cached backbone features ({key_dir})")
+        return np.load(features_path, mmap_mode="r")
+
+    os.makedirs(key_dir, exist_ok=True)
+    extractor = feature_extractor(model)
+    embed = tf.function(lambda x: extractor(x, training=False))
+    augment = make_augment_fn()
+    n = len(data)
+    dim = extractor.output_shape[-1]
+
+    start = time.perf_counter()
+    tmp_path = f"{features_path}.{os.getpid()}.tmp"
+    features = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float16,
+                                         shape=(views, n, dim))
+    for view in range(views):
+        # Fixed order (no shuffle) so row i of every view is image i
+        ds = make_array_dataset(data.images, data.labels, np.arange(n),
+                                batch_size=batch_size, shuffle=False)
+        row = 0
+        for images, _ in ds:
+            if view > 0:
+                images = augment(images)
+            out = embed(images).numpy()
+            features[view, row:row + len(out)] = out
+            row += len(out)
+        print(f"  Extracted view {view + 1}/{views}")
+    features.flush()
+    del features
+    os.replace(tmp_path, features_path)
+
+    meta = {
+        "backbone": BACKBONE,
+        "img_size": IMG_SIZE,
+        "views": views,
+        "seed": SEED,
+        "dataset_fingerprint": data.manifest["fingerprint"],
+        "count": n,
+        "dim": int(dim),
+        "extract_seconds": round(time.perf_counter() - start, 2),
+    }
+    with open(meta_path, "w") as f:
+        json.dump(meta, f, indent=2)
+    print(f"  Cached {views}x{n} features in {meta['extract_seconds']:.1f}s")
+    return np.load(features_path, mmap_mode="r")
+
+
+def build_head_model(dim, dropout=0.3):
+    """The classification head alone, on pooled features."""
+    inputs = tf.keras.Input(shape=(dim,), name="features")
+    return tf.keras.Model(inputs, build_head(inputs, dropout))
+
+
+def head_datasets(features, labels, idx_train, idx_val, batch_size):
+    """
+    Training set: every view of every training image, shuffled.
+    Validation set: the unaugmented view of each validation image.
+    """
+    views = features.shape[0]
+    x_train = np.concatenate([features[v, idx_train] for v in range(views)]).astype(np.float32)
+    y_train = np.tile(labels[idx_train].astype(np.float32), views)
+    x_val = features[0, idx_val].astype(np.float32)
+    y_val = labels[idx_val].astype(np.float32)
+
+    train_ds = (tf.data.Dataset.from_tensor_slices((x_train, y_train))
+                .shuffle(len(x_train), seed=SEED, reshuffle_each_iteration=True)
+                .batch(batch_size)
+                .prefetch(tf.data.AUTOTUNE))
+    val_ds = tf.data.Dataset.from_tensor_slices((x_val, y_val)).batch(batch_size)
+    return train_ds, val_ds, len(x_train)
+
+
+def transfer_head(head, model):
+    """Copy trained head weights into the full model (matched by layer name)."""
+    for layer in head.layers:
+        if layer.weights:
+            model.get_layer(layer.name).set_weights(layer.get_weights())
@@ -0,0 +1,280 @@
+"""
+Parkinson's Disease Detection - Hyperparameter Sweep
+Runs train_model.train() trials in parallel worker processes with a
+per-trial CPU thread budget, and stops weak trials early with ASHA
+(asynchronous successive halving). At every rung (grace * eta^k epochs,
+counted across both phases) a trial only continues if its best
+val_accuracy so far is in the top 1/eta of the trials that reached that
+rung before it.
+
+Trials share the compiled dataset cache (dataset_cache.py), which is built
+once before any worker starts. Each trial writes its checkpoint and history
+under SWEEP_DIR/<sweep>/trial_NNN/. The leaderboard is rewritten after every
+finished trial, and the best checkpoint is promoted to MODEL_PATH at the end.
+
+Search space (JSON file, or the built-in DEFAULT_SPACE):
+    {"lr_head": {"loguniform": [1e-4, 3e-3]},
+     "dropout": {"uniform": [0.1, 0.5]},
+     "batch_size": {"choice": [16, 32]},
+     "unfreeze_layers": 20}
+
+Usage:
+    python model/sweep.py [--trials 16] [--workers 2] [--threads-per-trial 4]
+                          [--space space.json] [--eta 3] [--grace-epochs 2]
+                          [--phase1 full|features] [--precision ...] [--jit-compile]
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import shutil
+import random
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing.managers import BaseManager
+
+# Add parent to path for config import
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import MODEL_PATH, TRAINING_HISTORY_PATH, SWEEP_DIR
+
+DEFAULT_SPACE = {
+    "batch_size": {"choice": [16, 32]},
+    "lr_head": {"loguniform": [3e-4, 3e-3]},
+    "lr_finetune": {"loguniform": [3e-6, 3e-5]},
+    "dropout": {"uniform": [0.2, 0.5]},
+    "unfreeze_layers": {"choice": [10, 20, 40]},
+    "epochs_head": 20,
+    "epochs_finetune": 30,
+}
+
+
+def sample(space, rng):
+    """Draw one hyperparameter set from the search space."""
+    params = {}
+    for name, spec in space.items():
+        if not isinstance(spec, dict):
+            params[name] = spec
+        elif "choice" in spec:
+            params[name] = rng.choice(spec["choice"])
+        elif "uniform" in spec:
+            params[name] = rng.uniform(*spec["uniform"])
+        elif "loguniform" in spec:
+            lo, hi = spec["loguniform"]
+            params[name] = 10 ** rng.uniform(math.log10(lo), math.log10(hi))
+        elif "randint" in spec:
+            params[name] = rng.randint(*spec["randint"])
+        else:
+            raise ValueError(f"Unknown search space spec for '{name}': {spec}")
+    return params
+
+
+class ASHAScheduler:
+    """
+    Asynchronous successive halving. Lives in a manager process so every
+    trial worker reports to the same instance.
+
+    Args:
+        max_epochs: Largest budget any trial can use
+        grace_epochs: First rung
+        eta: Reduction factor; the top 1/eta at each rung continue
+    """
+
+    def __init__(self, max_epochs, grace_epochs=2, eta=3):
+        self.eta = eta
+        self.rungs = []
+        rung = grace_epochs
+        while rung < max_epochs:
+            self.rungs.append(rung)
+            rung *= eta
+        self.results = {r: [] for r in self.rungs}
+        self.stopped = {}
+
+    def report(self, trial_id, epoch, metric):
+        """Record a trial's metric; returns True if the trial should stop."""
+        if epoch not in self.results:
+            return False
+        recorded = self.results[epoch]
+        recorded.append(metric)
+        if len(recorded) < self.eta:
+            return False
+        ranked = sorted(recorded, reverse=True)
+        cutoff = ranked[max(len(ranked) // self.eta, 1) - 1]
+        if metric < cutoff:
+            self.stopped[trial_id] = epoch
+            return True
+        return False
+
+    def summary(self):
+        return {"rungs": self.rungs, "eta": self.eta,
+                "reached": {r: len(v) for r, v in self.results.items()},
+                "stopped": dict(self.stopped)}
+
+
+class SweepManager(BaseManager):
+    pass
+
+
+SweepManager.register("ASHAScheduler", ASHAScheduler)
+
+
+def init_worker(threads):
+    """Limit each trial process's CPU threads before TensorFlow starts."""
+    for var in ("OMP_NUM_THREADS", "TF_NUM_INTRAOP_THREADS", "MKL_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    os.environ["TF_NUM_INTEROP_THREADS"] = "1"
+    os.environ["TF_CPP_MIN_LOG_LEVEL"] = "2"
+
+    from utils.serving import configure_tf_threads
+    configure_tf_threads(threads, 1)
+
+
+def run_trial(trial_id, hparams, trial_dir, scheduler, train_kwargs):
+    """Worker entry point: train one configuration and return its result."""
+    import train_model
+
+    class ASHAReport(train_model.TrialStop):
+        def __init__(self):
+            super().__init__()
+            self.best = 0.0
+
+        def should_stop(self, epoch, logs):
+            self.best = max(self.best, float(logs.get("val_accuracy", 0.0)))
+            return scheduler.report(trial_id, epoch, self.best)
+
+    os.makedirs(trial_dir, exist_ok=True)
+    report = ASHAReport()
+    start = time.perf_counter()
+    history = train_model.train(
+        hparams=hparams,
+        model_path=os.path.join(trial_dir, "model.h5"),
+        history_path=os.path.join(trial_dir, "training_history.json"),
+        extra_callbacks=[report],
+        verbose=2,
+        **train_kwargs,
+    )
+    return {
+        "trial": trial_id,
+        "hparams": hparams,
+        "val_accuracy": history["best_val_accuracy"],
+        "test_accuracy": history["metrics"]["accuracy"],
+        "test_f1": history["metrics"]["f1_score"],
+        "epochs": report.epochs_done,
+        "stopped_early": report.trial_stopped,
+        "seconds": round(time.perf_counter() - start, 1),
+        "dir": trial_dir,
+    }
+
+
+def write_leaderboard(path, results, scheduler_summary=None):
+    ranked = sorted(results, key=lambda r: r["val_accuracy"], reverse=True)
+    board = {"updated": time.time(), "trials": ranked}
+    if scheduler_summary:
+        board["scheduler"] = scheduler_summary
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(board, f, indent=2)
+    os.replace(tmp, path)
+    return ranked
+
+
+def promote(best):
+    """Copy the best trial's checkpoint and history over the served model."""
+    shutil.copy2(os.path.join(best["dir"], "model.h5"), MODEL_PATH)
+    shutil.copy2(os.path.join(best["dir"], "training_history.json"), TRAINING_HISTORY_PATH)
+    print(f"\n  Promoted trial {best['trial']} to {MODEL_PATH}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hyperparameter sweep for train_model.py.")
+    parser.add_argument("--trials", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=2, help="Trials run concurrently")
+    parser.add_argument("--threads-per-trial", type=int, default=0,
+                        help="CPU threads per trial (0 = cores / workers)")
+    parser.add_argument("--space", help="JSON search space (default: DEFAULT_SPACE)")
+    parser.add_argument("--eta", type=int, default=3)
+    parser.add_argument("--grace-epochs", type=int, default=2)
+    parser.add_argument("--phase1", choices=["full", "features"], default="full")
+    parser.add_argument("--precision", default="float32",
+                        choices=["float32", "mixed_float16", "mixed_bfloat16"])
+    parser.add_argument("--jit-compile", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--name", default=time.strftime("%Y%m%d-%H%M%S"))
+    parser.add_argument("--no-promote", action="store_true")
+    args = parser.parse_args()
+
+    space = DEFAULT_SPACE
+    if args.space:
+        with open(args.space, "r") as f:
+            space = json.load(f)
+    threads = args.threads_per_trial or max(os.cpu_count() // args.workers, 1)
+
+    print("=" * 60)
+    print(f"  Parkinson's Disease Detection - Sweep '{args.name}'")
+    print(f"  {args.trials} trials | {args.workers} workers x {threads} threads")
+    print("=" * 60)
+
+    # Build (or validate) the shared dataset cache once, before any worker
+    from dataset_cache import open_dataset
+    if open_dataset() is None:
+        print("\nERROR: No dataset found!")
+        sys.exit(1)
+
+    sweep_dir = os.path.join(SWEEP_DIR, args.name)
+    os.makedirs(sweep_dir, exist_ok=True)
+    leaderboard_path = os.path.join(sweep_dir, "leaderboard.json")
+
+    rng = random.Random(args.seed)
+    configs = [sample(space, rng) for _ in range(args.trials)]
+    with open(os.path.join(sweep_dir, "space.json"), "w") as f:
+        json.dump({"space": space, "configs": configs}, f, indent=2)
+
+    max_epochs = max(c.get("epochs_head", 20) + c.get("epochs_finetune", 30) for c in configs)
+    train_kwargs = {"source": "compiled", "phase1": args.phase1,
+                    "precision": args.precision, "jit_compile": args.jit_compile}
+
+    results = []
+    with SweepManager() as manager:
+        scheduler = manager.ASHAScheduler(max_epochs, args.grace_epochs, args.eta)
+        # spawn: TensorFlow is not fork-safe, and each trial gets a fresh runtime
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=args.workers, mp_context=ctx,
+                                 initializer=init_worker, initargs=(threads,)) as pool:
+            futures = {
+                pool.submit(run_trial, i, params,
+                            os.path.join(sweep_dir, f"trial_{i:03d}"), scheduler, train_kwargs): i
+                for i, params in enumerate(configs)
+            }
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"  Trial {i} failed: {e}")
+                    continue
+                results.append(result)
+                status = f"stopped at epoch {result['epochs']}" if result["stopped_early"] else "completed"
+                print(f"  Trial {i}: val_accuracy {result['val_accuracy']:.4f} ({status})")
+                write_leaderboard(leaderboard_path, results, scheduler.summary())
+        scheduler_summary = scheduler.summary()
+
+    if not results:
+        print("\nERROR: No trial finished.")
+        sys.exit(1)
+
+    ranked = write_leaderboard(leaderboard_path, results, scheduler_summary)
+    print(f"\n  Leaderboard: {leaderboard_path}")
+    for r in ranked[:5]:
+        print(f"    trial {r['trial']:>3}  val {r['val_accuracy']:.4f}  "
+              f"test {r['test_accuracy']:.4f}  {r['epochs']} epochs")
+
+    # Only fully trained trials are promotion candidates
+    finished = [r for r in ranked if not r["stopped_early"]]
+    if not args.no_promote and finished:
+        promote(finished[0])
+
+
+if __name__ == "__main__":
+    main()
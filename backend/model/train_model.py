@@ -2,8 +2,28 @@
 Parkinson's Disease Detection - Model Training Script
 Uses EfficientNetB0 with transfer learning for high accuracy.
 
+Images are streamed with a tf.data pipeline (batched augmentation layers,
+prefetch), so the dataset no longer has to fit in RAM. By default the
+pipeline reads the memory-mapped dataset cache built by dataset_cache.py
+(compiled on first use and whenever source files change); --source files
+decodes the image files directly instead.
+
+--precision mixed_float16 / mixed_bfloat16 trains under a Keras mixed
+precision policy (the sigmoid output stays float32) and --jit-compile
+compiles the train step with XLA. Per-epoch wall time and images/sec are
+recorded in training_history.json so modes can be compared.
+
+--phase1 features trains the Phase 1 head on cached backbone embeddings
+(see feature_cache.py) instead of running the frozen backbone every epoch.
+
+--drawing-type spiral|wave trains a specialist on one drawing type and
+saves it where the API's model registry (MODEL_REGISTRY) looks for it.
+
 Usage:
-    python train_model.py
+    python train_model.py [--source compiled|files] [--cache disk|memory|none]
+                          [--precision float32|mixed_float16|mixed_bfloat16] [--jit-compile]
+                          [--phase1 full|features] [--feature-views 4]
+                          [--drawing-type spiral|wave]
 
 Make sure the dataset is prepared first (see dataset/README_DATASET.md).
 """
@@ -11,159 +31,286 @@ Make sure the dataset is prepared first (see dataset/README_DATASET.md).
 import os
 import sys
 import json
+import time
+import hashlib
+import argparse
 import numpy as np
 
 # Add parent to path for config import
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from config import DATASET_PATHS, MODEL_PATH, TRAINING_HISTORY_PATH, CLASS_INDICES_PATH, IMG_SIZE
+from config import (
+    MODEL_PATH, TRAINING_HISTORY_PATH, CLASS_INDICES_PATH, IMG_SIZE,
+    TFDATA_CACHE_DIR, DEFAULT_THRESHOLD, MODEL_REGISTRY
+)
 
 import tensorflow as tf
 from tensorflow.keras.applications import EfficientNetB0
-from tensorflow.keras.applications.efficientnet import preprocess_input
 from tensorflow.keras.layers import (
-    GlobalAveragePooling2D, Dense, Dropout, BatchNormalization
+    GlobalAveragePooling2D, Dense, Dropout, BatchNormalization,
+    RandomRotation, RandomTranslation, RandomZoom, RandomFlip
 )
 from tensorflow.keras.models import Model
 from tensorflow.keras.optimizers import Adam
 from tensorflow.keras.callbacks import (
     EarlyStopping, ReduceLROnPlateau, ModelCheckpoint, CSVLogger
 )
-from tensorflow.keras.preprocessing.image import ImageDataGenerator
-from sklearn.model_selection import train_test_split
-from PIL import Image
 
+from dataset_paths import find_dataset, prepare_data, gather_images, split_data
+
+SEED = 42
+BATCH_SIZE = 16
+AUTOTUNE = tf.data.AUTOTUNE
+PRECISIONS = ("float32", "mixed_float16", "mixed_bfloat16")
 
-def find_dataset():
-    """Find the first available dataset directory."""
-    for path in DATASET_PATHS:
-        if os.path.exists(path):
-            # Check if it has spiral or wave subdirectories
-            for subdir in os.listdir(path):
-                subpath = os.path.join(path, subdir)
-                if os.path.isdir(subpath) and subdir.lower() in ("spiral", "wave"):
-                    print(f"Found dataset at: {path}")
-                    return path
-    return None
+# Tunable hyperparameters (see sweep.py)
+DEFAULT_HPARAMS = {
+    "batch_size": BATCH_SIZE,
+    "lr_head": 1e-3,
+    "lr_finetune": 1e-5,
+    "dropout": 0.3,
+    "epochs_head": 20,
+    "epochs_finetune": 30,
+    "unfreeze_layers": 20,
+}
 
 
-def prepare_data(dataset_dir, drawing_type="spiral"):
+def build_model(weights="imagenet", dropout=0.3):
     """
-    Prepare image paths and labels for training.
-    Returns paths for train/val/test splits.
+    Build EfficientNetB0 transfer learning model under the current Keras
+    dtype policy.
     """
-    healthy_dir = os.path.join(dataset_dir, drawing_type, "healthy")
-    parkinson_dir = os.path.join(dataset_dir, drawing_type, "parkinson")
-
-    # Also check for 'training' and 'testing' subdirectory structure
-    if not os.path.exists(healthy_dir):
-        # Try the training/testing structure
-        healthy_train = os.path.join(dataset_dir, drawing_type, "training", "healthy")
-        healthy_test = os.path.join(dataset_dir, drawing_type, "testing", "healthy")
-        parkinson_train = os.path.join(dataset_dir, drawing_type, "training", "parkinson")
-        parkinson_test = os.path.join(dataset_dir, drawing_type, "testing", "parkinson")
-
-        if os.path.exists(healthy_train):
-            healthy_dir = None
-            parkinson_dir = None
-            # Gather from both splits
-            all_images = []
-            all_labels = []
-            for d in [healthy_train, healthy_test]:
-                if os.path.exists(d):
-                    for f in os.listdir(d):
-                        if f.lower().endswith((".png", ".jpg", ".jpeg")):
-                            all_images.append(os.path.join(d, f))
-                            all_labels.append(0)
-            for d in [parkinson_train, parkinson_test]:
-                if os.path.exists(d):
-                    for f in os.listdir(d):
-                        if f.lower().endswith((".png", ".jpg", ".jpeg")):
-                            all_images.append(os.path.join(d, f))
-                            all_labels.append(1)
-            return all_images, all_labels
-
-    if healthy_dir and os.path.exists(healthy_dir):
-        all_images = []
-        all_labels = []
-        for f in os.listdir(healthy_dir):
-            if f.lower().endswith((".png", ".jpg", ".jpeg", ".bmp")):
-                all_images.append(os.path.join(healthy_dir, f))
-                all_labels.append(0)
-        for f in os.listdir(parkinson_dir):
-            if f.lower().endswith((".png", ".jpg", ".jpeg", ".bmp")):
-                all_images.append(os.path.join(parkinson_dir, f))
-                all_labels.append(1)
-        return all_images, all_labels
-
-    return [], []
-
-
-def load_images(image_paths, labels):
-    """Load and preprocess images into numpy arrays."""
-    images = []
-    valid_labels = []
-    for path, label in zip(image_paths, labels):
-        try:
-            img = Image.open(path).convert("RGB").resize((IMG_SIZE, IMG_SIZE))
-            img_array = np.array(img, dtype=np.float32)
-            images.append(img_array)
-            valid_labels.append(label)
-        except Exception as e:
-            print(f"  Skipping {path}: {e}")
-    return np.array(images), np.array(valid_labels)
-
-
-def build_model():
-    """Build EfficientNetB0 transfer learning model."""
     # Load pre-trained base
     base_model = EfficientNetB0(
-        weights="imagenet",
+        weights=weights,
         include_top=False,
         input_shape=(IMG_SIZE, IMG_SIZE, 3)
     )
     base_model.trainable = False  # Freeze for Phase 1
 
     # Custom classification head
-    x = base_model.output
-    x = GlobalAveragePooling2D()(x)
-    x = BatchNormalization()(x)
-    x = Dropout(0.3)(x)
-    x = Dense(256, activation="relu")(x)
-    x = BatchNormalization()(x)
-    x = Dropout(0.3)(x)
-    x = Dense(1, activation="sigmoid")(x)
+    x = GlobalAveragePooling2D(name="head_pool")(base_model.output)
+    x = build_head(x, dropout)
 
     model = Model(inputs=base_model.input, outputs=x)
     return model, base_model
 
 
-def create_data_generators(X_train, y_train, X_val, y_val):
-    """Create augmented data generators."""
-    train_datagen = ImageDataGenerator(
-        preprocessing_function=preprocess_input,
-        rotation_range=30,
-        width_shift_range=0.15,
-        height_shift_range=0.15,
-        shear_range=0.15,
-        zoom_range=0.2,
-        brightness_range=[0.8, 1.2],
-        horizontal_flip=True,
-        vertical_flip=True,
-        fill_mode="nearest"
-    )
+def build_head(x, dropout=0.3):
+    """
+    Classification head on pooled backbone features. Layers are named so
+    a head trained on cached features (feature_cache.py) can be copied
+    into the full model.
+    """
+    x = BatchNormalization(name="head_bn_1")(x)
+    x = Dropout(dropout, name="head_dropout_1")(x)
+    x = Dense(256, activation="relu", name="head_dense")(x)
+    x = BatchNormalization(name="head_bn_2")(x)
+    x = Dropout(dropout, name="head_dropout_2")(x)
+    # Keep the output in float32 so mixed precision doesn't degrade the loss
+    return Dense(1, activation="sigmoid", dtype="float32", name="head_output")(x)
+
+
+class EpochTimer(tf.keras.callbacks.Callback):
+    """Record wall time and training throughput for every epoch."""
+
+    def __init__(self, num_images, phase, records):
+        super().__init__()
+        self.num_images = num_images
+        self.phase = phase
+        self.records = records
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._start = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        seconds = time.perf_counter() - self._start
+        self.records.append({
+            "phase": self.phase,
+            "epoch": epoch + 1,
+            "seconds": round(seconds, 3),
+            "images_per_sec": round(self.num_images / seconds, 2),
+        })
+
+
+def summarize_timing(records):
+    """Per-phase totals; steady-state throughput skips each phase's first
+    epoch, which includes tracing and XLA compilation."""
+    summary = {}
+    for phase in sorted({r["phase"] for r in records}):
+        rows = [r for r in records if r["phase"] == phase]
+        steady = rows[1:] or rows
+        summary[phase] = {
+            "epochs": len(rows),
+            "seconds": round(sum(r["seconds"] for r in rows), 2),
+            "first_epoch_seconds": rows[0]["seconds"],
+            "images_per_sec": round(float(np.mean([r["images_per_sec"] for r in steady])), 2),
+        }
+    return summary
+
+
+def export_float32(source_path, dropout=0.3):
+    """
+    Rebuild the model under the float32 policy and load the checkpoint's
+    weights into it (mixed precision keeps variables in float32), so the
+    served model runs plain float32 kernels.
+    """
+    tf.keras.mixed_precision.set_global_policy("float32")
+    model, _ = build_model(weights=None, dropout=dropout)
+    model.load_weights(source_path)
+    model.save(source_path)
+    return model
 
-    val_datagen = ImageDataGenerator(
-        preprocessing_function=preprocess_input
-    )
 
-    train_gen = train_datagen.flow(X_train, y_train, batch_size=16)
-    val_gen = val_datagen.flow(X_val, y_val, batch_size=16, shuffle=False)
+def decode_image(path, label):
+    """Read, decode and resize one image to uint8 (IMG_SIZE, IMG_SIZE, 3)."""
+    data = tf.io.read_file(path)
+    img = tf.io.decode_image(data, channels=3, expand_animations=False)
+    # Bicubic with antialiasing to match PIL's resize used at serving time
+    img = tf.image.resize(img, (IMG_SIZE, IMG_SIZE), method="bicubic", antialias=True)
+    img = tf.cast(tf.clip_by_value(tf.round(img), 0, 255), tf.uint8)
+    return img, label
+
+
+def build_augmenter():
+    """Batched augmentation layers (replacing ImageDataGenerator)."""
+    return tf.keras.Sequential([
+        RandomRotation(30 / 360, fill_mode="nearest", seed=SEED),
+        RandomTranslation(0.15, 0.15, fill_mode="nearest", seed=SEED + 1),
+        RandomZoom(0.2, fill_mode="nearest", seed=SEED + 2),
+        RandomFlip("horizontal_and_vertical", seed=SEED + 3),
+    ], name="augmentation")
+
+
+def cache_file(name, paths):
+    """Cache file name that changes whenever the file list changes."""
+    digest = hashlib.md5("\n".join(sorted(map(str, paths))).encode()).hexdigest()[:12]
+    os.makedirs(TFDATA_CACHE_DIR, exist_ok=True)
+    return os.path.join(TFDATA_CACHE_DIR, f"{name}_{IMG_SIZE}_{digest}")
+
+
+def make_augment_fn():
+    """Batch augmentation: uint8 images -> augmented float32 in [0, 255]."""
+    augmenter = build_augmenter()
+
+    def augment(images):
+        images = augmenter(tf.cast(images, tf.float32), training=True)
+        # Multiplicative brightness in [0.8, 1.2], one factor per image
+        factor = tf.random.uniform((tf.shape(images)[0], 1, 1, 1), 0.8, 1.2, seed=SEED + 4)
+        return tf.clip_by_value(images * factor, 0.0, 255.0)
+
+    return augment
+
+
+def finish_dataset(ds, training):
+    """
+    Turn batches of uint8 images into model inputs: augment training
+    batches with vectorized Keras layers, cast to float32 and prefetch.
+    Inputs stay in [0, 255] because EfficientNet rescales internally.
+    """
+    if training:
+        augment = make_augment_fn()
+        ds = ds.map(lambda images, batch_labels: (augment(images), batch_labels),
+                    num_parallel_calls=AUTOTUNE, deterministic=True)
+    else:
+        ds = ds.map(lambda images, batch_labels: (tf.cast(images, tf.float32), batch_labels),
+                    num_parallel_calls=AUTOTUNE, deterministic=True)
+
+    return ds.prefetch(AUTOTUNE)
+
+
+def make_dataset(paths, labels, training=False, batch_size=BATCH_SIZE, cache="disk", name="data"):
+    """
+    Stream images from disk as a tf.data pipeline.
+
+    Decoded uint8 images are cached (to disk, memory, or not at all) before
+    augmentation, so later epochs skip decoding. Training batches are shuffled.
+    """
+    paths = [str(p) for p in paths]
+    ds = tf.data.Dataset.from_tensor_slices((paths, np.asarray(labels, dtype=np.float32)))
+    ds = ds.map(decode_image, num_parallel_calls=AUTOTUNE, deterministic=True)
+    ds = ds.apply(tf.data.experimental.ignore_errors())
+
+    if cache == "disk":
+        ds = ds.cache(cache_file(name, paths))
+    elif cache == "memory":
+        ds = ds.cache()
+
+    if training:
+        ds = ds.shuffle(min(len(paths), 2048), seed=SEED, reshuffle_each_iteration=True)
 
-    return train_gen, val_gen
+    return finish_dataset(ds.batch(batch_size), training)
 
 
-def train():
-    """Main training pipeline."""
+def make_array_dataset(images, labels, indices, training=False, batch_size=BATCH_SIZE,
+                       shuffle=None):
+    """
+    tf.data pipeline over rows of an in-memory or memory-mapped uint8 array
+    (see dataset_cache.py). Only the indices are shuffled and batched; each
+    batch is gathered from the array in one slice, so nothing is decoded.
+    shuffle defaults to training.
+    """
+    indices = np.asarray(indices, dtype=np.int64)
+    labels = np.asarray(labels, dtype=np.float32)
+
+    def gather(batch_idx):
+        # Sorted reads are sequential on the memmap
+        batch_idx = np.sort(batch_idx)
+        return images[batch_idx], labels[batch_idx]
+
+    def load(batch_idx):
+        batch_images, batch_labels = tf.numpy_function(
+            gather, [batch_idx], (tf.uint8, tf.float32)
+        )
+        batch_images.set_shape((None, IMG_SIZE, IMG_SIZE, 3))
+        batch_labels.set_shape((None,))
+        return batch_images, batch_labels
+
+    ds = tf.data.Dataset.from_tensor_slices(indices)
+    if training if shuffle is None else shuffle:
+        ds = ds.shuffle(len(indices), seed=SEED, reshuffle_each_iteration=True)
+    ds = ds.batch(batch_size).map(load, num_parallel_calls=AUTOTUNE, deterministic=True)
+    return finish_dataset(ds, training)
+
+
+class TrialStop(tf.keras.callbacks.Callback):
+    """
+    Base for callbacks that end a whole training run early (e.g. a sweep's
+    early-stopping scheduler). Setting self.trial_stopped also skips the
+    remaining phases; epochs are counted across both phases.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.trial_stopped = False
+        self.epochs_done = 0
+
+    def should_stop(self, epoch, logs):
+        return False
+
+    def on_epoch_end(self, epoch, logs=None):
+        self.epochs_done += 1
+        if self.should_stop(self.epochs_done, logs or {}):
+            self.trial_stopped = True
+            self.model.stop_training = True
+
+
+def train(source="compiled", cache="disk", precision="float32", jit_compile=False,
+          phase1="full", feature_views=4, hparams=None, model_path=MODEL_PATH,
+          history_path=TRAINING_HISTORY_PATH, extra_callbacks=(), verbose=1,
+          drawing_type=None):
+    """
+    Main training pipeline.
+    hparams overrides DEFAULT_HPARAMS; returns the dict written to history_path.
+    drawing_type ("spiral" or "wave") trains on that type only, else on both.
+    """
+    hp = dict(DEFAULT_HPARAMS, **(hparams or {}))
+    extra_callbacks = list(extra_callbacks)
+    if phase1 == "features" and source != "compiled":
+        print("\nERROR: --phase1 features needs the compiled dataset (--source compiled).")
+        sys.exit(1)
+    tf.keras.utils.set_random_seed(SEED)
+    tf.keras.mixed_precision.set_global_policy(precision)
+
     print("=" * 60)
     print("  Parkinson's Disease Detection - Model Training")
     print("=" * 60)
@@ -177,117 +324,178 @@ def train():
         print("  2. Extract drawings.zip in the project root")
         sys.exit(1)
 
-    # 2. Gather data from both spiral and wave
-    print("\nGathering images...")
-    all_images = []
-    all_labels = []
-
-    for drawing_type in ["spiral", "wave"]:
-        images, labels = prepare_data(dataset_dir, drawing_type)
-        print(f"  {drawing_type}: {len(images)} images")
-        all_images.extend(images)
-        all_labels.extend(labels)
-
-    if len(all_images) == 0:
-        print("\nERROR: No images found in dataset!")
-        sys.exit(1)
-
-    print(f"\nTotal images: {len(all_images)}")
-    print(f"  Healthy: {all_labels.count(0)}")
-    print(f"  Parkinson: {all_labels.count(1)}")
-
-    # 3. Load images
-    print("\nLoading and preprocessing images...")
-    X, y = load_images(all_images, all_labels)
-    print(f"  Loaded: {X.shape[0]} images of size {X.shape[1:]}")
-
-    # 4. Split data (70/15/15)
-    X_train, X_temp, y_train, y_temp = train_test_split(
-        X, y, test_size=0.3, stratify=y, random_state=42
-    )
-    X_val, X_test, y_val, y_test = train_test_split(
-        X_temp, y_temp, test_size=0.5, stratify=y_temp, random_state=42
-    )
-    print(f"\n  Train: {len(X_train)} | Val: {len(X_val)} | Test: {len(X_test)}")
-
-    # 5. Create data generators
-    train_gen, val_gen = create_data_generators(X_train, y_train, X_val, y_val)
+    if source == "compiled":
+        # 2-5. Zero-copy pipelines over the memory-mapped dataset cache
+        from dataset_cache import open_dataset
+
+        print("\nOpening compiled dataset...")
+        data = open_dataset(dataset_dir)
+        if data is None or len(data) == 0:
+            print("\nERROR: No images found in dataset!")
+            sys.exit(1)
+        # Indices into the full cache, so the feature cache is shared by all types
+        indices = np.arange(len(data)) if drawing_type is None else data.select(drawing_type)
+        labels = data.labels[indices]
+        total_images = len(indices)
+        print(f"\nTotal images: {total_images}" + (f" ({drawing_type})" if drawing_type else ""))
+        print(f"  Healthy: {int(np.sum(labels == 0))}")
+        print(f"  Parkinson: {int(np.sum(labels == 1))}")
+
+        idx_train, idx_val, idx_test, _, _, _ = split_data(indices, labels)
+        print(f"\n  Train: {len(idx_train)} | Val: {len(idx_val)} | Test: {len(idx_test)}")
+
+        train_ds = make_array_dataset(data.images, data.labels, idx_train, training=True,
+                                      batch_size=hp["batch_size"])
+        val_ds = make_array_dataset(data.images, data.labels, idx_val, batch_size=hp["batch_size"])
+        test_ds = make_array_dataset(data.images, data.labels, idx_test, batch_size=hp["batch_size"])
+        train_size, val_size = len(idx_train), len(idx_val)
+    else:
+        # 2. Gather data from both spiral and wave (or the one requested)
+        print("\nGathering images...")
+        if drawing_type:
+            all_images, all_labels = prepare_data(dataset_dir, drawing_type)
+        else:
+            all_images, all_labels = gather_images(dataset_dir)
+
+        if len(all_images) == 0:
+            print("\nERROR: No images found in dataset!")
+            sys.exit(1)
+
+        total_images = len(all_images)
+        print(f"\nTotal images: {total_images}")
+        print(f"  Healthy: {all_labels.count(0)}")
+        print(f"  Parkinson: {all_labels.count(1)}")
+
+        # 3. Split file lists (70/15/15)
+        paths_train, paths_val, paths_test, y_train, y_val, y_test = split_data(
+            np.array(all_images), np.array(all_labels)
+        )
+        print(f"\n  Train: {len(paths_train)} | Val: {len(paths_val)} | Test: {len(paths_test)}")
+
+        # 4-5. Streaming input pipelines
+        train_ds = make_dataset(paths_train, y_train, training=True, batch_size=hp["batch_size"],
+                                cache=cache, name="train")
+        val_ds = make_dataset(paths_val, y_val, batch_size=hp["batch_size"], cache=cache, name="val")
+        test_ds = make_dataset(paths_test, y_test, batch_size=hp["batch_size"], cache=cache,
+                               name="test")
+        train_size, val_size = len(paths_train), len(paths_val)
 
     # 6. Build model
-    print("\nBuilding EfficientNetB0 model...")
-    model, base_model = build_model()
-    model.summary()
+    print(f"\nBuilding EfficientNetB0 model ({precision}, jit_compile={jit_compile})...")
+    model, base_model = build_model(dropout=hp["dropout"])
+    if verbose:
+        model.summary()
 
     # 7. Callbacks
-    os.makedirs(os.path.dirname(MODEL_PATH), exist_ok=True)
+    os.makedirs(os.path.dirname(model_path), exist_ok=True)
     callbacks = [
         EarlyStopping(monitor="val_loss", patience=8, restore_best_weights=True, verbose=1),
         ReduceLROnPlateau(monitor="val_loss", factor=0.5, patience=3, min_lr=1e-7, verbose=1),
-        ModelCheckpoint(MODEL_PATH, monitor="val_accuracy", save_best_only=True, verbose=1),
+        ModelCheckpoint(model_path, monitor="val_accuracy", save_best_only=True, verbose=1),
     ]
+    epoch_timing = []
 
     # ========== PHASE 1: Train top layers only ==========
     print("\n" + "=" * 60)
     print("  PHASE 1: Training classification head (base frozen)")
     print("=" * 60)
 
-    model.compile(
-        optimizer=Adam(learning_rate=1e-3),
-        loss="binary_crossentropy",
-        metrics=["accuracy"]
-    )
-
-    history1 = model.fit(
-        train_gen,
-        steps_per_epoch=max(len(X_train) // 16, 1),
-        epochs=20,
-        validation_data=val_gen,
-        validation_steps=max(len(X_val) // 16, 1),
-        callbacks=callbacks,
-        verbose=1
-    )
+    if phase1 == "features":
+        # Train the head alone on cached backbone embeddings, then copy it in
+        from feature_cache import extract_features, build_head_model, head_datasets, transfer_head
+
+        features = extract_features(model, data, views=feature_views)
+        head_train_ds, head_val_ds, head_train_size = head_datasets(
+            features, data.labels, idx_train, idx_val, batch_size=64
+        )
+        head = build_head_model(features.shape[-1], hp["dropout"])
+        head.compile(
+            optimizer=Adam(learning_rate=hp["lr_head"]),
+            loss="binary_crossentropy",
+            metrics=["accuracy"],
+            jit_compile=jit_compile
+        )
+        history1 = head.fit(
+            head_train_ds,
+            epochs=hp["epochs_head"],
+            validation_data=head_val_ds,
+            callbacks=[
+                EarlyStopping(monitor="val_loss", patience=8, restore_best_weights=True, verbose=1),
+                ReduceLROnPlateau(monitor="val_loss", factor=0.5, patience=3, min_lr=1e-7, verbose=1),
+                EpochTimer(head_train_size, "phase1", epoch_timing),
+            ] + extra_callbacks,
+            verbose=verbose
+        )
+        transfer_head(head, model)
+        # The full model has not been compiled yet; compile and checkpoint it
+        # now so a run stopped after phase 1 can still be evaluated and kept
+        model.compile(
+            optimizer=Adam(learning_rate=hp["lr_head"]),
+            loss="binary_crossentropy",
+            metrics=["accuracy"],
+            jit_compile=jit_compile
+        )
+        model.save(model_path)
+    else:
+        model.compile(
+            optimizer=Adam(learning_rate=hp["lr_head"]),
+            loss="binary_crossentropy",
+            metrics=["accuracy"],
+            jit_compile=jit_compile
+        )
+
+        history1 = model.fit(
+            train_ds,
+            epochs=hp["epochs_head"],
+            validation_data=val_ds,
+            callbacks=callbacks + [EpochTimer(train_size, "phase1", epoch_timing)] + extra_callbacks,
+            verbose=verbose
+        )
 
     # ========== PHASE 2: Fine-tune top layers of base ==========
-    print("\n" + "=" * 60)
-    print("  PHASE 2: Fine-tuning (unfreezing last 20 layers)")
-    print("=" * 60)
-
-    # Unfreeze last 20 layers
-    base_model.trainable = True
-    for layer in base_model.layers[:-20]:
-        layer.trainable = False
-
-    model.compile(
-        optimizer=Adam(learning_rate=1e-5),
-        loss="binary_crossentropy",
-        metrics=["accuracy"]
-    )
-
-    history2 = model.fit(
-        train_gen,
-        steps_per_epoch=max(len(X_train) // 16, 1),
-        epochs=30,
-        validation_data=val_gen,
-        validation_steps=max(len(X_val) // 16, 1),
-        callbacks=callbacks,
-        verbose=1
-    )
+    history2 = None
+    if any(getattr(cb, "trial_stopped", False) for cb in extra_callbacks):
+        print("\n  Run stopped early; skipping fine-tuning.")
+    else:
+        print("\n" + "=" * 60)
+        print(f"  PHASE 2: Fine-tuning (unfreezing last {hp['unfreeze_layers']} layers)")
+        print("=" * 60)
+
+        # Unfreeze the last layers of the base
+        base_model.trainable = True
+        for layer in base_model.layers[:-hp["unfreeze_layers"]]:
+            layer.trainable = False
+
+        model.compile(
+            optimizer=Adam(learning_rate=hp["lr_finetune"]),
+            loss="binary_crossentropy",
+            metrics=["accuracy"],
+            jit_compile=jit_compile
+        )
+
+        history2 = model.fit(
+            train_ds,
+            epochs=hp["epochs_finetune"],
+            validation_data=val_ds,
+            callbacks=callbacks + [EpochTimer(train_size, "phase2", epoch_timing)] + extra_callbacks,
+            verbose=verbose
+        )
 
     # 8. Evaluate on test set
     print("\n" + "=" * 60)
     print("  Final Evaluation on Test Set")
     print("=" * 60)
 
-    # Preprocess test data
-    from tensorflow.keras.applications.efficientnet import preprocess_input as preprocess_fn
-    X_test_processed = preprocess_fn(X_test.copy())
-    test_loss, test_accuracy = model.evaluate(X_test_processed, y_test, verbose=0)
+    test_loss, test_accuracy = model.evaluate(test_ds, verbose=0)
     print(f"\n  Test Accuracy: {test_accuracy:.4f}")
     print(f"  Test Loss: {test_loss:.4f}")
 
-    # Predictions for confusion matrix
-    y_pred_prob = model.predict(X_test_processed, verbose=0)
-    y_pred = (y_pred_prob > 0.5).astype(int).flatten()
+    # Predictions for confusion matrix (labels taken from the pipeline, which
+    # skips unreadable files)
+    y_test = np.concatenate([batch_labels.numpy() for _, batch_labels in test_ds]).astype(int)
+    y_pred_prob = model.predict(test_ds, verbose=0)
+    # Default threshold here; model/evaluate.py picks the served operating point
+    y_pred = (y_pred_prob > DEFAULT_THRESHOLD).astype(int).flatten()
 
     from sklearn.metrics import confusion_matrix, classification_report, precision_score, recall_score, f1_score
     cm = confusion_matrix(y_test, y_pred)
@@ -299,7 +507,9 @@ def train():
     # 9. Save training history and metrics
     combined_history = {}
     for key in history1.history:
-        combined_history[key] = history1.history[key] + history2.history[key]
+        combined_history[key] = history1.history[key] + (
+            history2.history.get(key, []) if history2 else []
+        )
 
     # Convert numpy values to Python floats for JSON serialization
     for key in combined_history:
@@ -318,26 +528,68 @@ def train():
         "confusion_matrix": cm.tolist(),
         "model_architecture": "EfficientNetB0 + Transfer Learning",
         "input_size": IMG_SIZE,
-        "total_images": len(all_images),
-        "train_size": len(X_train),
-        "val_size": len(X_val),
-        "test_size": len(X_test),
+        "drawing_type": drawing_type or "combined",
+        "total_images": total_images,
+        "train_size": train_size,
+        "val_size": val_size,
+        "test_size": len(y_test),
+        "training_mode": {
+            "precision": precision,
+            "jit_compile": jit_compile,
+            "phase1": phase1,
+            "feature_views": feature_views if phase1 == "features" else None,
+        },
+        "hparams": hp,
+        "best_val_accuracy": max(combined_history.get("val_accuracy", [0.0])),
+        "epoch_timing": epoch_timing,
+        "timing_summary": summarize_timing(epoch_timing),
     }
 
-    with open(TRAINING_HISTORY_PATH, "w") as f:
+    with open(history_path, "w") as f:
         json.dump(training_data, f, indent=2)
-    print(f"\n  Training history saved to: {TRAINING_HISTORY_PATH}")
+    print(f"\n  Training history saved to: {history_path}")
 
     # Save class indices
     class_indices = {"healthy": 0, "parkinson": 1}
     with open(CLASS_INDICES_PATH, "w") as f:
         json.dump(class_indices, f)
 
-    print(f"  Model saved to: {MODEL_PATH}")
+    if precision != "float32":
+        # Serve a float32 model: mixed-precision layers are slow on most CPUs
+        export_float32(model_path, hp["dropout"])
+    print(f"  Model saved to: {model_path}")
     print("\n" + "=" * 60)
     print("  Training Complete!")
     print("=" * 60)
+    return training_data
 
 
 if __name__ == "__main__":
-    train()
+    parser = argparse.ArgumentParser(description="Train the Parkinson's drawing classifier.")
+    parser.add_argument("--source", choices=["compiled", "files"], default="compiled",
+                        help="Read the memory-mapped dataset cache, or decode image files")
+    parser.add_argument("--cache", choices=["disk", "memory", "none"], default="disk",
+                        help="Where to cache decoded images between epochs (--source files)")
+    parser.add_argument("--precision", choices=PRECISIONS, default="float32",
+                        help="Keras dtype policy (mixed_bfloat16 needs bf16-capable CPUs)")
+    parser.add_argument("--jit-compile", action="store_true",
+                        help="Compile the train step with XLA")
+    parser.add_argument("--phase1", choices=["full", "features"], default="full",
+                        help="Train the Phase 1 head through the full network, or on "
+                             "cached backbone features")
+    parser.add_argument("--feature-views", type=int, default=4,
+                        help="Views per image in the feature cache (first is unaugmented)")
+    parser.add_argument("--drawing-type", choices=["spiral", "wave"],
+                        help="Train a specialist on one drawing type (default: both)")
+    args = parser.parse_args()
+
+    paths = {}
+    if args.drawing_type:
+        paths = {
+            "model_path": MODEL_REGISTRY[args.drawing_type]["path"],
+            "history_path": os.path.join(os.path.dirname(TRAINING_HISTORY_PATH),
+                                         f"training_history_{args.drawing_type}.json"),
+        }
+    train(source=args.source, cache=args.cache, precision=args.precision,
+          jit_compile=args.jit_compile, phase1=args.phase1, feature_views=args.feature_views,
+          drawing_type=args.drawing_type, **paths)
@@ -0,0 +1,8 @@
+"""Make the backend modules (config, app, utils) and model scripts importable from tests."""
+
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(1, os.path.join(BACKEND_DIR, "model"))
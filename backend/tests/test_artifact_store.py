@@ -0,0 +1,71 @@
+"""ArtifactStore.sweep: age, size and count eviction and shard directory pruning."""
+
+import os
+import time
+
+import pytest
+
+pytest.importorskip("PIL")
+
+from utils.artifact_store import ArtifactStore  # noqa: E402
+
+
+def make_store(root, max_bytes=10 ** 9, max_files=10 ** 6, max_age=3600):
+    return ArtifactStore(str(root), max_bytes=max_bytes, max_files=max_files, max_age=max_age)
+
+
+def put(store, name, size, age):
+    """Write an artifact of size bytes last modified age seconds ago."""
+    path = store.path_for(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+    return name
+
+
+def test_expired_files_are_removed(tmp_path):
+    store = make_store(tmp_path, max_age=60)
+    old = put(store, "aa/bb/old.png", 10, age=120)
+    new = put(store, "aa/cc/new.png", 10, age=1)
+
+    assert store.sweep() == 1
+    assert not store.exists(old)
+    assert store.exists(new)
+    stats = store.stats()
+    assert (stats["files"], stats["bytes"], stats["evicted"]) == (1, 10, 1)
+
+
+def test_oldest_files_are_removed_until_under_the_size_limit(tmp_path):
+    store = make_store(tmp_path, max_bytes=250)
+    names = [put(store, f"0{i}/00/f{i}.png", 100, age=30 - i) for i in range(4)]
+
+    assert store.sweep() == 2
+    assert [store.exists(n) for n in names] == [False, False, True, True]
+    assert store.stats()["bytes"] == 200
+
+
+def test_oldest_files_are_removed_until_under_the_count_limit(tmp_path):
+    store = make_store(tmp_path, max_files=2)
+    names = [put(store, f"0{i}/00/f{i}.png", 1, age=30 - i) for i in range(3)]
+
+    assert store.sweep() == 1
+    assert [store.exists(n) for n in names] == [False, True, True]
+
+
+def test_only_directories_empty_before_the_sweep_are_pruned(tmp_path):
+    store = make_store(tmp_path)
+    stale = tmp_path / "aa" / "bb"
+    stale.mkdir(parents=True)
+    past = time.time() - 600
+    os.utime(stale, (past, past))
+    # Created by a save that has not written its image yet
+    fresh = tmp_path / "cc" / "dd"
+    fresh.mkdir(parents=True)
+    os.utime(fresh, (time.time() + 5, time.time() + 5))
+
+    store.sweep()
+
+    assert not stale.exists()
+    assert fresh.exists()
@@ -0,0 +1,110 @@
+"""SharedBatchScheduler: batching, fairness between models and unregistering."""
+
+import threading
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from utils.batching import SharedBatchScheduler  # noqa: E402
+
+
+def recording(calls, name):
+    def predict(batch):
+        calls.append((name, len(batch)))
+        return batch * 2
+    return predict
+
+
+def blocking():
+    """predict_fn that holds the worker until released."""
+    started, release = threading.Event(), threading.Event()
+
+    def predict(batch):
+        started.set()
+        release.wait(5)
+        return batch
+    return predict, started, release
+
+
+def test_submit_many_is_split_into_batches_of_max_size():
+    scheduler = SharedBatchScheduler(max_batch_size=4, max_wait_ms=50)
+    calls = []
+    queue = scheduler.register("combined", recording(calls, "combined"))
+
+    futures = queue.submit_many([np.full(3, i, dtype=np.float32) for i in range(6)])
+    results = [f.result(timeout=5) for f in futures]
+
+    assert calls == [("combined", 4), ("combined", 2)]
+    for i, result in enumerate(results):
+        np.testing.assert_array_equal(result, np.full(3, 2 * i))
+
+
+def test_concurrent_requests_share_a_batch():
+    scheduler = SharedBatchScheduler(max_batch_size=8, max_wait_ms=200)
+    calls = []
+    queue = scheduler.register("combined", recording(calls, "combined"))
+
+    futures = [queue.submit(np.zeros(2, dtype=np.float32)) for _ in range(3)]
+    for f in futures:
+        f.result(timeout=5)
+
+    assert calls == [("combined", 3)]
+
+
+def test_worker_serves_the_queue_with_the_oldest_request_first():
+    scheduler = SharedBatchScheduler(max_batch_size=8, max_wait_ms=0)
+    calls = []
+    hold, started, release = blocking()
+    blocker = scheduler.register("blocker", hold)
+    spiral = scheduler.register("spiral", recording(calls, "spiral"))
+    wave = scheduler.register("wave", recording(calls, "wave"))
+
+    first = blocker.submit(np.zeros(1, dtype=np.float32))
+    assert started.wait(5)
+    # Both wait behind the blocker; wave's request is older than spiral's
+    later = wave.submit(np.zeros(1, dtype=np.float32))
+    newest = spiral.submit_many([np.zeros(1, dtype=np.float32)] * 3)
+    assert scheduler.queue_depths() == {"blocker": 0, "spiral": 3, "wave": 1}
+    release.set()
+
+    first.result(timeout=5)
+    later.result(timeout=5)
+    for f in newest:
+        f.result(timeout=5)
+    assert calls == [("wave", 1), ("spiral", 3)]
+
+
+def test_unregistered_queue_still_drains_pending_requests():
+    scheduler = SharedBatchScheduler(max_batch_size=8, max_wait_ms=0)
+    calls = []
+    hold, started, release = blocking()
+    blocker = scheduler.register("blocker", hold)
+    old = scheduler.register("combined", recording(calls, "old"))
+
+    blocker.submit(np.zeros(1, dtype=np.float32))
+    assert started.wait(5)
+    pending = old.submit(np.ones(1, dtype=np.float32))
+    # A reload replaces the queue, then releases the old one
+    new = scheduler.register("combined", recording(calls, "new"))
+    scheduler.unregister(old)
+    assert scheduler.queue_depths() == {"blocker": 0, "combined": 0}
+    release.set()
+
+    np.testing.assert_array_equal(pending.result(timeout=5), np.full(1, 2.0))
+    new.predict(np.ones(1, dtype=np.float32), timeout=5)
+    assert calls == [("old", 1), ("new", 1)]
+    assert list(scheduler.stats()["models"]) == ["blocker", "combined"]
+
+
+def test_batch_errors_are_raised_to_every_request():
+    scheduler = SharedBatchScheduler(max_batch_size=8, max_wait_ms=50)
+
+    def fail(batch):
+        raise ValueError("bad input")
+
+    queue = scheduler.register("combined", fail)
+    futures = queue.submit_many([np.zeros(1, dtype=np.float32)] * 2)
+    for f in futures:
+        with pytest.raises(ValueError, match="bad input"):
+            f.result(timeout=5)
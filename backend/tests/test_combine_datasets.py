@@ -0,0 +1,49 @@
+"""Which directories dataset/combine_datasets.py searches for drawings."""
+
+import os
+import importlib.util
+
+import pytest
+
+SCRIPT = os.path.join(os.path.dirname(__file__), "..", "..", "dataset", "combine_datasets.py")
+
+
+@pytest.fixture
+def combine(tmp_path, monkeypatch):
+    spec = importlib.util.spec_from_file_location("combine_datasets", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    monkeypatch.setattr(module, "PROJECT_ROOT", tmp_path)
+    monkeypatch.setattr(module, "OUTPUT_DIR", tmp_path / "dataset" / "combined")
+    return module
+
+
+def touch(root, rel):
+    path = os.path.join(root, *rel.split("/"))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "wb").close()
+
+
+def found(combine, root):
+    return sorted(os.path.relpath(d, root).replace(os.sep, "/")
+                  for d, _ in combine.find_image_dirs(str(root)))
+
+
+def test_project_dirs_are_only_pruned_at_the_top_level(combine, tmp_path):
+    touch(tmp_path, "src/spiral/healthy/a.png")
+    touch(tmp_path, "static/wave/healthy/a.png")
+    touch(tmp_path, "dataset/kaggle/src/spiral/healthy/a.png")
+    touch(tmp_path, "dataset/kaggle/static/wave/parkinson/a.png")
+
+    assert found(combine, tmp_path) == ["dataset/kaggle/src/spiral/healthy",
+                                        "dataset/kaggle/static/wave/parkinson"]
+
+
+def test_tooling_dirs_and_output_are_pruned_at_any_depth(combine, tmp_path):
+    touch(tmp_path, "dataset/kaggle/node_modules/spiral/healthy/a.png")
+    touch(tmp_path, "dataset/kaggle/venv/spiral/healthy/a.png")
+    touch(tmp_path, "dataset/kaggle/.cache/spiral/healthy/a.png")
+    touch(tmp_path, "dataset/combined/spiral/healthy/a.png")
+    touch(tmp_path, "dataset/kaggle/spiral/healthy/a.png")
+
+    assert found(combine, tmp_path) == ["dataset/kaggle/spiral/healthy"]
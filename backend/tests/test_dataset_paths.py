@@ -0,0 +1,37 @@
+"""Image lists (and so the training split) must not depend on directory order."""
+
+import os
+
+import dataset_paths
+from dataset_paths import prepare_data
+
+
+def make_dataset(root, layout):
+    for rel in layout:
+        path = os.path.join(root, *rel.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, "wb").close()
+
+
+def test_prepare_data_is_sorted_whatever_listdir_returns(tmp_path, monkeypatch):
+    make_dataset(tmp_path, ["spiral/healthy/b.png", "spiral/healthy/a.png",
+                            "spiral/parkinson/d.png", "spiral/parkinson/c.png"])
+    listdir = os.listdir
+    monkeypatch.setattr(dataset_paths.os, "listdir", lambda p: sorted(listdir(p), reverse=True))
+
+    images, labels = prepare_data(str(tmp_path), "spiral")
+
+    assert [os.path.basename(p) for p in images] == ["a.png", "b.png", "c.png", "d.png"]
+    assert labels == [0, 0, 1, 1]
+
+
+def test_training_testing_layout_is_sorted(tmp_path, monkeypatch):
+    make_dataset(tmp_path, ["wave/training/healthy/z.png", "wave/training/healthy/y.png",
+                            "wave/testing/parkinson/x.png"])
+    listdir = os.listdir
+    monkeypatch.setattr(dataset_paths.os, "listdir", lambda p: sorted(listdir(p), reverse=True))
+
+    images, labels = prepare_data(str(tmp_path), "wave")
+
+    assert [os.path.basename(p) for p in images] == ["y.png", "z.png", "x.png"]
+    assert labels == [0, 0, 1]
@@ -0,0 +1,64 @@
+"""Vectorized fold sweep and out-of-fold threshold selection of model/evaluate.py."""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("PIL")
+
+from evaluate import fold_counts, metrics_from_counts, sweep, select_thresholds  # noqa: E402
+
+THRESHOLDS = np.round(np.linspace(0.0, 1.0, 21), 3)
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    labels = rng.integers(0, 2, 60)
+    # Two views of noisy scores that lean towards the label
+    view_scores = np.clip(labels * 0.4 + rng.random((2, 60)) * 0.6, 0, 1).astype(np.float32)
+    folds = np.arange(60) % 3
+    return view_scores, labels, folds
+
+
+def counts_for(scores, labels, threshold):
+    predicted = scores > threshold
+    positive = labels.astype(bool)
+    return (np.sum(predicted & positive), np.sum(predicted & ~positive),
+            np.sum(~predicted & positive), np.sum(~predicted & ~positive))
+
+
+def test_fold_counts_match_a_loop_over_every_setting(data):
+    view_scores, labels, folds = data
+    (tp, fp, fn, tn), tta_scores = fold_counts(view_scores, labels, folds, THRESHOLDS)
+
+    np.testing.assert_allclose(tta_scores[1], view_scores.mean(axis=0), rtol=1e-6)
+    for v in range(2):
+        for t, threshold in enumerate(THRESHOLDS):
+            for f in range(3):
+                rows = folds == f
+                expected = counts_for(tta_scores[v, rows], labels[rows], threshold)
+                assert (tp[v, t, f], fp[v, t, f], fn[v, t, f], tn[v, t, f]) == expected
+
+
+def test_selection_metrics_use_only_the_other_folds(data):
+    view_scores, labels, folds = data
+    held_out, selection, tta_scores = sweep(view_scores, labels, folds, THRESHOLDS)
+
+    for f in range(3):
+        held, rest = folds == f, folds != f
+        for t, threshold in enumerate(THRESHOLDS):
+            own = metrics_from_counts(*counts_for(tta_scores[0, held], labels[held], threshold))
+            other = metrics_from_counts(*counts_for(tta_scores[0, rest], labels[rest], threshold))
+            assert held_out["youden"][0, t, f] == pytest.approx(float(own["youden"]))
+            assert selection["youden"][0, t, f] == pytest.approx(float(other["youden"]))
+
+
+def test_select_thresholds_takes_the_best_and_breaks_ties_towards_default():
+    thresholds = np.array([0.2, 0.4, 0.5, 0.7])
+    # (V=1, T=4, F=3): a clear winner, then ties resolved to the threshold nearest 0.5
+    objective = np.array([[[0.1, 0.9, 0.3],
+                           [0.8, 0.9, 0.3],
+                           [0.2, 0.9, 0.6],
+                           [0.3, 0.1, 0.6]]])
+
+    assert select_thresholds(objective, thresholds).tolist() == [[1, 2, 2]]
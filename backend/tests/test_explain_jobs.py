@@ -0,0 +1,49 @@
+"""Background Grad-CAM jobs must be pollable from any worker process."""
+
+import time
+
+from utils.explain_jobs import ExplainJobs
+
+
+def wait_for(jobs, job_id, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = jobs.get(job_id)
+        if job is not None and job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_job_visible_to_another_worker(tmp_path):
+    # Two instances sharing a status directory stand in for two gunicorn workers
+    rendering = ExplainJobs(max_workers=1, status_dir=str(tmp_path))
+    polling = ExplainJobs(max_workers=1, status_dir=str(tmp_path))
+
+    job_id = rendering.submit(lambda: "ab/cd/gradcam_x.png")
+    assert wait_for(rendering, job_id)["status"] == "done"
+
+    job = polling.get(job_id)
+    assert job["status"] == "done"
+    assert job["filename"] == "ab/cd/gradcam_x.png"
+
+
+def test_failed_job_reports_error(tmp_path):
+    jobs = ExplainJobs(max_workers=1, status_dir=str(tmp_path))
+    job_id = jobs.submit(lambda: None)
+    assert wait_for(jobs, job_id)["status"] == "failed"
+    assert ExplainJobs(status_dir=str(tmp_path)).get(job_id)["status"] == "failed"
+
+
+def test_unknown_and_malformed_ids(tmp_path):
+    jobs = ExplainJobs(status_dir=str(tmp_path))
+    assert jobs.get("0" * 32) is None
+    assert jobs.get("../../etc/passwd") is None
+
+
+def test_expired_jobs_are_not_reported(tmp_path):
+    jobs = ExplainJobs(max_workers=1, ttl_seconds=0.05, status_dir=str(tmp_path))
+    job_id = jobs.submit(lambda: "gradcam.png")
+    wait_for(jobs, job_id)
+    time.sleep(0.1)
+    assert ExplainJobs(ttl_seconds=0.05, status_dir=str(tmp_path)).get(job_id) is None
@@ -0,0 +1,69 @@
+"""Prometheus text rendering of the in-process metrics."""
+
+from utils.metrics import MetricsRegistry, start_trace, end_trace, stage, server_timing
+
+
+def test_counter_renders_total_suffix_and_escaped_labels():
+    registry = MetricsRegistry()
+    counter = registry.counter("requests", "Requests served", ("path",))
+    counter.labels('/a"b').inc()
+    counter.labels('/a"b').inc(2)
+
+    assert registry.render().splitlines() == [
+        "# HELP requests_total Requests served",
+        "# TYPE requests_total counter",
+        'requests_total{path="/a\\"b"} 3',
+    ]
+
+
+def test_histogram_buckets_are_cumulative_with_sum_and_count():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("latency_seconds", "Latency", ("model",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 2.0):
+        histogram.labels("combined").observe(value)
+
+    lines = registry.render().splitlines()
+    assert lines[:2] == ["# HELP latency_seconds Latency", "# TYPE latency_seconds histogram"]
+    assert lines[2:] == [
+        'latency_seconds_bucket{model="combined",le="0.1"} 1',
+        'latency_seconds_bucket{model="combined",le="1"} 3',
+        'latency_seconds_bucket{model="combined",le="+Inf"} 4',
+        'latency_seconds_sum{model="combined"} 3.05',
+        'latency_seconds_count{model="combined"} 4',
+    ]
+
+
+def test_callback_metrics_read_values_at_scrape_time():
+    registry = MetricsRegistry()
+    depths = {("spiral",): 2, ("wave",): None}
+    registry.callback("queue_depth", "Pending samples", lambda: depths, labelnames=("model",))
+    registry.callback("evicted", "Evicted files", lambda: 7, kind="counter")
+
+    def broken():
+        raise RuntimeError("store unavailable")
+
+    registry.callback("artifacts", "Stored files", broken)
+
+    assert registry.render().splitlines() == [
+        "# HELP queue_depth Pending samples",
+        "# TYPE queue_depth gauge",
+        'queue_depth{model="spiral"} 2',
+        "# HELP evicted_total Evicted files",
+        "# TYPE evicted_total counter",
+        "evicted_total 7",
+    ]
+
+
+def test_stages_are_traced_per_request_and_summed_in_server_timing():
+    token = start_trace()
+    with stage("decode"):
+        pass
+    with stage("predict"):
+        pass
+    with stage("decode"):
+        pass
+    stages = end_trace(token)
+
+    assert [name for name, _ in stages] == ["decode", "predict", "decode"]
+    header = server_timing([("decode", 0.001), ("predict", 0.002), ("decode", 0.003)], total=0.01)
+    assert header == "decode;dur=4.00, predict;dur=2.00, total;dur=10.00"
@@ -0,0 +1,77 @@
+"""
+Prediction cache reuse for backends without a Keras model (TFLite/ONNX).
+These never produce a Grad-CAM, so a cached answer must be served even when
+a synchronous heatmap is requested.
+"""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("PIL")
+pytest.importorskip("flask")
+
+import app as server
+from config import IMG_SIZE
+from utils.artifact_store import ArtifactStore
+from utils.model_registry import LoadedModel
+from utils.prediction_cache import PredictionCache
+
+
+class CountingBackend:
+    """Stands in for an exported model's batched predict: fixed score, counted calls."""
+
+    def __init__(self, score=0.8):
+        self.score = score
+        self.samples = 0
+
+    def predict(self, batch):
+        self.samples += len(batch)
+        return np.full((len(batch), 1), self.score, dtype=np.float32)
+
+
+@pytest.fixture
+def onnx_entry(tmp_path, monkeypatch):
+    store = ArtifactStore(str(tmp_path / "static"), max_bytes=1 << 30,
+                          max_files=1000, max_age=3600)
+    monkeypatch.setattr(server, "get_artifact_store", lambda: store)
+    monkeypatch.setattr(server, "prediction_cache", PredictionCache(max_entries=16))
+
+    backend = CountingBackend()
+    batcher = server.scheduler.register("test-onnx", backend.predict)
+    entry = LoadedModel("test-onnx", "onnx", str(tmp_path / "model.onnx"), "onnx:test",
+                        None, backend, batcher, threshold=0.5)
+    yield entry, backend
+    server.scheduler.unregister(batcher)
+
+
+def drawing(seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 256, (IMG_SIZE, IMG_SIZE, 3), dtype=np.uint8)
+
+
+def test_sync_explain_reuses_cache_without_grad_cam(onnx_entry):
+    entry, backend = onnx_entry
+    image = drawing()
+
+    first = server.predict_decoded(entry, image, explain="sync")
+    second = server.predict_decoded(entry, image, explain="sync")
+
+    assert first["cached"] is False and first["grad_cam_url"] is None
+    assert second["cached"] is True
+    assert second["prediction"] == first["prediction"] == "parkinson"
+    assert backend.samples == 1
+
+
+def test_batch_explain_reuses_cache_without_grad_cam(onnx_entry, monkeypatch):
+    entry, backend = onnx_entry
+    images = [drawing(0), drawing(1)]
+    monkeypatch.setattr(server, "_decode_batch_item", lambda item: item["payload"])
+    items = [{"kind": "canvas", "payload": image, "explain": True, "ext": "png"}
+             for image in images]
+
+    first = server.predict_batch_items(entry, items)
+    second = server.predict_batch_items(entry, items)
+
+    assert [r["cached"] for r in first] == [False, False]
+    assert [r["cached"] for r in second] == [True, True]
+    assert backend.samples == 2
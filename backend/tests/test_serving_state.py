@@ -0,0 +1,59 @@
+"""Admin targets are shared through files so every worker applies them."""
+
+import os
+import json
+import time
+
+from utils.serving_state import SharedServingState
+
+
+def make_state(root, applied=None, status=None):
+    applied = applied if applied is not None else []
+    return SharedServingState(str(root), 0.1, applied.append, lambda: dict(status or {}))
+
+
+def test_update_bumps_generation_and_is_visible_to_other_workers(tmp_path):
+    admin = make_state(tmp_path)
+    other = make_state(tmp_path)
+
+    def swap(target):
+        target["serving"] = {"backend": "keras", "path": "/m/v2.h5", "version": "keras:v2"}
+
+    _, first = admin.update("combined", swap)
+    _, second = admin.update("combined", lambda t: t.update(shadow=None))
+
+    desired = other.desired()
+    assert first["generation"] == 1 and second["generation"] == 2
+    assert desired["generation"] == 2
+    assert desired["models"]["combined"]["serving"]["version"] == "keras:v2"
+
+
+def test_rejected_change_leaves_file_untouched(tmp_path):
+    state = make_state(tmp_path)
+    desired, target = state.update("combined", lambda t: False)
+    assert target is None
+    assert not os.path.exists(state.desired_path)
+    assert desired == {"generation": 0, "models": {}}
+
+
+def test_sync_applies_desired_state_and_reports(tmp_path):
+    applied = []
+    state = make_state(tmp_path, applied, {"serving": {"combined": "keras:v1"}})
+    state.update("combined", lambda t: t.update(shadow=None))
+
+    state.sync()
+
+    assert applied[0]["models"]["combined"]["generation"] == 1
+    [worker] = state.workers()
+    assert worker["pid"] == os.getpid()
+    assert worker["serving"] == {"combined": "keras:v1"}
+
+
+def test_stale_workers_are_not_listed(tmp_path):
+    state = make_state(tmp_path)
+    os.makedirs(state.workers_dir)
+    with open(os.path.join(state.workers_dir, "1.json"), "w") as f:
+        json.dump({"pid": 1, "updated_at": time.time() - 3600}, f)
+    state.report()
+
+    assert [w["pid"] for w in state.workers()] == [os.getpid()]
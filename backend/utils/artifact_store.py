@@ -0,0 +1,180 @@
+"""
+Bounded store for generated images (Grad-CAM overlays and originals).
+Files are sharded into hash-prefixed subdirectories and evicted in the
+background once they exceed an age, total size or file count limit.
+"""
+
+import os
+import time
+import uuid
+import threading
+
+from PIL import Image
+from config import (
+    STATIC_FOLDER, ARTIFACT_MAX_BYTES, ARTIFACT_MAX_FILES,
+    ARTIFACT_MAX_AGE, ARTIFACT_SWEEP_INTERVAL, ARTIFACT_SHARD_DEPTH
+)
+
+
+class ArtifactStore:
+    """
+    Args:
+        root: Directory served under /api/static
+        max_bytes: Total size limit; oldest files are removed beyond it
+        max_files: File count limit
+        max_age: Seconds a file is kept regardless of the other limits
+        sweep_interval: Seconds between background eviction passes
+        shard_depth: Number of two-hex-character directory levels per file
+    """
+
+    def __init__(self, root, max_bytes, max_files, max_age, sweep_interval=300, shard_depth=2):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.max_age = max_age
+        self.sweep_interval = sweep_interval
+        self.shard_depth = shard_depth
+
+        self._lock = threading.Lock()
+        self._sweeper = None
+        self._total_bytes = 0
+        self._total_files = 0
+        self._evicted = 0
+        self._last_sweep = None
+        os.makedirs(root, exist_ok=True)
+
+    def _ensure_sweeper(self):
+        # Started lazily so it runs in the process that serves requests
+        if self._sweeper is not None and self._sweeper.is_alive():
+            return
+        with self._lock:
+            if self._sweeper is None or not self._sweeper.is_alive():
+                self._sweeper = threading.Thread(
+                    target=self._sweep_loop, name="artifact-sweeper", daemon=True
+                )
+                self._sweeper.start()
+
+    def _sweep_loop(self):
+        while True:
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Artifact sweep failed: {e}")
+            time.sleep(self.sweep_interval)
+
+    def new_name(self, prefix, ext="png"):
+        """Relative path for a new artifact, e.g. 'ab/cd/gradcam_abcd....png'."""
+        token = uuid.uuid4().hex
+        shards = [token[2 * i:2 * i + 2] for i in range(self.shard_depth)]
+        return "/".join(shards + [f"{prefix}_{token}.{ext}"])
+
+    def path_for(self, name):
+        return os.path.join(self.root, *name.split("/"))
+
+    def save_image(self, image_rgb, prefix, ext="png"):
+        """Save an RGB uint8 array and return its name relative to the root."""
+        self._ensure_sweeper()
+        name = self.new_name(prefix, ext)
+        path = self.path_for(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        Image.fromarray(image_rgb).save(path)
+
+        size = os.path.getsize(path)
+        with self._lock:
+            self._total_bytes += size
+            self._total_files += 1
+        return name
+
+    def exists(self, name):
+        return os.path.isfile(self.path_for(name))
+
+    def _scan(self):
+        files = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                try:
+                    st = os.stat(os.path.join(dirpath, filename))
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, os.path.join(dirpath, filename)))
+        files.sort()
+        return files
+
+    def sweep(self):
+        """Remove expired files, then the oldest ones until under the limits."""
+        started = time.time()
+        files = self._scan()
+        total_bytes = sum(size for _, size, _ in files)
+        total_files = len(files)
+        cutoff = time.time() - self.max_age
+        evicted = 0
+
+        for mtime, size, path in files:
+            if (mtime >= cutoff and total_bytes <= self.max_bytes
+                    and total_files <= self.max_files):
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total_bytes -= size
+            total_files -= 1
+            evicted += 1
+
+        self._prune_empty_dirs(started)
+        with self._lock:
+            self._total_bytes = total_bytes
+            self._total_files = total_files
+            self._evicted += evicted
+            self._last_sweep = time.time()
+        return evicted
+
+    def _prune_empty_dirs(self, started):
+        """
+        Remove empty shard directories not modified since the sweep started.
+        A directory that save_image() (in any worker) has just created is
+        still empty until the image is written, so it is left for a later sweep.
+        """
+        for dirpath, dirnames, filenames in os.walk(self.root, topdown=False):
+            if dirpath == self.root or dirnames or filenames:
+                continue
+            try:
+                if os.path.getmtime(dirpath) >= started:
+                    continue
+                os.rmdir(dirpath)
+            except OSError:
+                pass
+
+    def stats(self):
+        self._ensure_sweeper()
+        with self._lock:
+            return {
+                "files": self._total_files,
+                "bytes": self._total_bytes,
+                "max_files": self.max_files,
+                "max_bytes": self.max_bytes,
+                "max_age_seconds": self.max_age,
+                "evicted": self._evicted,
+                "last_sweep": self._last_sweep,
+            }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_artifact_store():
+    """Process-wide store for STATIC_FOLDER, created on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ArtifactStore(
+                    STATIC_FOLDER,
+                    max_bytes=ARTIFACT_MAX_BYTES,
+                    max_files=ARTIFACT_MAX_FILES,
+                    max_age=ARTIFACT_MAX_AGE,
+                    sweep_interval=ARTIFACT_SWEEP_INTERVAL,
+                    shard_depth=ARTIFACT_SHARD_DEPTH,
+                )
+    return _store
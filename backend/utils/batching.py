@@ -0,0 +1,241 @@
+"""
+Dynamic micro-batching for model inference.
+Collects prediction requests that arrive within a short window and runs
+them through the model as one batched forward pass.
+
+SharedBatchScheduler serves every model loaded side by side from a single
+worker thread: each model gets its own ModelQueue.
+"""
+
+import time
+import threading
+from collections import deque, Counter
+from concurrent.futures import Future
+
+import numpy as np
+
+from utils.metrics import BATCH_SIZE, BATCH_SECONDS, QUEUE_WAIT_SECONDS
+
+
+class _Request:
+    __slots__ = ("sample", "future", "enqueued_at")
+
+    def __init__(self, sample):
+        self.sample = sample
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class BatchStats:
+    """
+    Rolling batch size, queue-wait and batch-time statistics, also exported
+    as Prometheus histograms labelled with the model name.
+    """
+
+    def __init__(self, history_size=2048, name="default"):
+        self._batch_size_metric = BATCH_SIZE.labels(name)
+        self._batch_time_metric = BATCH_SECONDS.labels(name)
+        self._queue_wait_metric = QUEUE_WAIT_SECONDS.labels(name)
+        self._lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._queue_waits = deque(maxlen=history_size)
+        self._batch_times = deque(maxlen=history_size)
+        self._total_requests = 0
+        self._total_batches = 0
+
+    def record(self, batch, started, finished):
+        self._batch_size_metric.observe(len(batch))
+        self._batch_time_metric.observe(finished - started)
+        for r in batch:
+            self._queue_wait_metric.observe(started - r.enqueued_at)
+        with self._lock:
+            self._total_batches += 1
+            self._total_requests += len(batch)
+            self._batch_sizes[len(batch)] += 1
+            self._batch_times.append(finished - started)
+            for r in batch:
+                self._queue_waits.append(started - r.enqueued_at)
+
+    def snapshot(self, max_batch_size, max_wait, queue_depth):
+        with self._lock:
+            waits = np.array(self._queue_waits, dtype=np.float64) * 1000.0
+            times = np.array(self._batch_times, dtype=np.float64) * 1000.0
+            stats = {
+                "max_batch_size": max_batch_size,
+                "max_wait_ms": max_wait * 1000.0,
+                "queue_depth": queue_depth,
+                "total_requests": self._total_requests,
+                "total_batches": self._total_batches,
+                "avg_batch_size": (self._total_requests / self._total_batches
+                                   if self._total_batches else 0.0),
+                "batch_size_counts": {str(k): v for k, v in sorted(self._batch_sizes.items())},
+            }
+
+        if waits.size:
+            p50, p95, p99 = np.percentile(waits, [50, 95, 99])
+            stats["queue_wait_ms"] = {
+                "mean": float(waits.mean()), "p50": float(p50),
+                "p95": float(p95), "p99": float(p99), "max": float(waits.max()),
+            }
+        if times.size:
+            stats["batch_time_ms"] = {
+                "mean": float(times.mean()),
+                "p99": float(np.percentile(times, 99)),
+            }
+        return stats
+
+
+def _run_batch(predict_fn, batch):
+    """Run one batch and resolve its futures; returns (started, finished) or None on error."""
+    started = time.perf_counter()
+    try:
+        outputs = predict_fn(np.stack([r.sample for r in batch]))
+    except Exception as e:
+        for r in batch:
+            r.future.set_exception(e)
+        return None
+    finished = time.perf_counter()
+
+    for i, r in enumerate(batch):
+        r.future.set_result(outputs[i])
+    return started, finished
+
+
+class ModelQueue:
+    """
+    One model's request queue on a SharedBatchScheduler: submit single
+    samples (or several that should share a batch) and get Futures back.
+    """
+
+    def __init__(self, scheduler, key, predict_fn, history_size=2048):
+        self.scheduler = scheduler
+        self.key = key
+        self.predict_fn = predict_fn
+        self._pending = deque()
+        self._stats = BatchStats(history_size, name=key)
+
+    def submit(self, sample):
+        """Queue one sample (without batch dimension) and return a Future."""
+        req = _Request(sample)
+        self.scheduler._enqueue(self, [req])
+        return req.future
+
+    def submit_many(self, samples):
+        """Queue several samples together so they share a batch; one Future each."""
+        requests = [_Request(sample) for sample in samples]
+        self.scheduler._enqueue(self, requests)
+        return [req.future for req in requests]
+
+    def predict(self, sample, timeout=None):
+        """Blocking helper around submit()."""
+        return self.submit(sample).result(timeout=timeout)
+
+    def queue_depth(self):
+        return len(self._pending)
+
+    def stats(self):
+        return self._stats.snapshot(self.scheduler.max_batch_size, self.scheduler.max_wait,
+                                    self.queue_depth())
+
+
+class SharedBatchScheduler:
+    """
+    A single inference worker shared by several models. Each model registers
+    its own queue; the worker always serves the model whose oldest request
+    has waited longest and batches up to max_batch_size of that model's
+    requests, so one busy model cannot starve the others and models never
+    compete for CPU threads with concurrent forward passes.
+
+    Args:
+        max_batch_size: Largest batch handed to a model's predict_fn
+        max_wait_ms: How long the first request in a batch may wait for company
+    """
+
+    def __init__(self, max_batch_size=8, max_wait_ms=5.0, history_size=2048):
+        self.max_batch_size = max(int(max_batch_size), 1)
+        self.max_wait = max(float(max_wait_ms), 0.0) / 1000.0
+        self.history_size = history_size
+
+        self._cond = threading.Condition()
+        self._queues = {}    # key -> registered ModelQueue
+        self._busy = set()   # queues with pending requests (registered or not)
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+    def register(self, key, predict_fn):
+        """
+        Create the queue for a model. Registering a key again replaces the
+        queue for new requests; requests already on the old one still run.
+        """
+        q = ModelQueue(self, key, predict_fn, self.history_size)
+        with self._cond:
+            self._queues[key] = q
+        return q
+
+    def unregister(self, q):
+        """Stop listing a queue; its pending requests are still served."""
+        with self._cond:
+            if self._queues.get(q.key) is q:
+                del self._queues[q.key]
+
+    def queue_depth(self):
+        with self._cond:
+            return sum(len(q._pending) for q in self._busy)
+
+    def queue_depths(self):
+        """Pending samples per registered model queue."""
+        with self._cond:
+            return {key: len(q._pending) for key, q in self._queues.items()}
+
+    def _ensure_worker(self):
+        # Started lazily so it lives in the process that serves requests (fork-safe)
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name="batch-scheduler", daemon=True
+                )
+                self._worker.start()
+
+    def _enqueue(self, q, requests):
+        self._ensure_worker()
+        with self._cond:
+            q._pending.extend(requests)
+            self._busy.add(q)
+            self._cond.notify()
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._busy:
+                self._cond.wait()
+            q = min(self._busy, key=lambda queue_: queue_._pending[0].enqueued_at)
+            deadline = q._pending[0].enqueued_at + self.max_wait
+            while len(q._pending) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = [q._pending.popleft()
+                     for _ in range(min(len(q._pending), self.max_batch_size))]
+            if not q._pending:
+                self._busy.discard(q)
+            return q, batch
+
+    def _run(self):
+        while True:
+            q, batch = self._next_batch()
+            timing = _run_batch(q.predict_fn, batch)
+            if timing is not None:
+                q._stats.record(batch, *timing)
+
+    def stats(self):
+        """Scheduler settings plus per-model batching statistics."""
+        with self._cond:
+            queues = dict(self._queues)
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "queue_depth": self.queue_depth(),
+            "models": {key: q.stats() for key, q in queues.items()},
+        }
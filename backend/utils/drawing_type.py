@@ -0,0 +1,61 @@
+"""
+Lightweight spiral / wave detection for routing requests that do not say
+which drawing they contain.
+
+A wave drawing is a horizontal stroke: every column crosses the ink about
+once, while rows cross it many times. Columns through a spiral cross several
+turns, and rows and columns look alike. Counting ink runs per column and per
+row is cheap on the decoded (IMG_SIZE, IMG_SIZE, 3) image and does not
+depend on the aspect ratio lost when wave sheets are resized to a square.
+
+Drawings that fit neither pattern clearly (e.g. two column runs and as many
+row runs) are left undecided, so the request goes to the combined model
+instead of the wrong specialist. model/evaluate_drawing_type.py measures
+the detector on the compiled dataset.
+"""
+
+import numpy as np
+
+INK_CONTRAST = 48      # grey levels below the paper (median) that count as ink
+MIN_INK_FRACTION = 0.002
+WAVE_MAX_COLUMN_RUNS = 2     # median ink runs per column of a wave
+SPIRAL_MIN_COLUMN_RUNS = 3   # ... and of a spiral; in between is ambiguous
+WAVE_ROW_MARGIN = 1          # a wave's rows cross the stroke at least this much more often
+
+
+def ink_mask(image_rgb):
+    """Boolean mask of dark ink on light paper."""
+    gray = image_rgb.mean(axis=2)
+    return gray < np.median(gray) - INK_CONTRAST
+
+
+def _runs(mask):
+    """Separate ink runs down each column of mask."""
+    return np.count_nonzero(mask[1:] & ~mask[:-1], axis=0) + mask[0]
+
+
+def detect_drawing_type(image_rgb):
+    """
+    Guess "spiral" or "wave" for a decoded drawing.
+    Returns (drawing_type or None if there is too little ink or the run
+    statistics are ambiguous, features).
+    """
+    mask = ink_mask(image_rgb)
+    if mask.mean() < MIN_INK_FRACTION:
+        return None, {"ink_fraction": float(mask.mean())}
+
+    col_runs = _runs(mask)
+    row_runs = _runs(mask.T)
+    col_median = float(np.median(col_runs[col_runs > 0]))
+    row_median = float(np.median(row_runs[row_runs > 0]))
+    features = {
+        "ink_fraction": round(float(mask.mean()), 4),
+        "column_runs": col_median,
+        "row_runs": row_median,
+    }
+    if col_median <= WAVE_MAX_COLUMN_RUNS and row_median >= col_median + WAVE_ROW_MARGIN:
+        return "wave", features
+    if col_median >= SPIRAL_MIN_COLUMN_RUNS:
+        return "spiral", features
+    features["ambiguous"] = True
+    return None, features
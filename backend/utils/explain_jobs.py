@@ -0,0 +1,148 @@
+"""
+Background Grad-CAM rendering.
+Lets the prediction endpoints answer immediately and render heatmaps in a
+bounded worker pool that clients poll for the result.
+
+With status_dir set, every state change is also written to a small JSON
+file there, so a poll answered by another gunicorn worker (which never saw
+the job in memory) still finds it.
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ExplainJobs:
+    """
+    Bounded executor plus a registry of job states.
+
+    Args:
+        max_workers: Number of render threads
+        max_pending: Jobs allowed to be queued or running at once
+        ttl_seconds: How long finished jobs stay pollable
+        status_dir: Directory shared by all worker processes for job states
+    """
+
+    JOB_ID = re.compile(r"^[0-9a-f]{32}$")
+
+    def __init__(self, max_workers=2, max_pending=32, ttl_seconds=600, status_dir=None):
+        self.max_pending = max_pending
+        self.ttl_seconds = ttl_seconds
+        self.status_dir = status_dir
+        self._last_cleanup = 0.0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="grad-cam")
+        self._jobs = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args):
+        """
+        Schedule fn(*args), which should return a Grad-CAM filename or None.
+        Returns the job id, or None if the queue is full.
+        """
+        with self._lock:
+            self._evict_expired()
+            if self._pending >= self.max_pending:
+                return None
+            self._pending += 1
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {"status": "pending", "created_at": time.time()}
+            self._write_status(job_id, self._jobs[job_id])
+
+        self._executor.submit(self._run, job_id, fn, args)
+        return job_id
+
+    def _run(self, job_id, fn, args):
+        self._update(job_id, status="running")
+        try:
+            filename = fn(*args)
+            if filename:
+                self._update(job_id, status="done", filename=filename)
+            else:
+                self._update(job_id, status="failed", error="Grad-CAM generation failed")
+        except Exception as e:
+            self._update(job_id, status="failed", error=str(e))
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+                if fields.get("status") in ("done", "failed"):
+                    job["finished_at"] = time.time()
+                self._write_status(job_id, job)
+
+    def _status_path(self, job_id):
+        return os.path.join(self.status_dir, f"{job_id}.json")
+
+    def _write_status(self, job_id, job):
+        if not self.status_dir:
+            return
+        try:
+            os.makedirs(self.status_dir, exist_ok=True)
+            tmp = self._status_path(job_id) + f".{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(job, f)
+            os.replace(tmp, self._status_path(job_id))
+        except OSError as e:
+            print(f"WARNING: Could not record Grad-CAM job {job_id}: {e}")
+
+    def _read_status(self, job_id):
+        if not self.status_dir or not self.JOB_ID.match(job_id):
+            return None
+        try:
+            with open(self._status_path(job_id), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _evict_expired(self):
+        now = time.time()
+        cutoff = now - self.ttl_seconds
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.get("finished_at", float("inf")) < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+        # Status files of every worker, at most once a minute
+        if not self.status_dir or now - self._last_cleanup < 60:
+            return
+        self._last_cleanup = now
+        try:
+            names = os.listdir(self.status_dir)
+        except OSError:
+            return
+        for name in names:
+            path = os.path.join(self.status_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                continue
+
+    def get(self, job_id):
+        """
+        Return a copy of the job state, or None if unknown or expired. Jobs
+        started by other worker processes are read from status_dir.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return dict(job)
+        job = self._read_status(job_id)
+        if job is None or job.get("finished_at", float("inf")) < time.time() - self.ttl_seconds:
+            return None
+        return job
+
+    def stats(self):
+        with self._lock:
+            return {"pending": self._pending, "tracked_jobs": len(self._jobs)}
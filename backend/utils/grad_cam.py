@@ -1,97 +1,209 @@
 """
 Grad-CAM (Gradient-weighted Class Activation Mapping) visualization.
 Shows which regions of the image the model focuses on for its prediction.
+
+TensorFlow and OpenCV are imported inside the functions that need them so
+importing this module stays cheap. The traced gradient step of a model is
+kept by its caller next to the model (LoadedModel.grad_fn), so both are
+freed together when the model is evicted or replaced.
 """
 
-import os
-import uuid
 import numpy as np
-import cv2
-import tensorflow as tf
 from PIL import Image
-from tensorflow.keras.applications.efficientnet import preprocess_input
-from config import IMG_SIZE, STATIC_FOLDER
+from config import IMG_SIZE, GRAD_CAM_LAYER
+from utils.artifact_store import get_artifact_store
+from utils.metrics import stage
+
+
+def find_last_conv_layer(model):
+    """Return the last Conv2D layer of the model (searching nested models too)."""
+    import tensorflow as tf
+
+    for layer in reversed(model.layers):
+        if isinstance(layer, tf.keras.layers.Conv2D):
+            return layer
+        # Also check inside the base model
+        if hasattr(layer, 'layers'):
+            for sub_layer in reversed(layer.layers):
+                if isinstance(sub_layer, tf.keras.layers.Conv2D):
+                    return sub_layer
+    return None
 
 
-def generate_grad_cam(model, img_array, original_image_path):
+def find_target_layer(model, layer_name=None):
     """
-    Generate Grad-CAM heatmap overlay for a prediction.
+    Resolve the Grad-CAM target layer by name, or the last Conv2D if no
+    name is given. Raises ValueError if the named layer does not exist.
+    """
+    if not layer_name:
+        return find_last_conv_layer(model)
+    for layer in model.layers:
+        if layer.name == layer_name:
+            return layer
+        if hasattr(layer, 'layers'):
+            for sub_layer in layer.layers:
+                if sub_layer.name == layer_name:
+                    return sub_layer
+    raise ValueError(f"Grad-CAM layer '{layer_name}' not found in model")
+
+
+def _build_grad_fn(model, target_layer):
+    import tensorflow as tf
+
+    grad_model = tf.keras.Model(
+        inputs=model.input,
+        outputs=[target_layer.output, model.output]
+    )
+
+    @tf.function(input_signature=[tf.TensorSpec((None, IMG_SIZE, IMG_SIZE, 3), tf.float32)])
+    def grad_step(images):
+        with tf.GradientTape() as tape:
+            conv_outputs, predictions = grad_model(images, training=False)
+            loss = predictions[:, 0]
+        grads = tape.gradient(loss, conv_outputs)
+
+        # Global average pooling of gradients (per image)
+        pooled_grads = tf.reduce_mean(grads, axis=(1, 2))
+
+        # Weight the feature maps
+        heatmaps = tf.reduce_sum(conv_outputs * pooled_grads[:, tf.newaxis, tf.newaxis, :], axis=-1)
+        heatmaps = tf.maximum(heatmaps, 0)
+        heatmaps = heatmaps / (tf.reduce_max(heatmaps, axis=(1, 2), keepdims=True) + 1e-8)
+        return predictions[:, 0], heatmaps
+
+    return grad_step
+
+
+def build_grad_fn(model, layer_name=GRAD_CAM_LAYER):
+    """
+    Build the compiled gradient step for a model (traced on first call).
+    Returns None if the model has no suitable target layer.
+    """
+    target_layer = find_target_layer(model, layer_name)
+    return _build_grad_fn(model, target_layer) if target_layer is not None else None
+
+
+def compute_grad_cam(grad_fn, img_array):
+    """
+    Run a single taped forward pass that yields both the prediction and
+    the Grad-CAM heatmap, so the explanation costs no extra forward pass.
 
     Args:
-        model: Trained Keras model
+        grad_fn: Gradient step from build_grad_fn(), or None
         img_array: Preprocessed image array (1, 224, 224, 3)
-        original_image_path: Path to original image for overlay
 
     Returns:
-        Path to saved Grad-CAM image, or None on failure
+        (score, heatmap) where score is the raw sigmoid output and heatmap is
+        a 2D float array in [0, 1] at conv resolution.
+        Returns (None, None) if the model has no convolutional layer.
     """
-    try:
-        # Find the last convolutional layer
-        last_conv_layer = None
-        for layer in reversed(model.layers):
-            if isinstance(layer, tf.keras.layers.Conv2D):
-                last_conv_layer = layer
-                break
-            # Also check inside the base model
-            if hasattr(layer, 'layers'):
-                for sub_layer in reversed(layer.layers):
-                    if isinstance(sub_layer, tf.keras.layers.Conv2D):
-                        last_conv_layer = sub_layer
-                        break
-                if last_conv_layer:
-                    break
-
-        if last_conv_layer is None:
-            return None
-
-        # Create gradient model
-        grad_model = tf.keras.Model(
-            inputs=model.input,
-            outputs=[last_conv_layer.output, model.output]
-        )
-
-        # Compute gradients
-        with tf.GradientTape() as tape:
-            conv_outputs, predictions = grad_model(img_array)
-            loss = predictions[:, 0]
+    scores, heatmaps = compute_grad_cam_batch(grad_fn, img_array)
+    if scores is None:
+        return None, None
+    return float(scores[0]), heatmaps[0]
 
-        grads = tape.gradient(loss, conv_outputs)
 
-        if grads is None:
-            return None
+def compute_grad_cam_batch(grad_fn, img_batch):
+    """
+    Batched compute_grad_cam(): one taped pass over an (N, 224, 224, 3) batch.
 
-        # Global average pooling of gradients
-        pooled_grads = tf.reduce_mean(grads, axis=(0, 1, 2))
+    Returns:
+        (scores, heatmaps) as numpy arrays of shape (N,) and (N, h, w),
+        or (None, None) if the model has no convolutional layer.
+    """
+    if grad_fn is None:
+        return None, None
 
-        # Weight the feature maps
-        conv_outputs = conv_outputs[0]
-        heatmap = conv_outputs @ pooled_grads[..., tf.newaxis]
-        heatmap = tf.squeeze(heatmap)
-        heatmap = tf.maximum(heatmap, 0) / (tf.math.reduce_max(heatmap) + 1e-8)
-        heatmap = heatmap.numpy()
+    scores, heatmaps = grad_fn(np.asarray(img_batch, dtype=np.float32))
+    return scores.numpy(), heatmaps.numpy()
+
+
+def grad_cam_batch_fn(grad_fn):
+    """
+    Batch function for a SharedBatchScheduler queue: concurrent explain
+    requests share one taped pass and each gets back (score, heatmap).
+    """
+    def explain_batch(img_batch):
+        scores, heatmaps = compute_grad_cam_batch(grad_fn, img_batch)
+        return list(zip(scores, heatmaps))
+
+    return explain_batch
+
+
+def render_grad_cam(heatmap, original_image):
+    """
+    Overlay a Grad-CAM heatmap on the original image and save it.
+
+    Args:
+        heatmap: 2D heatmap in [0, 1] from compute_grad_cam()
+        original_image: Decoded (IMG_SIZE, IMG_SIZE, 3) RGB uint8 array,
+            or a path to an image file
 
+    Returns:
+        Name of the saved Grad-CAM image relative to STATIC_FOLDER
+    """
+    import cv2
+
+    with stage("grad_cam_colormap"):
         # Resize heatmap to original image size
         heatmap = cv2.resize(heatmap, (IMG_SIZE, IMG_SIZE))
         heatmap = np.uint8(255 * heatmap)
         heatmap_colored = cv2.applyColorMap(heatmap, cv2.COLORMAP_JET)
 
-        # Load and resize original image
-        original = Image.open(original_image_path).convert("RGB").resize((IMG_SIZE, IMG_SIZE))
-        original_np = np.array(original)
+        # Reuse the decoded image when we have it; only fall back to disk for paths
+        if isinstance(original_image, np.ndarray):
+            original_np = original_image
+        else:
+            original = Image.open(original_image).convert("RGB").resize((IMG_SIZE, IMG_SIZE))
+            original_np = np.array(original)
         original_bgr = cv2.cvtColor(original_np, cv2.COLOR_RGB2BGR)
 
         # Overlay heatmap on original
         overlay = cv2.addWeighted(original_bgr, 0.6, heatmap_colored, 0.4, 0)
         overlay_rgb = cv2.cvtColor(overlay, cv2.COLOR_BGR2RGB)
 
-        # Save
-        os.makedirs(STATIC_FOLDER, exist_ok=True)
-        filename = f"gradcam_{uuid.uuid4().hex[:8]}.png"
-        filepath = os.path.join(STATIC_FOLDER, filename)
-        Image.fromarray(overlay_rgb).save(filepath)
+    # PNG encode + write into the bounded artifact store
+    with stage("grad_cam_encode"):
+        return get_artifact_store().save_image(overlay_rgb, "gradcam")
+
 
-        return filename
+def predict_with_grad_cam(explainer, img_array, original_image):
+    """
+    Fused prediction + Grad-CAM from one forward pass, queued on explainer
+    (the model's grad_cam_batch_fn() queue) so concurrent requests share it.
 
+    Returns:
+        (score, grad_cam_filename). score is None if the model cannot be
+        explained; grad_cam_filename is None on failure.
+    """
+    if explainer is None:
+        return None, None
+    try:
+        with stage("grad_cam_gradient"):
+            score, heatmap = explainer.predict(img_array[0])
     except Exception as e:
         print(f"Grad-CAM generation failed: {e}")
-        return None
+        return None, None
+
+    score = float(score)
+    try:
+        return score, render_grad_cam(heatmap, original_image)
+    except Exception as e:
+        print(f"Grad-CAM generation failed: {e}")
+        return score, None
+
+
+def generate_grad_cam(explainer, img_array, original_image):
+    """
+    Generate Grad-CAM heatmap overlay for a prediction.
+
+    Args:
+        explainer: The model's Grad-CAM queue (see predict_with_grad_cam())
+        img_array: Preprocessed image array (1, 224, 224, 3)
+        original_image: Decoded RGB array (or image path) for the overlay
+
+    Returns:
+        Path to saved Grad-CAM image, or None on failure
+    """
+    _, filename = predict_with_grad_cam(explainer, img_array, original_image)
+    return filename
@@ -0,0 +1,295 @@
+"""
+Low-overhead in-process metrics, rendered in the Prometheus text format on
+/metrics.
+
+Hot-path code times itself with `with stage("name"):`. This records into the
+stage_seconds histogram and, while a request is traced (start_trace()), into
+that request's Server-Timing breakdown. Values already kept elsewhere (queue
+depths, cache counters, artifact counts) are read at scrape time through
+callback metrics rather than tracked twice.
+
+Metrics are per process: with several gunicorn workers, a scrape reports the
+worker that answered it.
+"""
+
+import math
+import time
+import bisect
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Seconds; spans cache hits (~100 us) to cold Grad-CAM renders
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32)
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _counter_name(name):
+    return name if name.endswith("_total") else f"{name}_total"
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children = {}
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """The child for one combination of label values (positional)."""
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _samples(self, key, child):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            children = sorted(self._children.items())
+        for key, child in children:
+            lines.extend(self._samples(key, child))
+        return lines
+
+
+class _CounterValue:
+    __slots__ = ("_lock", "value")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount=1.0):
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        # Counter samples carry the _total suffix; use it for the family name too
+        super().__init__(_counter_name(name), documentation, labelnames)
+
+    def _new_child(self):
+        return _CounterValue()
+
+    def inc(self, amount=1.0):
+        self.labels().inc(amount)
+
+    def _samples(self, key, child):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} "
+                f"{_format_value(child.value)}"]
+
+
+class _HistogramValue:
+    __slots__ = ("_lock", "buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def _samples(self, key, child):
+        with child._lock:
+            counts, total, count = list(child.counts), child.sum, child.count
+        names = self.labelnames + ("le",)
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.buckets + (math.inf,), counts):
+            cumulative += n
+            lines.append(f"{self.name}_bucket{_format_labels(names, key + (_format_value(bound),))} "
+                         f"{cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class CallbackMetric:
+    """
+    Gauge or counter read at scrape time. fn returns a number, or a dict of
+    {tuple of label values: number}. Errors skip the metric for that scrape.
+    """
+
+    def __init__(self, name, documentation, fn, kind="gauge", labelnames=()):
+        self.name = _counter_name(name) if kind == "counter" else name
+        self.documentation = documentation
+        self.fn = fn
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+
+    def render(self):
+        try:
+            values = self.fn()
+        except Exception as e:
+            print(f"WARNING: Metric {self.name} unavailable: {e}")
+            return []
+        if not isinstance(values, dict):
+            values = {(): values}
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in sorted(values.items()):
+            if value is None:
+                continue
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} "
+                         f"{_format_value(float(value))}")
+        return lines
+
+
+class MetricsRegistry:
+    """Ordered collection of metrics rendered together."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def register(self, metric):
+        with self._lock:
+            # Re-registering a name (e.g. a recreated app) replaces the old metric
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name, documentation, fn, kind="gauge", labelnames=()):
+        return self.register(CallbackMetric(name, documentation, fn, kind, labelnames))
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "parkinsons_stage_seconds",
+    "Time spent in each stage of request handling",
+    ("stage",),
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    "parkinsons_http_request_seconds",
+    "HTTP request latency by route",
+    ("endpoint", "method", "status"),
+)
+BATCH_SIZE = REGISTRY.histogram(
+    "parkinsons_batch_size",
+    "Samples per batched forward pass",
+    ("model",),
+    buckets=BATCH_SIZE_BUCKETS,
+)
+QUEUE_WAIT_SECONDS = REGISTRY.histogram(
+    "parkinsons_batch_queue_wait_seconds",
+    "Time a sample waited in the batching queue",
+    ("model",),
+)
+BATCH_SECONDS = REGISTRY.histogram(
+    "parkinsons_batch_seconds",
+    "Forward pass time per batch",
+    ("model",),
+)
+
+
+# Stage timings of the request being handled in this context, or None
+_trace = contextvars.ContextVar("metrics_trace", default=None)
+
+
+def start_trace():
+    """Collect stage timings for the current request; returns a token for end_trace()."""
+    return _trace.set([])
+
+
+def end_trace(token):
+    """Stop tracing and return the collected [(stage, seconds)]."""
+    stages = _trace.get()
+    _trace.reset(token)
+    return stages or []
+
+
+def record_stage(name, seconds):
+    """Record a stage duration measured by the caller."""
+    STAGE_SECONDS.labels(name).observe(seconds)
+    trace = _trace.get()
+    if trace is not None:
+        trace.append((name, seconds))
+
+
+@contextmanager
+def stage(name):
+    """Time the enclosed block as one request stage."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - started)
+
+
+def server_timing(stages, total=None):
+    """Server-Timing header value (ms), summing repeated stages in first-seen order."""
+    totals = {}
+    for name, seconds in stages:
+        totals[name] = totals.get(name, 0.0) + seconds
+    parts = [f"{name};dur={seconds * 1000.0:.2f}" for name, seconds in totals.items()]
+    if total is not None:
+        parts.append(f"total;dur={total * 1000.0:.2f}")
+    return ", ".join(parts)
@@ -0,0 +1,223 @@
+"""
+Registry of models served side by side: the combined model, per drawing
+type specialists and any other configured versions.
+
+Models are loaded on first use (or preloaded), each with its own queue on
+the shared batch scheduler. At most max_loaded stay resident; before a new
+model is loaded the least recently used unpinned one is evicted. Requests
+already holding an evicted model finish on it, and its memory is freed once
+they drop their references.
+
+Memory per model is reported two ways: parameter bytes (Keras weights, or
+the file size for TFLite/ONNX exports) and the process RSS growth measured
+while it loaded, which also covers graphs and interpreter buffers but is
+only approximate when loads overlap.
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+
+
+def process_rss():
+    """Resident set size of this process in bytes, or None if unavailable."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def parameter_bytes(loaded, path):
+    """Weight bytes of a Keras model, or the model file size for exports."""
+    if loaded is not None:
+        return int(sum(w.numpy().nbytes for w in loaded.weights))
+    return os.path.getsize(path)
+
+
+class LoadedModel:
+    """One loaded, warmed model with its batching queue and operating threshold."""
+
+    def __init__(self, name, backend, path, version, model, serving, batcher,
+                 threshold, timings=None, memory=None, tta_thresholds=None, grad_fn=None,
+                 explain_batcher=None):
+        self.name = name
+        self.backend = backend
+        self.path = path
+        self.version = version
+        self.model = model          # Keras model or None
+        self.grad_fn = grad_fn      # traced Grad-CAM step; freed with the entry
+        self.explain_batcher = explain_batcher  # scheduler queue running grad_fn
+        self.serving = serving      # BucketedServing
+        self.batcher = batcher      # ModelQueue on the shared scheduler
+        self.threshold = threshold  # for single-view requests
+        self.tta_thresholds = tta_thresholds or {}  # views -> threshold
+        self.timings = timings or {}
+        self.memory = memory or {}
+        self.loaded_at = time.time()
+        self.last_used = self.loaded_at
+        self.requests = 0
+
+    @property
+    def cache_version(self):
+        """Model version plus threshold: labels change when either does."""
+        return f"{self.version}@{self.threshold:g}"
+
+    def threshold_for(self, views):
+        """Operating threshold for a score averaged over views TTA views."""
+        if views == 1:
+            return self.threshold
+        return self.tta_thresholds.get(views, self.threshold)
+
+    def cache_version_for(self, views):
+        """cache_version for requests averaging views TTA views."""
+        if views == 1:
+            return self.cache_version
+        return f"{self.version}@{self.threshold_for(views):g}#tta{views}"
+
+    def touch(self):
+        self.last_used = time.time()
+        self.requests += 1
+
+    def info(self):
+        return {
+            "backend": self.backend,
+            "version": self.version,
+            "decision_threshold": self.threshold,
+            "tta_decision_thresholds": {str(k): v for k, v in sorted(self.tta_thresholds.items())},
+            "grad_cam": self.grad_fn is not None,
+            "memory": self.memory,
+            "timings_ms": self.timings,
+            "loaded_at": self.loaded_at,
+            "last_used": self.last_used,
+            "requests": self.requests,
+        }
+
+
+class ModelRegistry:
+    """
+    Named models with lazy loading and LRU eviction.
+
+    Args:
+        specs: name -> {"backend": ..., "path": ...}
+        load_fn: Callable (name, spec) -> LoadedModel; raises on failure
+        max_loaded: Most models kept resident at once
+        pinned: Names never evicted (e.g. the default model)
+        on_evict: Called with each LoadedModel dropped from the registry
+    """
+
+    def __init__(self, specs, load_fn, max_loaded=3, pinned=(), on_evict=None):
+        self.specs = dict(specs)
+        self.max_loaded = max(int(max_loaded), 1)
+        self.pinned = set(pinned)
+        self._load_fn = load_fn
+        self._on_evict = on_evict
+
+        self._lock = threading.Lock()
+        self._models = OrderedDict()  # least recently used first
+        self._load_locks = {}
+        self._errors = {}
+        self.evictions = 0
+
+    def available(self, name):
+        """True if name is configured and its model file exists."""
+        spec = self.specs.get(name)
+        return spec is not None and os.path.exists(spec["path"])
+
+    def loaded(self):
+        """Currently loaded models by name, least recently used first."""
+        with self._lock:
+            return dict(self._models)
+
+    def peek(self, name):
+        """Loaded model for name without loading it or touching its LRU slot."""
+        return self._models.get(name)
+
+    def get(self, name):
+        """
+        Loaded model for name, loading it first if needed (concurrent callers
+        wait for the same load). Returns None if it cannot be loaded.
+        """
+        with self._lock:
+            entry = self._models.get(name)
+            if entry is None:
+                load_lock = self._load_locks.setdefault(name, threading.Lock())
+        if entry is None:
+            with load_lock:
+                entry = self._models.get(name) or self.load(name)
+            if entry is None:
+                return None
+        with self._lock:
+            if self._models.get(name) is entry:
+                self._models.move_to_end(name)
+        entry.touch()
+        return entry
+
+    def load(self, name):
+        """Load name (replacing any loaded copy) and publish it; None on failure."""
+        spec = self.specs.get(name)
+        if spec is None:
+            self._errors[name] = f"Unknown model '{name}'"
+            return None
+        if name not in self._models:
+            self._make_room()
+        try:
+            entry = self._load_fn(name, spec)
+        except Exception as e:
+            self._errors[name] = str(e)
+            print(f"ERROR: Loading model '{name}' failed: {e}")
+            return None
+        self.publish(entry)
+        return entry
+
+    def publish(self, entry):
+        """
+        Make entry the served model for its name in one step. Requests that
+        already hold the previous entry finish on it.
+        """
+        if entry.name not in self._models:
+            self._make_room()
+        with self._lock:
+            old = self._models.pop(entry.name, None)
+            self._models[entry.name] = entry
+            self._errors.pop(entry.name, None)
+        if old is not None and self._on_evict:
+            self._on_evict(old)
+
+    def _make_room(self):
+        """Evict least recently used unpinned models until one more fits."""
+        evicted = []
+        with self._lock:
+            for name in list(self._models):
+                if len(self._models) < self.max_loaded:
+                    break
+                if name in self.pinned:
+                    continue
+                evicted.append(self._models.pop(name))
+                self.evictions += 1
+        for entry in evicted:
+            print(f"Evicting model '{entry.name}' (least recently used)")
+            if self._on_evict:
+                self._on_evict(entry)
+
+    def stats(self):
+        """Per-model load state, memory and usage, plus process RSS."""
+        loaded = self.loaded()
+        models = {}
+        for name, spec in self.specs.items():
+            info = {"loaded": name in loaded, "available": self.available(name),
+                    "backend": spec["backend"], "path": spec["path"]}
+            if name in loaded:
+                info.update(loaded[name].info())
+            if name in self._errors:
+                info["error"] = self._errors[name]
+            models[name] = info
+        return {
+            "max_loaded": self.max_loaded,
+            "pinned": sorted(self.pinned),
+            "loaded": list(loaded),
+            "evictions": self.evictions,
+            "process_rss_bytes": process_rss(),
+            "models": models,
+        }
@@ -0,0 +1,70 @@
+"""
+File-watch trigger for hot model reloads.
+Polls the files of the loaded models and reports a change once the new file
+has stayed the same for a whole poll interval, so a model that is still
+being copied into place is never loaded half-written.
+"""
+
+import os
+import time
+import threading
+
+
+def file_signature(path):
+    """(size, mtime) of a file, or None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class ModelFileWatcher:
+    """
+    Args:
+        interval: Seconds between polls
+        get_paths: Callable returning {model name: file path} to watch
+        on_change: Called as on_change(name, path) for each settled change
+    """
+
+    def __init__(self, interval, get_paths, on_change):
+        self.interval = max(float(interval), 0.1)
+        self.get_paths = get_paths
+        self.on_change = on_change
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+    def ensure_started(self):
+        # Started lazily so the thread lives in the serving process (fork-safe)
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name="model-watcher", daemon=True
+                )
+                self._worker.start()
+
+    def _run(self):
+        seen = {}      # name -> (path, signature) currently served
+        changing = {}  # name -> (path, signature) seen once, waiting to settle
+        while True:
+            time.sleep(self.interval)
+            try:
+                paths = self.get_paths()
+            except Exception as e:
+                print(f"WARNING: Model watcher could not list models: {e}")
+                continue
+            for name, path in paths.items():
+                current = (path, file_signature(path))
+                if name not in seen:
+                    seen[name] = current
+                elif current == seen[name]:
+                    changing.pop(name, None)
+                elif changing.get(name) != current:
+                    changing[name] = current
+                else:
+                    seen[name] = changing.pop(name)
+                    if current[1] is not None:
+                        print(f"Model file changed for '{name}': {path}")
+                        self.on_change(name, path)
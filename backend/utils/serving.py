@@ -0,0 +1,235 @@
+"""
+Compiled serving graph for the trained model.
+Wraps the Keras model in tf.function with fixed input signatures so
+requests skip Keras's model.predict() overhead and never pay tracing cost.
+TFLite and ONNX Runtime backends with the same interface serve exported models.
+"""
+
+import time
+import threading
+import numpy as np
+from config import IMG_SIZE
+
+
+def configure_tf_threads(intra_op=0, inter_op=0):
+    """
+    Limit TensorFlow's thread pools (0 keeps TensorFlow's default).
+    Must run before the TF runtime is initialized, i.e. before the model loads.
+    """
+    import tensorflow as tf
+
+    try:
+        if intra_op:
+            tf.config.threading.set_intra_op_parallelism_threads(intra_op)
+        if inter_op:
+            tf.config.threading.set_inter_op_parallelism_threads(inter_op)
+    except RuntimeError as e:
+        print(f"WARNING: Could not set TensorFlow thread pools: {e}")
+
+
+def time_single_image(predict_fn, image, repeats=20):
+    """Mean latency (ms) of a batch-1 prediction."""
+    batch = image[np.newaxis].astype(np.float32)
+    predict_fn(batch)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        predict_fn(batch)
+    return (time.perf_counter() - start) / repeats * 1000.0
+
+
+class BucketedServing:
+    """
+    Shared batching logic for serving backends: incoming batches are
+    zero-padded up to the nearest bucketed batch size, and larger batches
+    are split into max-bucket chunks. Subclasses implement _invoke().
+
+    Args:
+        buckets: Batch sizes to prepare, e.g. (1, 2, 4, 8)
+    """
+
+    backend = None
+
+    def __init__(self, buckets=(1, 2, 4, 8)):
+        self.buckets = sorted({int(b) for b in buckets if int(b) > 0})
+        self.max_bucket = self.buckets[-1]
+        self.warmup_ms = {}
+
+    def _invoke(self, bucket, batch):
+        raise NotImplementedError
+
+    def _bucket_for(self, n):
+        for b in self.buckets:
+            if b >= n:
+                return b
+        return self.max_bucket
+
+    def _run_bucket(self, batch):
+        n = batch.shape[0]
+        bucket = self._bucket_for(n)
+        if n < bucket:
+            padded = np.zeros((bucket,) + batch.shape[1:], dtype=np.float32)
+            padded[:n] = batch
+            batch = padded
+        return self._invoke(bucket, np.ascontiguousarray(batch, dtype=np.float32))[:n]
+
+    def predict(self, batch):
+        """Run a (N, IMG_SIZE, IMG_SIZE, 3) batch and return (N, 1) scores."""
+        if batch.shape[0] <= self.max_bucket:
+            return self._run_bucket(batch)
+        return np.concatenate([
+            self._run_bucket(batch[i:i + self.max_bucket])
+            for i in range(0, batch.shape[0], self.max_bucket)
+        ])
+
+    def warm_up(self):
+        """Execute every bucket once so the first real request is fast."""
+        for b in self.buckets:
+            start = time.perf_counter()
+            self._run_bucket(np.zeros((b, IMG_SIZE, IMG_SIZE, 3), dtype=np.float32))
+            self.warmup_ms[b] = (time.perf_counter() - start) * 1000.0
+            print(f"  Warmed {self.backend} bucket {b:>3}: {self.warmup_ms[b]:.1f} ms")
+        return self.warmup_ms
+
+
+class ServingModel(BucketedServing):
+    """
+    Calls the Keras model through one concrete function per bucketed batch size.
+
+    Args:
+        model: Loaded Keras model
+        buckets: Batch sizes to trace, e.g. (1, 2, 4, 8)
+    """
+
+    backend = "keras"
+
+    def __init__(self, model, buckets=(1, 2, 4, 8)):
+        import tensorflow as tf
+
+        super().__init__(buckets)
+        self.model = model
+
+        serve = tf.function(lambda x: model(x, training=False))
+        self._fns = {
+            b: serve.get_concrete_function(
+                tf.TensorSpec((b, IMG_SIZE, IMG_SIZE, 3), tf.float32)
+            )
+            for b in self.buckets
+        }
+
+    def _invoke(self, bucket, batch):
+        return self._fns[bucket](batch).numpy()
+
+
+class TFLiteServingModel(BucketedServing):
+    """
+    TFLite interpreter backend. Uses tflite_runtime when installed (no
+    TensorFlow import), otherwise tf.lite. One interpreter is allocated per
+    bucket, each behind its own lock since interpreters are not thread-safe.
+
+    Args:
+        model_path: Path to a .tflite file
+        buckets: Batch sizes to allocate, e.g. (1, 2, 4, 8)
+        num_threads: Interpreter threads (None = library default)
+    """
+
+    backend = "tflite"
+
+    def __init__(self, model_path, buckets=(1, 2, 4, 8), num_threads=None):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+
+        super().__init__(buckets)
+        self.model_path = model_path
+        self._interpreters = {}
+        for b in self.buckets:
+            interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+            input_index = interpreter.get_input_details()[0]["index"]
+            interpreter.resize_tensor_input(input_index, [b, IMG_SIZE, IMG_SIZE, 3])
+            interpreter.allocate_tensors()
+            self._interpreters[b] = (
+                interpreter,
+                interpreter.get_input_details()[0],
+                interpreter.get_output_details()[0],
+                threading.Lock(),
+            )
+
+    @staticmethod
+    def _quantize(batch, details):
+        scale, zero_point = details["quantization"]
+        if details["dtype"] == np.float32 or not scale:
+            return batch.astype(details["dtype"])
+        info = np.iinfo(details["dtype"])
+        q = np.round(batch / scale + zero_point)
+        return np.clip(q, info.min, info.max).astype(details["dtype"])
+
+    @staticmethod
+    def _dequantize(out, details):
+        scale, zero_point = details["quantization"]
+        if details["dtype"] == np.float32 or not scale:
+            return out.astype(np.float32)
+        return (out.astype(np.float32) - zero_point) * scale
+
+    def _invoke(self, bucket, batch):
+        interpreter, input_details, output_details, lock = self._interpreters[bucket]
+        with lock:
+            interpreter.set_tensor(input_details["index"], self._quantize(batch, input_details))
+            interpreter.invoke()
+            out = interpreter.get_tensor(output_details["index"])
+        return self._dequantize(out, output_details)
+
+
+class OnnxServingModel(BucketedServing):
+    """
+    ONNX Runtime backend on CPU. Importing onnxruntime is much lighter than
+    importing TensorFlow, and InferenceSession.run() is thread-safe.
+
+    Args:
+        model_path: Path to a .onnx export with a dynamic batch dimension
+        buckets: Batch sizes to warm, e.g. (1, 2, 4, 8)
+        intra_op_threads / inter_op_threads: ORT thread pools (0 = ORT default)
+        graph_optimization: "disable", "basic", "extended" or "all"
+        execution_mode: "sequential" or "parallel"
+    """
+
+    backend = "onnx"
+
+    def __init__(self, model_path, buckets=(1, 2, 4, 8), intra_op_threads=0,
+                 inter_op_threads=0, graph_optimization="all", execution_mode="sequential"):
+        import onnxruntime as ort
+
+        super().__init__(buckets)
+        self.model_path = model_path
+
+        levels = {
+            "disable": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+            "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+            "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+            "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+        }
+        modes = {
+            "sequential": ort.ExecutionMode.ORT_SEQUENTIAL,
+            "parallel": ort.ExecutionMode.ORT_PARALLEL,
+        }
+        if graph_optimization not in levels:
+            raise ValueError(f"Unknown ONNX graph optimization level '{graph_optimization}'")
+        if execution_mode not in modes:
+            raise ValueError(f"Unknown ONNX execution mode '{execution_mode}'")
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        options.graph_optimization_level = levels[graph_optimization]
+        options.execution_mode = modes[execution_mode]
+
+        self._session = ort.InferenceSession(
+            model_path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self._input_name = self._session.get_inputs()[0].name
+        self._output_name = self._session.get_outputs()[0].name
+
+    def _invoke(self, bucket, batch):
+        out = self._session.run([self._output_name], {self._input_name: batch})[0]
+        return out.astype(np.float32, copy=False)
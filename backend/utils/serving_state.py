@@ -0,0 +1,160 @@
+"""
+Model versions shared by every worker process.
+
+Admin calls (reload, shadow, promote, stop) do not change the worker that
+received them directly. They record the desired serving and shadow version
+of a model in desired.json, and every worker polls that file and brings its
+own copy in line. Each worker reports what it applied in workers/<pid>.json,
+so any worker can answer a status request for the whole server.
+
+Layout (root):
+    desired.json        {"generation": n, "models": {name: {"generation": n,
+                         "serving": {backend, path, version} | null,
+                         "shadow": {backend, path, version, percent} | null}}}
+    desired.lock        lock held while desired.json is read and rewritten
+    workers/<pid>.json  last state reported by each worker
+"""
+
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+
+def _write_json(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+def _read_json(path, default=None):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+class SharedServingState:
+    """
+    Args:
+        root: Directory shared by all worker processes
+        interval: Seconds between polls of desired.json
+        apply_fn: Called with the desired state on every poll
+        status_fn: Returns this worker's status dict for workers/<pid>.json
+    """
+
+    def __init__(self, root, interval, apply_fn, status_fn):
+        self.root = root
+        self.interval = max(float(interval), 0.1)
+        self.apply_fn = apply_fn
+        self.status_fn = status_fn
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+    @property
+    def desired_path(self):
+        return os.path.join(self.root, "desired.json")
+
+    @property
+    def workers_dir(self):
+        return os.path.join(self.root, "workers")
+
+    @contextmanager
+    def _locked(self):
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, "desired.lock"), "a") as lock_file:
+            try:
+                import fcntl
+            except ImportError:
+                # No cross-process lock (e.g. Windows); the dev server is one process
+                yield
+                return
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def desired(self):
+        """The desired state, or an empty one if nothing was recorded yet."""
+        return _read_json(self.desired_path) or {"generation": 0, "models": {}}
+
+    def update(self, name, change):
+        """
+        Change the target of one model under the lock. change(target) edits
+        the {"serving": ..., "shadow": ...} dict in place, or returns False to
+        leave the file untouched. Returns (desired, target), with target None
+        when nothing was changed.
+        """
+        with self._locked():
+            desired = self.desired()
+            target = desired["models"].get(name) or {"serving": None, "shadow": None}
+            if change(target) is False:
+                return desired, None
+            desired["generation"] = desired.get("generation", 0) + 1
+            target["generation"] = desired["generation"]
+            target["updated_at"] = time.time()
+            desired["models"][name] = target
+            _write_json(self.desired_path, desired)
+        return desired, target
+
+    def report(self):
+        """Write this worker's status file."""
+        status = dict(self.status_fn(), pid=os.getpid(), updated_at=time.time())
+        try:
+            os.makedirs(self.workers_dir, exist_ok=True)
+            _write_json(os.path.join(self.workers_dir, f"{os.getpid()}.json"), status)
+        except OSError as e:
+            print(f"WARNING: Could not write worker status: {e}")
+
+    def workers(self, max_age=None):
+        """Status of every worker that reported within max_age seconds."""
+        max_age = max_age if max_age is not None else max(10 * self.interval, 60.0)
+        cutoff = time.time() - max_age
+        try:
+            names = sorted(os.listdir(self.workers_dir))
+        except OSError:
+            return []
+        statuses = []
+        for name in names:
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.workers_dir, name)
+            status = _read_json(path)
+            if status is None or status.get("updated_at", 0) < cutoff:
+                # Exited worker; forget it after a while
+                try:
+                    if os.path.getmtime(path) < cutoff - 3600:
+                        os.remove(path)
+                except OSError:
+                    pass
+                continue
+            statuses.append(status)
+        return statuses
+
+    def sync(self):
+        """Apply the desired state once and report the result."""
+        self.apply_fn(self.desired())
+        self.report()
+
+    def ensure_started(self):
+        # Started in the serving process (after the gunicorn fork)
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name="serving-state", daemon=True
+                )
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.sync()
+            except Exception as e:
+                print(f"WARNING: Applying the shared serving state failed: {e}")
+            time.sleep(self.interval)
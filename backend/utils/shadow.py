@@ -0,0 +1,117 @@
+"""
+Shadow serving: a sampled share of a model's traffic is mirrored to a
+candidate version, off the request path, to record how often the two agree
+and how their latencies compare. Candidate answers are never returned.
+
+Mirrored samples go through the candidate's queue on the shared batch
+scheduler and are compared in a future callback, so no extra threads are
+used and requests never wait for the candidate.
+"""
+
+import time
+import random
+import threading
+from collections import deque
+
+import numpy as np
+
+
+def _percentiles(values):
+    if not values:
+        return None
+    arr = np.array(values, dtype=np.float64)
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    return {"mean": float(arr.mean()), "p50": float(p50), "p95": float(p95), "p99": float(p99)}
+
+
+class ShadowTraffic:
+    """
+    Mirror for one served model.
+
+    Args:
+        candidate: LoadedModel receiving the mirrored samples
+        percent: Share of the served model's predictions to mirror (0-100)
+        spec: Registry spec the candidate was loaded from (used when promoting)
+        max_pending: Mirrored samples in flight before new ones are skipped
+    """
+
+    def __init__(self, candidate, percent, spec=None, max_pending=16, history_size=2048):
+        self.candidate = candidate
+        self.percent = min(max(float(percent), 0.0), 100.0)
+        self.spec = spec
+        self.max_pending = max_pending
+        self.started_at = time.time()
+
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._closed = False
+        self.mirrored = 0
+        self.agreed = 0
+        self.skipped = 0
+        self.errors = 0
+        self._score_diffs = deque(maxlen=history_size)
+        self._primary_ms = deque(maxlen=history_size)
+        self._shadow_ms = deque(maxlen=history_size)
+
+    def maybe_mirror(self, img_array, primary_score, primary_threshold, primary_ms=None):
+        """
+        Mirror a served prediction with probability percent / 100.
+        primary_ms is the served model's latency for the same sample, if it
+        was measured on a comparable path (batched prediction, no Grad-CAM).
+        Returns True if the sample was queued for the candidate.
+        """
+        if self._closed or random.random() * 100.0 >= self.percent:
+            return False
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.skipped += 1
+                return False
+            self._pending += 1
+
+        started = time.perf_counter()
+        future = self.candidate.batcher.submit(img_array[0])
+        future.add_done_callback(
+            lambda f: self._compare(f, started, primary_score, primary_threshold, primary_ms)
+        )
+        return True
+
+    def _compare(self, future, started, primary_score, primary_threshold, primary_ms):
+        shadow_ms = (time.perf_counter() - started) * 1000.0
+        error = future.exception()
+        with self._lock:
+            self._pending -= 1
+            if error is not None:
+                self.errors += 1
+                return
+            score = float(future.result()[0])
+            self.mirrored += 1
+            self.agreed += ((primary_score > primary_threshold)
+                            == (score > self.candidate.threshold))
+            self._score_diffs.append(abs(score - primary_score))
+            self._shadow_ms.append(shadow_ms)
+            if primary_ms is not None:
+                self._primary_ms.append(primary_ms)
+
+    def close(self):
+        """Stop mirroring; samples already queued still complete."""
+        self._closed = True
+
+    def stats(self):
+        with self._lock:
+            diffs = list(self._score_diffs)
+            stats = {
+                "candidate_version": self.candidate.version,
+                "candidate_threshold": self.candidate.threshold,
+                "percent": self.percent,
+                "started_at": self.started_at,
+                "mirrored": self.mirrored,
+                "pending": self._pending,
+                "skipped_busy": self.skipped,
+                "errors": self.errors,
+                "label_agreement": self.agreed / self.mirrored if self.mirrored else None,
+                "primary_ms": _percentiles(list(self._primary_ms)),
+                "shadow_ms": _percentiles(list(self._shadow_ms)),
+            }
+        if diffs:
+            stats["score_abs_diff"] = {"mean": float(np.mean(diffs)), "max": float(np.max(diffs))}
+        return stats
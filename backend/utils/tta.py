@@ -0,0 +1,66 @@
+"""
+Deterministic test-time augmentation views.
+A fixed, ordered list of flips and small rotations mirroring the training
+augmentation, so the first k views are always the same transforms: scores
+cached per view by model/evaluate.py stay valid for every k.
+All transforms work on uint8 (H, W, 3) images or (N, H, W, 3) batches.
+"""
+
+import numpy as np
+
+# (name, horizontal flip, vertical flip, rotation in degrees)
+TTA_TRANSFORMS = (
+    ("identity", False, False, 0.0),
+    ("hflip", True, False, 0.0),
+    ("vflip", False, True, 0.0),
+    ("rot+10", False, False, 10.0),
+    ("rot-10", False, False, -10.0),
+    ("hvflip", True, True, 0.0),
+    ("hflip_rot+10", True, False, 10.0),
+    ("vflip_rot-10", False, True, -10.0),
+)
+MAX_VIEWS = len(TTA_TRANSFORMS)
+
+
+def _rotate(img, degrees):
+    import cv2
+
+    h, w = img.shape[:2]
+    matrix = cv2.getRotationMatrix2D((w / 2.0, h / 2.0), degrees, 1.0)
+    # Replicated borders match the training augmentation's fill_mode="nearest"
+    return cv2.warpAffine(img, matrix, (w, h), flags=cv2.INTER_LINEAR,
+                          borderMode=cv2.BORDER_REPLICATE)
+
+
+def apply_transform(images, view):
+    """Apply TTA view number `view` to one image or a batch of images."""
+    _, hflip, vflip, degrees = TTA_TRANSFORMS[view]
+    batched = images.ndim == 4
+    out = images
+    if hflip:
+        out = out[..., ::-1, :]
+    if vflip:
+        out = out[..., ::-1, :, :]
+    if degrees:
+        if batched:
+            out = np.stack([_rotate(np.ascontiguousarray(img), degrees) for img in out])
+        else:
+            out = _rotate(np.ascontiguousarray(out), degrees)
+    return np.ascontiguousarray(out)
+
+
+def tta_views(rgb, k, out=None):
+    """
+    First k views of one decoded uint8 image, stacked as a float32
+    (k, H, W, 3) model batch (written into out when given).
+    """
+    k = max(1, min(int(k), MAX_VIEWS))
+    if out is None:
+        out = np.empty((k,) + rgb.shape, dtype=np.float32)
+    for view in range(k):
+        out[view] = apply_transform(rgb, view)
+    return out[:k]
+
+
+def view_names(k):
+    return [name for name, _, _, _ in TTA_TRANSFORMS[:k]]
@@ -1,22 +1,35 @@
 """
 Dataset Combination Script
 Merges multiple Parkinson's drawing datasets into a unified structure.
-Deduplicates images by MD5 hash.
+Deduplicates images by MD5 hash, and optionally finds near-duplicates
+(e.g. the same drawing re-encoded as JPEG or rescaled) with a perceptual
+difference hash (dHash) across all classes, so copies of one drawing
+cannot end up on both sides of a train/test split.
+
+Hashing and copying run on a thread pool. A manifest in the output folder
+remembers each source file's size, mtime and hashes, so reruns only hash
+new or changed files and only copy what is missing.
 
 Usage:
-    python combine_datasets.py
+    python combine_datasets.py [--near-dup] [--near-dup-threshold 4] [--workers 8]
 
 Place downloaded Kaggle datasets in this folder before running.
 """
 
 import os
+import json
 import shutil
 import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 SCRIPT_DIR = Path(__file__).parent
 OUTPUT_DIR = SCRIPT_DIR / "combined"
 PROJECT_ROOT = SCRIPT_DIR.parent
+MANIFEST_PATH = OUTPUT_DIR / ".manifest.json"
+REPORT_PATH = OUTPUT_DIR / "near_duplicates.json"
+MANIFEST_VERSION = 1
 
 # Categories to look for
 CATEGORIES = {
@@ -24,26 +37,74 @@ CATEGORIES = {
     "wave": {"healthy": ["healthy"], "parkinson": ["parkinson", "parkinsons"]},
 }
 
+# Directories never searched for images, at any depth
+PRUNE_DIRS = {"node_modules", ".git", "__pycache__", ".venv", "venv"}
+# App code and build output of this project; only pruned directly under
+# PROJECT_ROOT, so a dataset that has e.g. a "src" folder is still searched
+PROJECT_PRUNE_DIRS = {"backend", "frontend", "src", "public", "dist", "static"}
+
+
+def is_pruned(parent, name):
+    """True if the directory parent/name is not searched for images."""
+    if name.lower() in PRUNE_DIRS or name.startswith("."):
+        return True
+    path = os.path.realpath(os.path.join(parent, name))
+    if path == os.path.realpath(OUTPUT_DIR):
+        return True
+    return (name.lower() in PROJECT_PRUNE_DIRS
+            and os.path.dirname(path) == os.path.realpath(PROJECT_ROOT))
+
 
 def md5_hash(filepath):
     """Compute MD5 hash of a file for deduplication."""
     h = hashlib.md5()
     with open(filepath, "rb") as f:
-        for chunk in iter(lambda: f.read(8192), b""):
+        for chunk in iter(lambda: f.read(1 << 20), b""):
             h.update(chunk)
     return h.hexdigest()
 
 
+def dhash(filepath, hash_size=8):
+    """
+    64-bit difference hash: grayscale, shrink to (hash_size + 1) x hash_size
+    and compare horizontally adjacent pixels. Robust to re-encoding and
+    rescaling, cheap to compute.
+    """
+    from PIL import Image
+
+    with Image.open(filepath) as img:
+        small = img.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
 def is_image(filename):
     """Check if file is an image."""
     return filename.lower().endswith((".png", ".jpg", ".jpeg", ".bmp", ".webp"))
 
 
-def find_image_dirs(root_path):
-    """Recursively find directories containing images matching our categories."""
+def find_image_dirs(root_path, visited=None):
+    """
+    Recursively find directories containing images, skipping PRUNE_DIRS,
+    the project's own code directories, our output, hidden directories and
+    anything already walked from another root.
+    """
+    visited = set() if visited is None else visited
     matches = []
     for dirpath, dirnames, filenames in os.walk(root_path):
-        images = [f for f in filenames if is_image(f)]
+        real = os.path.realpath(dirpath)
+        if real in visited:
+            dirnames[:] = []
+            continue
+        visited.add(real)
+        dirnames[:] = sorted(d for d in dirnames if not is_pruned(dirpath, d))
+        images = sorted(f for f in filenames if is_image(f))
         if images:
             matches.append((dirpath, images))
     return matches
@@ -72,7 +133,105 @@ def classify_directory(dirpath):
     return drawing_type, label
 
 
-def combine_datasets():
+def load_manifest():
+    if MANIFEST_PATH.exists():
+        try:
+            with open(MANIFEST_PATH, "r") as f:
+                manifest = json.load(f)
+            if manifest.get("version") == MANIFEST_VERSION:
+                return manifest
+        except (OSError, ValueError):
+            pass
+    return {"version": MANIFEST_VERSION, "sources": {}, "outputs": []}
+
+
+def save_manifest(manifest):
+    tmp = MANIFEST_PATH.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, MANIFEST_PATH)
+
+
+def collect_sources(search_paths):
+    """(src, drawing_type, label) for every classifiable image, in walk order."""
+    sources = []
+    visited = set()
+    for search_path in search_paths:
+        for dirpath, images in find_image_dirs(search_path, visited):
+            # Skip the output directory
+            if str(OUTPUT_DIR) in str(dirpath):
+                continue
+
+            drawing_type, label = classify_directory(dirpath)
+            if not drawing_type or not label:
+                continue
+            sources.extend((os.path.join(dirpath, name), drawing_type, label) for name in images)
+    return sources
+
+
+def hash_sources(sources, known, near_dup, workers):
+    """
+    Stat every source and reuse its cached hashes when size and mtime are
+    unchanged; hash the rest on a thread pool. Returns (manifest records,
+    number of files hashed).
+    """
+    def record(source):
+        src, drawing_type, label = source
+        stat = os.stat(src)
+        old = known.get(src)
+        fresh = bool(old) and old["size"] == stat.st_size and old["mtime"] == stat.st_mtime
+        rec = {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "md5": old["md5"] if fresh else md5_hash(src),
+            "dhash": old.get("dhash") if fresh else None,
+            "drawing_type": drawing_type,
+            "label": label,
+        }
+        if near_dup and rec["dhash"] is None:
+            try:
+                rec["dhash"] = dhash(src)
+            except Exception as e:
+                print(f"  Could not read {src}: {e}")
+        return src, rec, not fresh
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(record, sources))
+    return {src: rec for src, rec, _ in results}, sum(hashed for _, _, hashed in results)
+
+
+def find_near_duplicates(candidates, threshold):
+    """
+    Group candidates whose dHashes differ in at most threshold bits, across
+    all drawing types and classes. candidates is a list of (src, record) in
+    priority order; returns {index of dropped candidate: index it duplicates}.
+    """
+    import numpy as np
+
+    idx = [i for i, (_, rec) in enumerate(candidates) if rec.get("dhash") is not None]
+    if len(idx) < 2:
+        return {}
+    hashes = np.array([candidates[i][1]["dhash"] for i in idx], dtype=np.uint64)
+    # Byte view for a vectorized popcount of the XOR against all other hashes
+    popcount = np.array([bin(b).count("1") for b in range(256)], dtype=np.uint8)
+
+    dropped = {}
+    for a in range(len(idx)):
+        if idx[a] in dropped:
+            continue
+        rest = hashes[a + 1:]
+        if rest.size == 0:
+            break
+        xor = np.bitwise_xor(rest, hashes[a]).view(np.uint8).reshape(-1, 8)
+        distances = popcount[xor].sum(axis=1)
+        for b in np.flatnonzero(distances <= threshold):
+            j = idx[a + 1 + b]
+            if j not in dropped:
+                dropped[j] = idx[a]
+    return dropped
+
+
+def combine_datasets(near_dup=False, near_dup_threshold=4, workers=8):
     """Main function to combine and deduplicate datasets."""
     print("=" * 50)
     print("Parkinson's Dataset Combiner")
@@ -84,47 +243,69 @@ def combine_datasets():
             out_dir = OUTPUT_DIR / dtype / label
             out_dir.mkdir(parents=True, exist_ok=True)
 
-    # Track hashes for deduplication
-    seen_hashes = {f"{dtype}/{label}": set()
-                   for dtype in CATEGORIES
-                   for label in CATEGORIES[dtype]}
+    manifest = load_manifest()
     counts = {f"{dtype}/{label}": 0
               for dtype in CATEGORIES
               for label in CATEGORIES[dtype]}
-    duplicates = 0
 
     # Search paths: dataset folder + project root (for existing drawings.zip extraction)
-    search_paths = [SCRIPT_DIR, PROJECT_ROOT]
+    sources = collect_sources([SCRIPT_DIR, PROJECT_ROOT])
+    records, rehashed = hash_sources(sources, manifest["sources"], near_dup, workers)
 
-    for search_path in search_paths:
-        image_dirs = find_image_dirs(search_path)
-        for dirpath, images in image_dirs:
-            # Skip the output directory
-            if str(OUTPUT_DIR) in str(dirpath):
-                continue
+    # Exact duplicates: first occurrence per class wins
+    seen_hashes = set()
+    candidates = []
+    duplicates = 0
+    for src, drawing_type, label in sources:
+        rec = records[src]
+        key = (drawing_type, label, rec["md5"])
+        if key in seen_hashes:
+            duplicates += 1
+            continue
+        seen_hashes.add(key)
+        candidates.append((src, rec))
 
-            drawing_type, label = classify_directory(dirpath)
-            if not drawing_type or not label:
-                continue
+    # Near duplicates across every class and drawing type
+    near_dropped = {}
+    if near_dup:
+        near_dropped = find_near_duplicates(candidates, near_dup_threshold)
+        report = []
+        for j, i in sorted(near_dropped.items()):
+            (kept_src, kept), (dup_src, dup) = candidates[i], candidates[j]
+            report.append({
+                "kept": kept_src,
+                "dropped": dup_src,
+                "kept_class": f"{kept['drawing_type']}/{kept['label']}",
+                "dropped_class": f"{dup['drawing_type']}/{dup['label']}",
+                "distance": bin(kept["dhash"] ^ dup["dhash"]).count("1"),
+            })
+        with open(REPORT_PATH, "w") as f:
+            json.dump(report, f, indent=2)
+        conflicts = sum(1 for r in report if r["kept_class"] != r["dropped_class"])
+        print(f"\n  Near-duplicates dropped: {len(report)} "
+              f"({conflicts} with a different class; see {REPORT_PATH.name})")
 
-            key = f"{drawing_type}/{label}"
-            dest_dir = OUTPUT_DIR / drawing_type / label
+    # Copy what is missing; use hash prefix in filename to avoid name collisions
+    wanted = {}
+    for i, (src, rec) in enumerate(candidates):
+        if i in near_dropped:
+            continue
+        dest = OUTPUT_DIR / rec["drawing_type"] / rec["label"] / f"{rec['md5'][:8]}_{os.path.basename(src)}"
+        wanted[str(dest)] = src
+        counts[f"{rec['drawing_type']}/{rec['label']}"] += 1
 
-            for img_name in images:
-                src = os.path.join(dirpath, img_name)
-                file_hash = md5_hash(src)
+    to_copy = [(src, dest) for dest, src in wanted.items() if not os.path.exists(dest)]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(lambda pair: shutil.copy2(*pair), to_copy))
 
-                if file_hash in seen_hashes[key]:
-                    duplicates += 1
-                    continue
+    # Remove outputs from earlier runs that are no longer wanted
+    stale = [p for p in manifest.get("outputs", []) if p not in wanted and os.path.exists(p)]
+    for p in stale:
+        os.remove(p)
 
-                seen_hashes[key].add(file_hash)
-                # Use hash prefix in filename to avoid name collisions
-                ext = Path(img_name).suffix
-                dest_name = f"{file_hash[:8]}_{img_name}"
-                dest = dest_dir / dest_name
-                shutil.copy2(src, dest)
-                counts[key] += 1
+    manifest["sources"] = records
+    manifest["outputs"] = sorted(wanted)
+    save_manifest(manifest)
 
     # Print summary
     print("\nResults:")
@@ -135,6 +316,8 @@ def combine_datasets():
         total += count
     print(f"\n  Total unique images: {total}")
     print(f"  Duplicates skipped: {duplicates}")
+    print(f"  Hashed: {rehashed} new/changed of {len(sources)} | "
+          f"copied: {len(to_copy)} | removed stale: {len(stale)}")
     print(f"\n  Output directory: {OUTPUT_DIR}")
     print("=" * 50)
 
@@ -146,4 +329,11 @@ def combine_datasets():
 
 
 if __name__ == "__main__":
-    combine_datasets()
+    parser = argparse.ArgumentParser(description="Combine and deduplicate drawing datasets.")
+    parser.add_argument("--near-dup", action="store_true",
+                        help="Also drop perceptual (dHash) near-duplicates across classes")
+    parser.add_argument("--near-dup-threshold", type=int, default=4,
+                        help="Max differing dHash bits (of 64) to count as a near-duplicate")
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+    combine_datasets(args.near_dup, args.near_dup_threshold, args.workers)